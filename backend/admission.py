@@ -0,0 +1,148 @@
+import asyncio
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Overloaded(Exception):
+    """Request bị từ chối nhanh vì hệ thống quá tải (hàng đợi đầy / không kịp deadline)."""
+
+    def __init__(self, status_code: int, reason: str, message: str, retry_after: float):
+        super().__init__(message)
+        self.status_code = status_code
+        self.reason = reason
+        self.message = message
+        self.retry_after = max(1, int(math.ceil(retry_after)))
+
+
+class AdmissionController:
+    """
+    Hàng đợi tiếp nhận có giới hạn + pool worker cho các bước nặng CPU
+    (YOLO, OCR, ghi DB, ghi file), để event loop luôn rảnh phục vụ request khác.
+
+    - Hàng đợi đầy -> từ chối ngay (429).
+    - Ước lượng thời gian chờ + xử lý vượt deadline của request -> từ chối ngay (503).
+    - Request đã quá deadline khi tới lượt worker -> bỏ, không xử lý nữa (503).
+    """
+
+    def __init__(self, max_workers: int = 4, max_queue: int = 16, default_deadline_ms: float = 10000.0):
+        self.max_workers = max(1, int(max_workers))
+        self.max_queue = max(0, int(max_queue))
+        self.default_deadline = default_deadline_ms / 1000.0
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="upload-worker")
+
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        # Thời gian xử lý trung bình (EWMA, giây) dùng để ước lượng thời gian chờ
+        self._service_ewma = 0.5
+
+        self._admitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._shed = {"queue_full": 0, "deadline_unmeetable": 0, "deadline_expired": 0}
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def _estimated_wait(self) -> float:
+        # Số "lượt" phải chờ trước khi có worker rảnh, mỗi lượt tốn ~ 1 lần xử lý
+        backlog = self._queued + self._running - self.max_workers + 1
+        rounds = max(0, math.ceil(backlog / self.max_workers))
+        return rounds * self._service_ewma
+
+    def _admit(self, deadline: float):
+        with self._lock:
+            if self._queued >= self.max_queue and self._running >= self.max_workers:
+                self._shed["queue_full"] += 1
+                raise Overloaded(429, "queue_full", "Hệ thống đang quá tải, vui lòng thử lại sau giây lát.",
+                                 self._estimated_wait())
+            expected = self._estimated_wait() + self._service_ewma
+            if expected > deadline:
+                self._shed["deadline_unmeetable"] += 1
+                raise Overloaded(503, "deadline_unmeetable", "Hệ thống không kịp xử lý trong thời gian cho phép, vui lòng thử lại.",
+                                 expected - deadline)
+            self._queued += 1
+            self._admitted += 1
+
+    async def run(self, fn, *args, deadline_ms: float = None):
+        """
+        Chạy `fn(*args)` trên pool worker và chờ kết quả (không chặn event loop).
+        Ném `Overloaded` nếu request bị từ chối.
+        """
+        deadline = deadline_ms / 1000.0 if deadline_ms else self.default_deadline
+        self._admit(deadline)
+        enqueued_at = time.perf_counter()
+        pending = [True]  # còn được tính trong self._queued
+
+        def dequeue():
+            # Gọi với self._lock đang giữ; chỉ trừ 1 lần dù gọi từ task() hay done callback
+            if pending[0]:
+                pending[0] = False
+                self._queued -= 1
+
+        def task():
+            started = time.perf_counter()
+            waited = started - enqueued_at
+            with self._lock:
+                dequeue()
+                self._wait_total += waited
+                self._wait_max = max(self._wait_max, waited)
+                if waited > deadline:
+                    self._shed["deadline_expired"] += 1
+                    expired = True
+                else:
+                    self._running += 1
+                    expired = False
+            if expired:
+                raise Overloaded(503, "deadline_expired", "Request chờ quá lâu trong hàng đợi, vui lòng thử lại.",
+                                 self._service_ewma)
+
+            ok = False
+            try:
+                result = fn(*args)
+                ok = True
+                return result
+            finally:
+                elapsed = time.perf_counter() - started
+                with self._lock:
+                    self._running -= 1
+                    self._service_ewma = 0.8 * self._service_ewma + 0.2 * elapsed
+                    if ok:
+                        self._completed += 1
+                    else:
+                        self._failed += 1
+
+        future = self._executor.submit(task)
+
+        def on_done(_):
+            # Bị hủy trước khi chạy (client ngắt kết nối, tắt server): task() không chạy,
+            # vẫn phải bỏ khỏi hàng đợi, nếu không _queued tăng mãi và mọi request bị từ chối
+            with self._lock:
+                dequeue()
+
+        future.add_done_callback(on_done)
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> dict:
+        with self._lock:
+            dequeued = self._completed + self._failed + self._running + self._shed["deadline_expired"]
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "default_deadline_ms": self.default_deadline * 1000,
+                "queue_depth": self._queued,
+                "running": self._running,
+                "admitted": self._admitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "shed": dict(self._shed),
+                "shed_total": sum(self._shed.values()),
+                "avg_wait_ms": round(self._wait_total / dequeued * 1000, 2) if dequeued else 0.0,
+                "max_wait_ms": round(self._wait_max * 1000, 2),
+                "avg_service_ms": round(self._service_ewma * 1000, 2),
+            }
+
+    def shutdown(self):
+        """Bỏ các request còn chờ, chờ các request đang chạy xong (gọi khi tắt server)."""
+        self._executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,220 @@
+"""
+Đo độ trễ tải trang giao diện (frontend/index.html) khi nhiều điện thoại cùng tải, so sánh
+server cũ (HTTPServer 1 thread, bắt tay TLS trong accept()) với frontend/serve_https.py.
+
+Mỗi client: tải lần đầu trên kết nối TLS mới (bắt tay đầy đủ, nhận bản nén), rồi tải lại
+`--reloads` lần, mỗi lần trên kết nối mới dùng lại TLS session (resumption) + If-None-Match.
+`--stalled` client chỉ mở kết nối TCP rồi im lặng `--stall` giây (điện thoại sóng yếu): ở server
+cũ, mọi client khác phải chờ.
+
+Server chạy trong tiến trình này trên cổng ngẫu nhiên, dùng chứng chỉ frontend/server.crt/.key
+(không có thì tự tạo chứng chỉ tự ký tạm bằng openssl).
+
+Ví dụ (chạy trong thư mục backend/):
+    python benchmarks/bench_frontend.py --clients 50
+    python benchmarks/bench_frontend.py --clients 20 --stalled 2 --stall 1
+"""
+import argparse
+import http.client
+import http.server
+import json
+import os
+import socket
+import ssl
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FRONTEND_DIR = os.path.join(os.path.dirname(BACKEND_DIR), "frontend")
+sys.path.insert(0, FRONTEND_DIR)
+
+import serve_https  # noqa: E402
+
+
+def cert_files():
+    cert, key = os.path.join(FRONTEND_DIR, "server.crt"), os.path.join(FRONTEND_DIR, "server.key")
+    if os.path.exists(cert) and os.path.exists(key):
+        return cert, key
+    tmp = tempfile.mkdtemp(prefix="bench_frontend_")
+    cert, key = os.path.join(tmp, "server.crt"), os.path.join(tmp, "server.key")
+    subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-keyout", key, "-out", cert,
+                    "-days", "1", "-nodes", "-subj", "/CN=localhost"], check=True, capture_output=True)
+    return cert, key
+
+
+def start_legacy(context):
+    """Server cũ: HTTPServer 1 thread, socket nghe được bọc TLS (bắt tay ngay trong accept())."""
+
+    class Handler(http.server.SimpleHTTPRequestHandler):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, directory=FRONTEND_DIR, **kwargs)
+
+        def log_message(self, format, *args):
+            pass
+
+    class Server(http.server.HTTPServer):
+        def handle_error(self, request, client_address):
+            pass
+
+    httpd = Server(("127.0.0.1", 0), Handler)
+    httpd.socket = context.wrap_socket(httpd.socket, server_side=True)
+    return httpd
+
+
+def start_threaded(context):
+    return serve_https.StaticHTTPSServer(("127.0.0.1", 0), context, FRONTEND_DIR, quiet=True)
+
+
+class ResumingConnection(http.client.HTTPSConnection):
+    """HTTPSConnection dùng lại TLS session của kết nối trước (như trình duyệt mở lại trang)."""
+
+    def __init__(self, *args, session=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.session = session
+
+    def connect(self):
+        sock = socket.create_connection((self.host, self.port), self.timeout)
+        self.sock = self._context.wrap_socket(sock, server_hostname=self.host, session=self.session)
+
+
+def load_page(port, client_ctx, session=None, etag=None, last_modified=None):
+    """Tải index.html trên 1 kết nối mới. Trả về (giây, mã HTTP, số byte, ETag, Last-Modified, session, resumed)."""
+    headers = {"Accept-Encoding": "br, gzip"}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    t0 = time.perf_counter()
+    conn = ResumingConnection("127.0.0.1", port, context=client_ctx, timeout=60, session=session)
+    try:
+        conn.request("GET", "/index.html", headers=headers)
+        # Giữ socket: với response HTTP/1.0 (server cũ), getresponse() bỏ conn.sock ngay
+        sock = conn.sock
+        resp = conn.getresponse()
+        body = resp.read()
+        session, reused = sock.session, sock.session_reused
+        elapsed = time.perf_counter() - t0
+        return elapsed, resp.status, len(body), resp.getheader("ETag"), resp.getheader("Last-Modified"), session, reused
+    finally:
+        conn.close()
+
+
+def stalled_client(port, seconds, started):
+    """Mở kết nối TCP rồi không gửi gì (không bắt tay TLS) trong `seconds` giây."""
+    sock = socket.create_connection(("127.0.0.1", port))
+    started.set()
+    time.sleep(seconds)
+    sock.close()
+
+
+def run(mode: str, args, context):
+    httpd = start_legacy(context) if mode == "legacy" else start_threaded(context)
+    port = httpd.server_address[1]
+    server = threading.Thread(target=httpd.serve_forever, daemon=True)
+    server.start()
+
+    client_ctx = ssl.create_default_context()
+    client_ctx.check_hostname = False
+    client_ctx.verify_mode = ssl.CERT_NONE
+
+    stalls = []
+    for _ in range(args.stalled):
+        started = threading.Event()
+        t = threading.Thread(target=stalled_client, args=(port, args.stall, started), daemon=True)
+        t.start()
+        started.wait()
+        stalls.append(t)
+
+    cold, warm, sizes = [], [], []
+    statuses, resumed = {}, 0
+    lock = threading.Lock()
+    barrier = threading.Barrier(args.clients)
+
+    def client():
+        barrier.wait()
+        elapsed, status, size, etag, last_modified, session, _ = load_page(port, client_ctx)
+        results = [(elapsed, status, size, False)]
+        for _ in range(args.reloads):
+            r = load_page(port, client_ctx, session, etag, last_modified)
+            results.append((r[0], r[1], r[2], r[6]))
+        with lock:
+            nonlocal resumed
+            cold.append(results[0][0])
+            sizes.append(results[0][2])
+            for elapsed, status, size, reused in results[1:]:
+                warm.append(elapsed)
+                resumed += bool(reused)
+            for _, status, _, _ in results:
+                statuses[status] = statuses.get(status, 0) + 1
+
+    threads = [threading.Thread(target=client) for _ in range(args.clients)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - t0
+    for t in stalls:
+        t.join()
+    httpd.shutdown()
+    httpd.server_close()
+
+    def summary(values):
+        values = sorted(values)
+        if not values:
+            return {}
+        return {
+            "p50_ms": round(statistics.median(values) * 1000, 1),
+            "p95_ms": round(values[min(len(values) - 1, int(len(values) * 0.95))] * 1000, 1),
+            "max_ms": round(values[-1] * 1000, 1),
+        }
+
+    return {
+        "mode": mode,
+        "wall_s": round(wall, 2),
+        "first_load": summary(cold),
+        "reload": summary(warm),
+        "first_load_bytes": round(statistics.mean(sizes)),
+        "statuses": dict(sorted(statuses.items())),
+        "tls_resumed": f"{resumed}/{len(warm)}",
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Đo độ trễ tải trang giao diện khi nhiều client cùng tải")
+    parser.add_argument("--clients", type=int, default=50, help="Số client tải đồng thời")
+    parser.add_argument("--reloads", type=int, default=3, help="Số lần tải lại mỗi client (kết nối mới)")
+    parser.add_argument("--stalled", type=int, default=1, help="Số client mở kết nối rồi im lặng")
+    parser.add_argument("--stall", type=float, default=2.0, help="Thời gian im lặng của client chậm (giây)")
+    parser.add_argument("--modes", default="legacy,threaded", help="legacy,threaded")
+    parser.add_argument("--json", action="store_true", help="In kết quả dạng JSON")
+    args = parser.parse_args()
+
+    certfile, keyfile = cert_files()
+    results = []
+    for mode in args.modes.split(","):
+        if mode == "legacy":
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(certfile, keyfile)
+        else:
+            context = serve_https.make_context(certfile, keyfile)
+        results.append(run(mode, args, context))
+
+    if args.json:
+        print(json.dumps(results))
+        return
+    print(f"{args.clients} client, {args.reloads} lần tải lại/client, {args.stalled} client im lặng {args.stall}s")
+    print(f"{'server':<10} {'tải đầu p50/p95/max (ms)':>28} {'tải lại p50/p95/max (ms)':>28} {'byte':>7} {'resumed':>9}  mã HTTP")
+    for r in results:
+        fl, rl = r["first_load"], r["reload"]
+        print(f"{r['mode']:<10} {fl['p50_ms']:>10} {fl['p95_ms']:>8} {fl['max_ms']:>8} "
+              f"{rl.get('p50_ms', '-'):>10} {rl.get('p95_ms', '-'):>8} {rl.get('max_ms', '-'):>8} "
+              f"{r['first_load_bytes']:>7} {r['tls_resumed']:>9}  {r['statuses']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Đo độ trễ tìm biển số gần đúng (plate_match.FuzzyPlateIndex) với nhiều xe trong bãi:
+biển truy vấn bị đổi 1-2 ký tự dễ nhầm (O/0, B/8/3, S/5...) hoặc sai hẳn 1 ký tự.
+So sánh với duyệt tuần tự toàn bộ biển (weighted_distance trên từng biển).
+
+Ví dụ (chạy trong thư mục backend/):
+    python benchmarks/bench_fuzzy.py --plates 50000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from plate_match import CHAR_TO_DIGIT, DIGIT_TO_CHAR, FuzzyPlateIndex, weighted_distance  # noqa: E402
+
+SERIES = "ABCDEFGHKLMNPSTUVXYZ"
+
+
+def random_plate(rng):
+    return f"{rng.randint(10, 99)}{rng.choice(SERIES)}-{rng.randint(0, 999):03d}.{rng.randint(0, 99):02d}"
+
+
+def misread(plate, rng, confusions: int, plain: int):
+    """Đổi `confusions` ký tự thành ký tự dễ nhầm và `plain` ký tự thành ký tự bất kỳ."""
+    chars = list(plate)
+    positions = [i for i, ch in enumerate(chars) if ch in CHAR_TO_DIGIT or ch in DIGIT_TO_CHAR]
+    rng.shuffle(positions)
+    for i in positions[:confusions]:
+        chars[i] = CHAR_TO_DIGIT.get(chars[i]) or DIGIT_TO_CHAR[chars[i]]
+    for i in rng.sample([i for i, ch in enumerate(chars) if ch.isalnum()], plain):
+        chars[i] = rng.choice("0123456789")
+    return "".join(chars)
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark tìm biển số gần đúng")
+    parser.add_argument("--plates", type=int, default=50000, help="Số xe trong bãi")
+    parser.add_argument("--queries", type=int, default=5000)
+    parser.add_argument("--max-distance", type=float, default=0.5)
+    parser.add_argument("--min-margin", type=float, default=0.5)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    plates = list({random_plate(rng) for _ in range(args.plates)})
+    index = FuzzyPlateIndex()
+    t0 = time.perf_counter()
+    for plate in plates:
+        index.add(plate)
+    print(f"Dựng chỉ mục {len(plates)} biển: {(time.perf_counter() - t0) * 1000:.0f} ms")
+
+    for label, confusions, plain in (("1 ký tự dễ nhầm", 1, 0), ("2 ký tự dễ nhầm", 2, 0), ("1 ký tự sai hẳn", 0, 1)):
+        queries = [(p, misread(p, rng, confusions, plain)) for p in rng.sample(plates, args.queries)]
+        latencies = []
+        resolved = wrong = 0
+        for truth, query in queries:
+            t0 = time.perf_counter()
+            match = index.best(query, args.max_distance, args.min_margin)
+            latencies.append(time.perf_counter() - t0)
+            if match is not None:
+                resolved += 1
+                wrong += match.plate_number != truth
+        print(f"{label:<16} p50 {statistics.median(latencies) * 1e6:6.1f} µs, p99 {percentile(latencies, 0.99) * 1e6:6.1f} µs | "
+              f"khớp {resolved / len(queries):6.1%}, khớp sai {wrong}")
+
+    query = misread(plates[0], rng, 1, 0)
+    t0 = time.perf_counter()
+    min(plates, key=lambda p: weighted_distance(query, p))
+    print(f"Duyệt tuần tự 1 lần: {(time.perf_counter() - t0) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Đo tốc độ gom ảnh cũ vào file pack (image_pack.compact) và tốc độ đọc ngẫu nhiên:
+file rời (open/read) so với đọc từ pack (tra chỉ mục SQLite + cắt đoạn trên mmap).
+Đo: số file/s và MB/s khi gom, số lần đọc/s và MB/s khi đọc ngẫu nhiên.
+
+DB và ảnh tổng hợp được tạo trong thư mục tạm.
+
+Ví dụ (chạy trong thư mục backend/):
+    python benchmarks/bench_pack.py --rows 20000
+    python benchmarks/bench_pack.py --rows 5000 --image-bytes 200000 --reads 20000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+
+def seed(rows: int, store, image_bytes: int):
+    """Sinh `rows` session đã check-out, mỗi session 1 ảnh gốc + 1 ảnh cắt (nội dung ngẫu nhiên)."""
+    import database
+
+    start = datetime(2024, 1, 1)
+    names = []
+    batch = []
+    with database.engine.begin() as conn:
+        for i in range(rows):
+            blob = os.urandom(image_bytes)
+            name = store.name_for(blob, "a.jpg")
+            for path, size in ((store.path(name), image_bytes), (store.crop_path(name), image_bytes // 4)):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, "wb") as f:
+                    f.write(blob[:size])
+            names.append(name)
+            batch.append({
+                "plate_number": f"30A-{i // 100 % 1000:03d}.{i % 100:02d}",
+                "checkin_time": start + timedelta(seconds=i),
+                "checkin_img": name,
+                "status": "CHECKOUT",
+                "fee": 5000,
+            })
+            if len(batch) >= 5000:
+                conn.execute(database.ParkingSession.__table__.insert(), batch)
+                batch = []
+        if batch:
+            conn.execute(database.ParkingSession.__table__.insert(), batch)
+    return names
+
+
+def bench_reads(label, read, keys):
+    t0 = time.perf_counter()
+    total = 0
+    for name, crop in keys:
+        total += len(read(name, crop))
+    elapsed = time.perf_counter() - t0
+    print(f"{label:<22} {len(keys)} lần đọc trong {elapsed:6.2f}s ({len(keys) / elapsed:9.0f} lần/s, "
+          f"{total / 1e6 / elapsed:8.1f} MB/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark gom ảnh vào pack và đọc ngẫu nhiên")
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--image-bytes", type=int, default=60000, help="Kích thước mỗi ảnh gốc giả (ảnh cắt = 1/4)")
+    parser.add_argument("--reads", type=int, default=10000, help="Số lần đọc ngẫu nhiên")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_pack_")
+    os.chdir(workdir)
+
+    import database
+    import image_pack
+    import image_store
+
+    database.init_db()
+    store = image_store.ImageStore(os.path.join(workdir, "uploads"), os.path.join(workdir, "crops"))
+    packs = image_pack.PackStore(os.path.join(workdir, "packs"))
+
+    names = seed(args.rows, store, args.image_bytes)
+    rng = random.Random(0)
+    keys = [(rng.choice(names), rng.random() < 0.5) for _ in range(args.reads)]
+
+    # Đọc file rời (trước khi gom). Bộ đệm trang của OS giữ file vừa ghi -> so sánh ở trạng thái "nóng".
+    bench_reads("file rời", lambda n, c: store.read(n, crop=c), keys)
+
+    result = image_pack.compact(days=0, store=store, pack_store=packs)
+    print(f"gom pack               {result['files_packed']} file trong {result['elapsed_s']:6.2f}s "
+          f"({result['files_per_s']:9.0f} file/s, {result['mb_per_s']:8.1f} MB/s)")
+
+    bench_reads("pack (chỉ mục + mmap)", lambda n, c: image_pack.read(n, c, store=store, pack_store=packs), keys)
+    locs = {key: image_pack.lookup(*key) for key in set(keys)}
+    bench_reads("pack (chỉ mmap)", lambda n, c: packs.read(*locs[(n, c)]), keys)
+    print(image_pack.stats(packs))
+
+
+if __name__ == "__main__":
+    main()
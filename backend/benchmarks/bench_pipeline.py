@@ -0,0 +1,288 @@
+"""
+Benchmark toàn bộ đường nhận diện + ghi session trên ảnh tổng hợp (synthetic_plates), không
+cần mạng hay ảnh thật. Đo riêng từng bước: giải mã ảnh, detect_and_crop_vehicle,
+read_plate_text, fix_vietnamese_plate_format, crud.create_session_entry (vào / ra) và
+xuất báo cáo (report_export), mỗi bước có p50/p95/p99 + throughput. Kèm độ chính xác
+(bắt đúng xe, đọc đúng biển theo từng biến thể, chuẩn hóa đúng biển) để nhanh hơn không
+âm thầm đổi lấy sai hơn.
+
+--stub dùng model giả (stub_models, SPAS_STUB_MODELS=1) thay YOLO/EasyOCR: chạy được trong CI
+không cần torch/easyocr. Kết quả dạng JSON (--json) để lưu làm mốc (--save-baseline) và so
+sánh lần sau (--baseline): chậm hơn mốc quá --tolerance hoặc chính xác kém hơn mốc quá
+--accuracy-tolerance -> mã thoát 1.
+
+DB tạo trong thư mục tạm, không đụng tới parking.db thật.
+
+Ví dụ (chạy trong thư mục backend/):
+    python benchmarks/bench_pipeline.py --stub --save-baseline bench_baseline.json
+    python benchmarks/bench_pipeline.py --stub --baseline bench_baseline.json
+    python benchmarks/bench_pipeline.py --count 400 --json result.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# Không so chênh lệch p95 dưới ngưỡng này (ms): các bước vài µs dao động mạnh theo máy
+MIN_REGRESSION_MS = 0.05
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def summarize(latencies, items: int = None):
+    """Thống kê độ trễ (giây -> ms) + throughput (đơn vị/giây) của 1 bước."""
+    total = sum(latencies)
+    return {
+        "n": len(latencies),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 4),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 4),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 4),
+        "mean_ms": round(total / len(latencies) * 1000, 4),
+        "throughput_per_s": round((items or len(latencies)) / total, 2) if total > 0 else None,
+    }
+
+
+def timed(fn, *args):
+    t0 = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - t0
+
+
+def iou(a, b):
+    ix = max(0.0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def bench_recognition(samples, warmup: int):
+    """Giải mã, bắt xe + cắt ảnh, đọc biển trên từng ảnh tổng hợp."""
+    import yolo_utils
+    from image_decode import decode_frame
+
+    # Nạp model trước khi đo (yolo_utils chỉ nạp khi cần)
+    yolo_utils.load_models()
+    for sample in samples[:warmup]:
+        crop = yolo_utils.detect_and_crop_vehicle(sample["jpeg"])
+        if crop is not None:
+            yolo_utils.read_plate_text(crop)
+
+    times = defaultdict(list)
+    hits = 0
+    by_variant = defaultdict(lambda: [0, 0])  # biến thể -> [đọc đúng, tổng]
+    for sample in samples:
+        frame, dt = timed(decode_frame, sample["jpeg"])
+        times["decode"].append(dt)
+
+        # Độ chính xác bắt xe (không tính giờ): box trên det_img quy về toạ độ ảnh gốc
+        box = yolo_utils.detect_vehicle_boxes([frame.det_img])[0]
+        if box is not None:
+            scale = frame.full_width / float(frame.det_img.shape[1])
+            hits += iou([v * scale for v in box], sample["box"]) >= 0.5
+
+        crop, dt = timed(yolo_utils.detect_and_crop_vehicle, sample["jpeg"])
+        times["detect_and_crop_vehicle"].append(dt)
+
+        plate = None
+        if crop is not None:
+            plate, dt = timed(yolo_utils.read_plate_text, crop)
+            times["read_plate_text"].append(dt)
+        counts = by_variant[sample["variant"]]
+        counts[0] += plate == sample["plate"]
+        counts[1] += 1
+
+    correct = sum(c for c, _ in by_variant.values())
+    accuracy = {
+        "detection_hit_rate": round(hits / len(samples), 4),
+        "plate_exact_match": round(correct / len(samples), 4),
+    }
+    for variant, (c, n) in sorted(by_variant.items()):
+        accuracy[f"plate_exact_match_{variant}"] = round(c / n, 4)
+    return times, accuracy
+
+
+def bench_fix_format(samples, seed: int, repeats: int):
+    """Chuẩn hóa chuỗi OCR thô có lỗi ký tự dễ nhầm về biển số."""
+    import yolo_utils
+    from synthetic_plates import noisy_raw_text
+
+    rng = random.Random(seed)
+    cases = [(noisy_raw_text(s["plate"], rng), s["plate"]) for s in samples]
+    latencies = []
+    for _ in range(repeats):
+        for raw, _ in cases:
+            _, dt = timed(yolo_utils.fix_vietnamese_plate_format, raw)
+            latencies.append(dt)
+    correct = sum(yolo_utils.fix_vietnamese_plate_format(raw) == truth for raw, truth in cases)
+    return latencies, round(correct / len(cases), 4)
+
+
+def bench_sessions(plates):
+    """Check-in rồi check-out lần lượt từng biển qua crud.create_session_entry."""
+    import crud
+
+    times = {"create_session_entry_checkin": [], "create_session_entry_checkout": []}
+    ok = 0
+    for i, plate in enumerate(plates):
+        (session, _), dt = timed(crud.create_session_entry, f"in_{i}.jpg", 1, plate)
+        times["create_session_entry_checkin"].append(dt)
+        ok += session is not None
+    for i, plate in enumerate(plates):
+        (session, _), dt = timed(crud.create_session_entry, f"out_{i}.jpg", 0, plate)
+        times["create_session_entry_checkout"].append(dt)
+        ok += session is not None
+    return times, round(ok / (2 * len(plates)), 4)
+
+
+def bench_report(rows: int, repeats: int, formats):
+    """Xuất báo cáo `rows` session theo từng định dạng (throughput tính theo dòng/giây)."""
+    import report_export
+    from bench_report import seed
+
+    start, end = seed(rows)
+    stages = {}
+    for fmt in formats:
+        _, _, encoder = report_export.FORMATS[fmt]
+        latencies = []
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            for _ in encoder(report_export.iter_session_rows(start, end)):
+                pass
+            latencies.append(time.perf_counter() - t0)
+        stages[f"report_export_{fmt}"] = summarize(latencies, items=rows * repeats)
+    return stages
+
+
+def compare(result, baseline, tolerance: float, accuracy_tolerance: float):
+    """Danh sách các điểm kém hơn mốc (rỗng = đạt)."""
+    problems = []
+    for key in ("stub_models", "count", "seed"):
+        if baseline["meta"].get(key) != result["meta"].get(key):
+            print(f"⚠️ Cấu hình khác mốc: {key} = {result['meta'].get(key)} (mốc: {baseline['meta'].get(key)})")
+    for name, base in baseline["stages"].items():
+        cur = result["stages"].get(name)
+        if cur is None:
+            continue
+        limit = base["p95_ms"] * (1 + tolerance)
+        if cur["p95_ms"] > limit and cur["p95_ms"] - base["p95_ms"] > MIN_REGRESSION_MS:
+            problems.append(f"{name}: p95 {cur['p95_ms']:.3f} ms > mốc {base['p95_ms']:.3f} ms (+{tolerance:.0%})")
+    for name, base in baseline["accuracy"].items():
+        cur = result["accuracy"].get(name)
+        if cur is not None and cur < base - accuracy_tolerance:
+            problems.append(f"{name}: {cur:.2%} < mốc {base:.2%}")
+    return problems
+
+
+def print_table(result):
+    print(f"{'Bước':<34}{'n':>6}{'p50 ms':>11}{'p95 ms':>11}{'p99 ms':>11}{'/giây':>12}")
+    for name, s in result["stages"].items():
+        print(f"{name:<34}{s['n']:>6}{s['p50_ms']:>11.3f}{s['p95_ms']:>11.3f}{s['p99_ms']:>11.3f}"
+              f"{s['throughput_per_s'] or 0:>12.1f}")
+    print("Độ chính xác:")
+    for name, value in result["accuracy"].items():
+        print(f"  {name:<40}{value:>8.2%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pipeline nhận diện + ghi session trên ảnh tổng hợp")
+    parser.add_argument("--stub", action="store_true", help="Dùng model giả (không cần torch/easyocr, cho CI)")
+    parser.add_argument("--count", type=int, default=200, help="Số ảnh tổng hợp")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--warmup", type=int, default=3, help="Số ảnh chạy thử trước khi đo")
+    parser.add_argument("--fix-repeats", type=int, default=20, help="Số lượt đo fix_vietnamese_plate_format")
+    parser.add_argument("--report-rows", type=int, default=5000)
+    parser.add_argument("--report-repeats", type=int, default=3)
+    parser.add_argument("--report-formats", nargs="+", default=["csv", "ndjson", "xlsx"])
+    parser.add_argument("--json", help="Ghi kết quả JSON ra file ('-' = stdout)")
+    parser.add_argument("--baseline", help="File JSON mốc để so sánh")
+    parser.add_argument("--save-baseline", help="Lưu kết quả làm mốc")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Cho phép p95 chậm hơn mốc bấy nhiêu (0.25 = 25%%)")
+    parser.add_argument("--accuracy-tolerance", type=float, default=0.02, help="Cho phép chính xác kém mốc bấy nhiêu")
+    args = parser.parse_args()
+
+    if args.stub:
+        os.environ["SPAS_STUB_MODELS"] = "1"
+    # Ảnh tổng hợp khác nhau hoàn toàn, nhưng tắt cache để chắc chắn mỗi ảnh chạy đủ YOLO/OCR
+    os.environ.setdefault("SPAS_RESULT_CACHE", "0")
+    baseline_path = os.path.abspath(args.baseline) if args.baseline else None
+    outputs = [os.path.abspath(p) if p and p != "-" else p for p in (args.json, args.save_baseline)]
+
+    # --json -: stdout chỉ chứa JSON, mọi log (kể cả của database/migrations) chuyển sang stderr
+    out = sys.stdout
+    if args.json == "-":
+        sys.stdout = sys.stderr
+
+    # database.py dùng đường dẫn tương đối ./parking.db -> chạy trong thư mục tạm
+    workdir = tempfile.mkdtemp(prefix="bench_pipeline_")
+    os.chdir(workdir)
+
+    import config
+    import database
+    from synthetic_plates import VARIANTS, make_dataset
+
+    database.init_db()
+    t0 = time.perf_counter()
+    samples = make_dataset(args.count, args.seed)
+    print(f"Đã sinh {len(samples)} ảnh tổng hợp trong {time.perf_counter() - t0:.1f}s ({workdir})")
+
+    times, accuracy = bench_recognition(samples, args.warmup)
+    stages = {name: summarize(values) for name, values in times.items() if values}
+    fix_times, accuracy["fix_format_exact_match"] = bench_fix_format(samples, args.seed, args.fix_repeats)
+    stages["fix_vietnamese_plate_format"] = summarize(fix_times)
+    session_times, accuracy["session_success_rate"] = bench_sessions([s["plate"] for s in samples])
+    stages.update({name: summarize(values) for name, values in session_times.items()})
+    stages.update(bench_report(args.report_rows, args.report_repeats, args.report_formats))
+
+    result = {
+        "meta": {
+            "stub_models": config.STUB_MODELS,
+            "detector_backend": "stub" if config.STUB_MODELS else config.DETECTOR_BACKEND,
+            "count": args.count,
+            "seed": args.seed,
+            "variants": list(VARIANTS),
+            "report_rows": args.report_rows,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "stages": stages,
+        "accuracy": accuracy,
+    }
+
+    if args.json == "-":
+        json.dump(result, out, ensure_ascii=False, indent=2)
+        out.write("\n")
+    else:
+        print_table(result)
+    for path in outputs:
+        if path and path != "-":
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(result, f, ensure_ascii=False, indent=2)
+            print(f"Đã ghi {path}")
+
+    if baseline_path:
+        with open(baseline_path, encoding="utf-8") as f:
+            baseline = json.load(f)
+        problems = compare(result, baseline, args.tolerance, args.accuracy_tolerance)
+        if problems:
+            print("❌ Kém hơn mốc:")
+            for problem in problems:
+                print(f"  - {problem}")
+            sys.exit(1)
+        print("✅ Không kém hơn mốc")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+So sánh xóa dữ liệu kiểu cũ (nạp ORM object, db.delete() từng dòng, os.remove đồng bộ,
+1 giao dịch lớn) với purge.py (DELETE theo lô + dọn ảnh ở thread nền), trong lúc 1 thread
+khác giả lập cổng check-in liên tục ghi DB. Đo: thời gian xóa, tốc độ (dòng/s),
+độ trễ ghi lớn nhất / p99 của cổng trong lúc xóa, số file và dung lượng giải phóng.
+
+DB và ảnh tổng hợp được tạo trong thư mục tạm.
+
+Ví dụ (chạy trong thư mục backend/):
+    python benchmarks/bench_purge.py --rows 50000
+    python benchmarks/bench_purge.py --rows 20000 --archive
+"""
+import argparse
+import itertools
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+
+def seed(rows: int, upload_dir: str, crop_dir: str, image_bytes: int):
+    import database
+
+    start = datetime(2024, 1, 1)
+    blob = os.urandom(image_bytes)
+    batch = []
+    with database.engine.begin() as conn:
+        for i in range(rows):
+            name = f"img_{i}.jpg"
+            for path in (os.path.join(upload_dir, name), os.path.join(crop_dir, f"crop_{name}")):
+                with open(path, "wb") as f:
+                    f.write(blob)
+            batch.append({
+                "plate_number": f"30A-{i // 100 % 1000:03d}.{i % 100:02d}",
+                "checkin_time": start + timedelta(seconds=i),
+                "checkin_img": name,
+                "status": "COMPLETED",
+                "fee": 25000,
+            })
+            if len(batch) >= 5000:
+                conn.execute(database.ParkingSession.__table__.insert(), batch)
+                batch = []
+        if batch:
+            conn.execute(database.ParkingSession.__table__.insert(), batch)
+    return start, start + timedelta(seconds=rows)
+
+
+def legacy_delete(start, end, upload_dir, crop_dir):
+    """Cách xóa cũ của crud.delete_sessions_in_range."""
+    import database
+
+    db = database.SessionLocal()
+    try:
+        sessions = db.query(database.ParkingSession).filter(
+            database.ParkingSession.checkin_time >= start,
+            database.ParkingSession.checkin_time <= end,
+        ).all()
+        for ses in sessions:
+            for img in (ses.checkin_img, ses.checkout_img):
+                if img:
+                    for path in (os.path.join(upload_dir, img), os.path.join(crop_dir, f"crop_{img}")):
+                        try:
+                            os.remove(path)
+                        except OSError:
+                            pass
+            db.delete(ses)
+        db.commit()
+        return len(sessions)
+    finally:
+        db.close()
+
+
+class Gate(threading.Thread):
+    """Giả lập cổng: ghi 1 session mới mỗi `interval` giây, đo thời gian mỗi lần commit."""
+
+    # Số thứ tự xe, dùng chung giữa các lần chạy (session của cổng không bị xóa)
+    plates = itertools.count()
+
+    def __init__(self, interval: float = 0.01):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.latencies = []
+        self.stop_event = threading.Event()
+
+    def run(self):
+        import database
+
+        while not self.stop_event.is_set():
+            n = next(Gate.plates)
+            t0 = time.perf_counter()
+            with database.engine.begin() as conn:
+                # Mỗi xe 1 biển riêng (DB không cho 2 session PARKING cùng biển số)
+                conn.execute(database.ParkingSession.__table__.insert(), {
+                    "plate_number": f"99Z-{n // 100 % 1000:03d}.{n % 100:02d}", "checkin_time": datetime(2030, 1, 1),
+                    "status": "PARKING",
+                })
+            self.latencies.append(time.perf_counter() - t0)
+            time.sleep(self.interval)
+
+
+def disk_usage(*dirs):
+    return sum(os.path.getsize(os.path.join(d, f)) for d in dirs for f in os.listdir(d))
+
+
+def run(name, fn, dirs):
+    before = disk_usage(*dirs)
+    gate = Gate()
+    gate.start()
+    time.sleep(0.2)
+    t0 = time.perf_counter()
+    rows = fn()
+    elapsed = time.perf_counter() - t0
+    time.sleep(0.2)
+    gate.stop_event.set()
+    gate.join()
+    lat = sorted(gate.latencies)
+    p99 = lat[min(len(lat) - 1, int(len(lat) * 0.99))]
+    print(f"{name:<14} {rows} dòng trong {elapsed:6.2f}s ({rows / elapsed:9.0f} dòng/s) | "
+          f"ghi cổng: max {max(lat) * 1000:7.1f} ms, p99 {p99 * 1000:6.1f} ms, "
+          f"median {statistics.median(lat) * 1000:5.1f} ms | "
+          f"giải phóng {(before - disk_usage(*dirs)) / 1e6:6.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark xóa dữ liệu cũ")
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--image-bytes", type=int, default=2048, help="Kích thước mỗi file ảnh giả")
+    parser.add_argument("--archive", action="store_true", help="purge.py chuyển ảnh vào file .zip thay vì xóa")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_purge_")
+    os.chdir(workdir)
+    upload_dir, crop_dir = os.path.join(workdir, "uploads"), os.path.join(workdir, "crops")
+    os.makedirs(upload_dir)
+    os.makedirs(crop_dir)
+
+    import database
+    import purge
+
+    database.init_db()
+
+    start, end = seed(args.rows, upload_dir, crop_dir, args.image_bytes)
+    run("legacy", lambda: legacy_delete(start, end, upload_dir, crop_dir), (upload_dir, crop_dir))
+
+    start, end = seed(args.rows, upload_dir, crop_dir, args.image_bytes)
+    archive = os.path.join(workdir, "archive", "bench.zip") if args.archive else None
+
+    def batched():
+        rows = purge.purge_sessions(start, end, upload_dir, crop_dir, archive_path=archive)
+        purge.reclaimer.wait_idle()
+        return rows
+
+    run("purge.py", batched, (upload_dir, crop_dir))
+    print(purge.stats())
+
+
+if __name__ == "__main__":
+    main()
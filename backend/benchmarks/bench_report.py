@@ -0,0 +1,131 @@
+"""
+So sánh xuất báo cáo kiểu cũ (query .all() -> Workbook -> BytesIO) với xuất dạng stream
+(report_export: yield_per + workbook write-only / CSV / NDJSON) trên DB tổng hợp:
+thời gian tới byte đầu tiên (TTFB), tổng thời gian và bộ nhớ đỉnh (tracemalloc).
+
+DB tổng hợp được tạo trong thư mục tạm, không đụng tới parking.db thật.
+
+Ví dụ (chạy trong thư mục backend/):
+    python benchmarks/bench_report.py --rows 200000
+    python benchmarks/bench_report.py --rows 50000 --formats csv ndjson
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from io import BytesIO
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+
+def seed(rows: int):
+    """Sinh `rows` session giả (chia lô để không giữ hết trong RAM)."""
+    import database
+
+    rng = random.Random(0)
+    start = datetime(2024, 1, 1)
+    batch = []
+    parked = set()
+    with database.engine.begin() as conn:
+        for i in range(rows):
+            checkin = start + timedelta(seconds=i * 30)
+            done = rng.random() < 0.9
+            plate = f"{rng.randint(10, 99)}{rng.choice('ABCDEFGHKLM')}-{rng.randint(100, 999)}.{rng.randint(10, 99)}"
+            # DB không cho 2 session PARKING cùng biển số: biển đang trong bãi thì coi như đã ra
+            done = done or plate in parked
+            if not done:
+                parked.add(plate)
+            batch.append({
+                "plate_number": plate,
+                "checkin_time": checkin,
+                "checkout_time": checkin + timedelta(hours=rng.randint(1, 30)) if done else None,
+                "checkin_img": f"in_{i}.jpg",
+                "checkout_img": f"out_{i}.jpg" if done else None,
+                "status": "COMPLETED" if done else "PARKING",
+                "fee": rng.choice((25000, 50000, 75000)) if done else 0,
+            })
+            if len(batch) >= 5000:
+                conn.execute(database.ParkingSession.__table__.insert(), batch)
+                batch = []
+        if batch:
+            conn.execute(database.ParkingSession.__table__.insert(), batch)
+    return start, start + timedelta(seconds=rows * 30)
+
+
+def legacy_report(start, end):
+    """Đường xuất cũ của /report: nạp hết ORM object rồi dựng Workbook trong BytesIO."""
+    import openpyxl
+
+    import crud
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        sessions = crud.get_sessions_in_range(db, start, end)
+        wb = openpyxl.Workbook()
+        ws = wb.active
+        ws.append(["ID", "Biển số", "Giờ vào", "Giờ ra", "Trạng thái", "Phí (VNĐ)", "Ảnh vào", "Ảnh ra"])
+        for s in sessions:
+            ws.append([
+                s.id, s.plate_number,
+                s.checkin_time.strftime("%Y-%m-%d %H:%M:%S") if s.checkin_time else "",
+                s.checkout_time.strftime("%Y-%m-%d %H:%M:%S") if s.checkout_time else "",
+                s.status, s.fee, s.checkin_img, s.checkout_img,
+            ])
+        output = BytesIO()
+        wb.save(output)
+        output.seek(0)
+        yield output.getvalue()
+    finally:
+        db.close()
+
+
+def measure(name, chunks):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    ttfb = None
+    total = 0
+    for chunk in chunks:
+        if ttfb is None:
+            ttfb = time.perf_counter() - t0
+        total += len(chunk)
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:<16} TTFB {ttfb * 1000:9.1f} ms | tổng {elapsed:7.2f} s | "
+          f"{total / 1e6:7.1f} MB | RAM đỉnh {peak / 1e6:8.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark xuất báo cáo")
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--formats", nargs="+", default=["xlsx", "csv", "ndjson"])
+    parser.add_argument("--skip-legacy", action="store_true", help="Bỏ qua đường xuất cũ (chậm, tốn RAM)")
+    args = parser.parse_args()
+
+    # database.py dùng đường dẫn tương đối ./parking.db -> chạy trong thư mục tạm
+    workdir = tempfile.mkdtemp(prefix="bench_report_")
+    os.chdir(workdir)
+
+    import database
+    import report_export
+
+    database.init_db()
+    t0 = time.perf_counter()
+    start, end = seed(args.rows)
+    print(f"Đã tạo {args.rows} session trong {time.perf_counter() - t0:.1f}s ({workdir})")
+
+    if not args.skip_legacy:
+        measure("legacy xlsx", legacy_report(start, end))
+    for fmt in args.formats:
+        _, _, encoder = report_export.FORMATS[fmt]
+        measure(f"stream {fmt}", encoder(report_export.iter_session_rows(start, end)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+So sánh thời gian từng bước giữa đường xử lý cũ và đường xử lý đa độ phân giải:
+
+- Cũ : giải mã full -> resize 640 -> YOLO -> cắt xe trên ảnh 640 -> OCR (phóng to 2x nếu nhỏ)
+- Mới: giải mã rút gọn (1/2, 1/4, 1/8) -> YOLO -> giải mã full (chỉ khi có xe) -> cắt xe trên ảnh gốc -> OCR
+
+Ví dụ (chạy trong thư mục backend/):
+    python benchmarks/bench_resolution.py --images uploads
+    python benchmarks/bench_resolution.py --decode-only            # không cần model, dùng ảnh tổng hợp
+"""
+import argparse
+import glob
+import os
+import statistics
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from image_decode import decode_frame  # noqa: E402
+
+
+def synthetic_jpegs(sizes=((1920, 1080), (3264, 2448), (4032, 3024)), per_size=5, quality=90):
+    """Ảnh giả lập camera: nền gradient + khối 'xe' + biển số trắng chữ đen."""
+    rng = np.random.default_rng(0)
+    images = []
+    for w, h in sizes:
+        for _ in range(per_size):
+            img = np.zeros((h, w, 3), np.uint8)
+            img[:] = np.linspace(40, 200, w, dtype=np.uint8)[None, :, None]
+            x1, y1 = int(w * rng.uniform(0.2, 0.35)), int(h * rng.uniform(0.25, 0.4))
+            x2, y2 = int(w * rng.uniform(0.65, 0.8)), int(h * rng.uniform(0.75, 0.9))
+            cv2.rectangle(img, (x1, y1), (x2, y2), (50, 40, 150), -1)
+            pw, ph = (x2 - x1) // 3, (x2 - x1) // 14
+            px, py = (x1 + x2) // 2 - pw // 2, y2 - ph * 2
+            cv2.rectangle(img, (px, py), (px + pw, py + ph), (255, 255, 255), -1)
+            cv2.putText(img, "30A-123.45", (px + pw // 20, py + int(ph * 0.78)), cv2.FONT_HERSHEY_SIMPLEX,
+                        ph / 42.0, (0, 0, 0), max(1, ph // 12))
+            noise = rng.integers(0, 12, img.shape, dtype=np.uint8)
+            img = cv2.add(img, noise)
+            ok, buf = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, quality])
+            images.append((f"synthetic_{w}x{h}_{len(images)}.jpg", buf.tobytes(), (x1, y1, x2, y2)))
+    return images
+
+
+def load_images(path):
+    images = []
+    for pattern in ("*.jpg", "*.jpeg", "*.png"):
+        for p in sorted(glob.glob(os.path.join(path, "**", pattern), recursive=True)):
+            with open(p, "rb") as f:
+                images.append((os.path.basename(p), f.read(), None))
+    return images
+
+
+def legacy_decode(data):
+    img = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    if img is not None and img.shape[1] > 640:
+        scale = 640 / img.shape[1]
+        img = cv2.resize(img, None, fx=scale, fy=scale)
+    return img
+
+
+def _scaled_box(gt, data, det_img):
+    """Box thật (toạ độ ảnh gốc) -> toạ độ ảnh detect, dùng khi chạy --decode-only."""
+    from image_decode import jpeg_dimensions
+    w = jpeg_dimensions(data)[0]
+    s = det_img.shape[1] / float(w)
+    return [v * s for v in gt]
+
+
+def run(images, decode_only: bool, repeat: int):
+    detect = ocr = None
+    if not decode_only:
+        import yolo_utils
+        yolo_utils.load_models()
+        detect = lambda img: yolo_utils.detect_vehicle_boxes([img])[0]
+        ocr = yolo_utils._ocr_plate
+
+    timings = {"legacy": {}, "multires": {}}
+    crop_widths = {"legacy": [], "multires": []}
+
+    def add(path, stage, seconds):
+        timings[path].setdefault(stage, []).append(seconds * 1000)
+
+    for _ in range(repeat):
+        for name, data, gt in images:
+            # --- Đường cũ ---
+            t0 = time.perf_counter()
+            img = legacy_decode(data)
+            t1 = time.perf_counter()
+            box = detect(img) if detect else _scaled_box(gt, data, img)
+            t2 = time.perf_counter()
+            crop = None
+            if box is not None:
+                x1, y1, x2, y2 = map(int, box)
+                crop = img[y1:y2, x1:x2]
+            t3 = time.perf_counter()
+            add("legacy", "decode", t1 - t0)
+            add("legacy", "detect", t2 - t1)
+            add("legacy", "crop", t3 - t2)
+            if crop is not None:
+                crop_widths["legacy"].append(crop.shape[1])
+                if ocr:
+                    t4 = time.perf_counter()
+                    ocr(crop)
+                    add("legacy", "ocr", time.perf_counter() - t4)
+
+            # --- Đường đa độ phân giải ---
+            t0 = time.perf_counter()
+            frame = decode_frame(data)
+            t1 = time.perf_counter()
+            box = detect(frame.det_img) if detect else _scaled_box(gt, data, frame.det_img)
+            t2 = time.perf_counter()
+            crop = frame.crop(box)  # gồm cả giải mã full (chỉ khi có xe)
+            t3 = time.perf_counter()
+            add("multires", "decode", t1 - t0)
+            add("multires", "detect", t2 - t1)
+            add("multires", "crop", t3 - t2)
+            if crop is not None:
+                crop_widths["multires"].append(crop.shape[1])
+                if ocr:
+                    t4 = time.perf_counter()
+                    ocr(crop)
+                    add("multires", "ocr", time.perf_counter() - t4)
+
+    print(f"Số ảnh: {len(images)} x {repeat} lần lặp" + (" (chỉ giải mã/cắt, không chạy model)" if decode_only else ""))
+    print(f"{'bước':<10}{'cũ (ms, median)':>18}{'mới (ms, median)':>18}")
+    total = {"legacy": 0.0, "multires": 0.0}
+    for stage in ("decode", "detect", "crop", "ocr"):
+        row = []
+        for path in ("legacy", "multires"):
+            values = timings[path].get(stage)
+            med = statistics.median(values) if values else 0.0
+            total[path] += med
+            row.append(med)
+        print(f"{stage:<10}{row[0]:>18.2f}{row[1]:>18.2f}")
+    print(f"{'tổng':<10}{total['legacy']:>18.2f}{total['multires']:>18.2f}")
+    for path in ("legacy", "multires"):
+        if crop_widths[path]:
+            print(f"Chiều rộng ảnh xe ({path}): median {statistics.median(crop_widths[path]):.0f}px")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark đường xử lý đa độ phân giải")
+    parser.add_argument("--images", default=None, help="Thư mục ảnh; mặc định dùng ảnh tổng hợp")
+    parser.add_argument("--decode-only", action="store_true", help="Chỉ đo giải mã + cắt (không cần model)")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.images:
+        if args.decode_only:
+            raise SystemExit("--decode-only cần ảnh tổng hợp (có sẵn box thật), bỏ --images")
+        images = load_images(args.images)
+    else:
+        images = synthetic_jpegs()
+    if not images:
+        raise SystemExit("Không có ảnh để benchmark")
+    run(images, args.decode_only, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""
+Kiểm tra tải đồng thời cho thread ghi check-in/check-out (session_writer.py): nhiều làn (thread)
+cùng gửi lượt vào/ra cho 1 tập biển số nhỏ (nhiều làn hay đọc trùng 1 biển), kèm các đợt mọi làn
+cùng check-in 1 biển đúng 1 thời điểm. Sau đó kiểm tra:
+- không có 2 session PARKING cùng biển số; mỗi đợt check-in trùng chỉ đúng 1 làn thành công,
+- chỉ mục trong RAM (occupancy) khớp với DB, số lượt thành công khớp với DB và stats_rollups.
+Đo số lượt/giây và kích thước lô trung bình, so với ghi mỗi lượt 1 giao dịch (lô tối đa 1).
+`--processes N`: chạy các làn trên N tiến trình cùng ghi 1 file DB (như run_https.py --workers N);
+các đợt check-in trùng khi đó tranh nhau giữa các tiến trình.
+
+DB được tạo trong thư mục tạm. Trả mã lỗi 1 nếu kiểm tra không đạt.
+
+Ví dụ (chạy trong thư mục backend/):
+    python benchmarks/bench_session_writer.py --lanes 8 --events 4000
+    python benchmarks/bench_session_writer.py --processes 4 --lanes 4
+    SPAS_SQLITE_SYNCHRONOUS=FULL python benchmarks/bench_session_writer.py
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+SERIES = "ABCDEFGHKLMNPSTUVXYZ"
+
+
+def make_plates(count: int, rng):
+    plates = set()
+    while len(plates) < count:
+        plates.add(f"{rng.randint(10, 99)}{rng.choice(SERIES)}-{rng.randint(0, 999):03d}.{rng.randint(0, 99):02d}")
+    return sorted(plates)
+
+
+def reset():
+    """Xóa dữ liệu của lần chạy trước (giữ schema), dựng lại chỉ mục xe trong bãi."""
+    import database
+    import occupancy
+
+    with database.engine.begin() as conn:
+        conn.execute(database.ParkingSession.__table__.delete())
+        conn.execute(database.StatsRollup.__table__.delete())
+    db = database.SessionLocal()
+    try:
+        occupancy.index.rebuild(db)
+    finally:
+        db.close()
+
+
+def run_lanes(lanes: int, events: int, plates, bursts: int, seed: int):
+    """Chạy `lanes` thread gửi tổng cộng ~`events` lượt ngẫu nhiên + `bursts` đợt check-in trùng."""
+    import crud
+
+    barrier = threading.Barrier(lanes)
+    burst_plates = [f"99Z-{i:03d}.99" for i in range(bursts)]
+    per_lane = events // lanes
+    results = [None] * lanes
+
+    def lane(n):
+        rng = random.Random(seed * 1000 + n)
+        ok = {1: 0, 0: 0}
+        burst_wins = []
+        for i in range(per_lane):
+            if bursts and i % max(1, per_lane // bursts) == 0 and len(burst_wins) < bursts:
+                # Mọi làn cùng đọc 1 biển, cùng lúc -> chỉ 1 làn được check-in
+                plate = burst_plates[len(burst_wins)]
+                barrier.wait()
+                session, _ = crud.create_session_entry(f"burst_{n}_{i}.jpg", 1, plate)
+                burst_wins.append(session is not None)
+                continue
+            status = rng.randint(0, 1)
+            session, _ = crud.create_session_entry(f"lane{n}_{i}.jpg", status, rng.choice(plates))
+            ok[status] += session is not None
+        results[n] = (ok, burst_wins)
+
+    threads = [threading.Thread(target=lane, args=(n,)) for n in range(lanes)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+
+    burst_winners = [sum(r[1][b] for r in results) for b in range(min(len(r[1]) for r in results))]
+    checkins = sum(r[0][1] for r in results) + sum(burst_winners)
+    checkouts = sum(r[0][0] for r in results)
+    return elapsed, per_lane * lanes, checkins, checkouts, burst_winners
+
+
+def lanes_in_process(workdir: str, max_batch: int, lanes: int, events: int, plates, bursts: int, seed: int):
+    """run_lanes trong 1 tiến trình con (như 1 worker uvicorn) trên cùng file DB. Thêm (số giao dịch, số lượt)."""
+    os.chdir(workdir)
+    import session_writer
+
+    writer = session_writer.writer
+    writer.max_batch_size = max_batch
+    before = writer.stats()
+    result = run_lanes(lanes, events, plates, bursts, seed)
+    after = writer.stats()
+    session_writer.shutdown()
+    return result + (after["batches"] - before["batches"], after["items"] - before["items"])
+
+
+def run_processes(max_batch: int, args, plates):
+    """Chạy `args.processes` tiến trình con, gộp kết quả như run_lanes (+ số giao dịch, số lượt)."""
+    ctx = multiprocessing.get_context("spawn")
+    jobs = [
+        (os.getcwd(), max_batch, args.lanes, args.events // args.processes, plates, args.bursts, args.seed * 100 + p)
+        for p in range(args.processes)
+    ]
+    with ctx.Pool(args.processes) as pool:
+        parts = pool.starmap(lanes_in_process, jobs)
+    # Mỗi biển của đợt check-in trùng: tổng số làn thành công trên mọi tiến trình
+    rounds = min(len(part[4]) for part in parts)
+    burst_winners = [sum(part[4][b] for part in parts) for b in range(rounds)]
+    return (
+        max(part[0] for part in parts),  # các tiến trình chạy song song
+        sum(part[1] for part in parts),
+        sum(part[2] for part in parts),
+        sum(part[3] for part in parts),
+        burst_winners,
+        sum(part[5] for part in parts),
+        sum(part[6] for part in parts),
+    )
+
+
+def verify(checkins: int, checkouts: int, burst_winners, resync: bool = False):
+    """Danh sách lỗi phát hiện được (rỗng = đạt)."""
+    from sqlalchemy import func, select
+
+    import database
+    import occupancy
+
+    S = database.ParkingSession.__table__
+    R = database.StatsRollup.__table__
+    errors = []
+    with database.engine.connect() as conn:
+        dupes = conn.execute(
+            select(S.c.plate_number, func.count()).where(S.c.status == "PARKING")
+            .group_by(S.c.plate_number).having(func.count() > 1)
+        ).all()
+        if dupes:
+            errors.append(f"{len(dupes)} biển có nhiều session PARKING: {dupes[:5]}")
+        open_rows = dict(conn.execute(select(S.c.plate_number, S.c.id).where(S.c.status == "PARKING")).all())
+        db_checkins = conn.execute(select(func.count()).select_from(S)).scalar()
+        db_checkouts = conn.execute(select(func.count()).select_from(S).where(S.c.status == "CHECKOUT")).scalar()
+        rolled = conn.execute(select(func.sum(R.c.checkins), func.sum(R.c.checkouts)).where(R.c.period == "day")).one()
+
+    if resync:
+        # Các lượt được ghi ở tiến trình con: đối chiếu chỉ mục của tiến trình này với DB trước
+        with database.SessionLocal() as db:
+            occupancy.index.sync(db)
+    indexed = {v["plate_number"]: v["session_id"] for v in occupancy.index.snapshot()}
+    if indexed != open_rows:
+        errors.append(f"Chỉ mục lệch DB: {len(indexed)} xe trong chỉ mục, {len(open_rows)} session PARKING")
+    if (db_checkins, db_checkouts) != (checkins, checkouts):
+        errors.append(f"Lượt thành công ({checkins} vào, {checkouts} ra) khác DB ({db_checkins}, {db_checkouts})")
+    if tuple(rolled) != (checkins, checkouts):
+        errors.append(f"stats_rollups ({rolled[0]} vào, {rolled[1]} ra) khác số lượt thành công")
+    bad = [n for n in burst_winners if n != 1]
+    if bad:
+        errors.append(f"Đợt check-in trùng có số làn thành công khác 1: {bad}")
+    return errors
+
+
+def run_mode(name: str, max_batch: int, args, plates):
+    import session_writer
+
+    reset()
+    if args.processes > 1:
+        elapsed, events, checkins, checkouts, burst_winners, batches, items = run_processes(max_batch, args, plates)
+    else:
+        writer = session_writer.writer
+        writer.max_batch_size = max_batch
+        before = writer.stats()
+        elapsed, events, checkins, checkouts, burst_winners = run_lanes(
+            args.lanes, args.events, plates, args.bursts, args.seed
+        )
+        after = writer.stats()
+        batches = after["batches"] - before["batches"]
+        items = after["items"] - before["items"]
+    errors = verify(checkins, checkouts, burst_winners, resync=args.processes > 1)
+    return {
+        "mode": name,
+        "max_batch": max_batch,
+        "events": events,
+        "seconds": round(elapsed, 3),
+        "events_per_s": round(events / elapsed, 1),
+        "checkins": checkins,
+        "checkouts": checkouts,
+        "bursts": len(burst_winners),
+        "transactions": batches,
+        "avg_batch_size": round(items / batches, 2) if batches else 0,
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Kiểm tra tải đồng thời + đo thông lượng thread ghi check-in/out")
+    parser.add_argument("--lanes", type=int, default=8, help="Số làn (thread) gửi đồng thời")
+    parser.add_argument("--events", type=int, default=4000, help="Tổng số lượt vào/ra")
+    parser.add_argument("--plates", type=int, default=50, help="Số biển số khác nhau (ít -> nhiều làn đọc trùng)")
+    parser.add_argument("--bursts", type=int, default=20, help="Số đợt mọi làn cùng check-in 1 biển")
+    parser.add_argument("--max-batch", type=int, default=None, help="Lô tối đa (mặc định SPAS_SESSION_COMMIT_MAX_BATCH)")
+    parser.add_argument("--no-compare", action="store_true", help="Không chạy thêm chế độ mỗi lượt 1 giao dịch")
+    parser.add_argument("--processes", type=int, default=1, help="Số tiến trình cùng ghi 1 file DB (như --workers)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="In kết quả dạng JSON")
+    args = parser.parse_args()
+
+    # database.py dùng đường dẫn tương đối ./parking.db -> chạy trong thư mục tạm
+    workdir = tempfile.mkdtemp(prefix="bench_writer_")
+    os.chdir(workdir)
+
+    import config
+    import database
+
+    database.init_db()
+    plates = make_plates(args.plates, random.Random(args.seed))
+    max_batch = args.max_batch or config.SESSION_COMMIT_MAX_BATCH
+
+    results = [run_mode("group_commit", max_batch, args, plates)]
+    if not args.no_compare:
+        results.append(run_mode("per_event_commit", 1, args, plates))
+
+    if args.json:
+        print(json.dumps({"synchronous": config.SQLITE_SYNCHRONOUS, "processes": args.processes, "lanes": args.lanes, "results": results}))
+    else:
+        print(f"{args.processes} tiến trình x {args.lanes} làn, {args.plates} biển, synchronous={config.SQLITE_SYNCHRONOUS}")
+        print(f"{'chế độ':<18} {'lượt/s':>10} {'giao dịch':>10} {'lô TB':>7} {'vào':>6} {'ra':>6}  kiểm tra")
+        for r in results:
+            status = "OK" if not r["errors"] else "LỖI"
+            print(f"{r['mode']:<18} {r['events_per_s']:>10.1f} {r['transactions']:>10} {r['avg_batch_size']:>7.2f} "
+                  f"{r['checkins']:>6} {r['checkouts']:>6}  {status}")
+            for err in r["errors"]:
+                print(f"  - {err}")
+        if len(results) == 2:
+            print(f"Group commit nhanh hơn {results[0]['events_per_s'] / results[1]['events_per_s']:.2f}x")
+    sys.exit(1 if any(r["errors"] for r in results) else 0)
+
+
+if __name__ == "__main__":
+    main()
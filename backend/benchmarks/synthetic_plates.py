@@ -0,0 +1,138 @@
+"""
+Sinh ảnh xe tổng hợp có biển số Việt Nam (VD: 30A-123.45) để benchmark không cần mạng
+hay ảnh thật: thân xe (kính, bánh, đèn) trên nền mặt đường nhiễu, biển trắng viền đen
+vẽ bằng font Hershey (cùng font mẫu của stub_models.StubReader).
+
+Các biến thể khó hay gặp ngoài thực tế:
+- normal: xe màu, biển rõ
+- glare: vệt sáng lóa đè lên biển số
+- white_car: xe màu trắng, gần màu biển số
+- low_contrast: chữ nhạt trên biển xám, ảnh hơi mờ (trời tối / biển bẩn)
+"""
+import os
+import random
+import sys
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from plate_match import CHAR_TO_DIGIT, DIGIT_TO_CHAR  # noqa: E402
+
+VARIANTS = ("normal", "glare", "white_car", "low_contrast")
+SERIES = "ABCDEFGHKLMNPSTUVXYZ"
+FONT = cv2.FONT_HERSHEY_DUPLEX
+CAR_COLORS = ((40, 40, 160), (150, 60, 20), (30, 30, 30), (60, 140, 60), (20, 160, 200))
+
+
+def random_plate(rng: random.Random) -> str:
+    return f"{rng.randint(10, 99)}{rng.choice(SERIES)}-{rng.randint(0, 999):03d}.{rng.randint(0, 99):02d}"
+
+
+def _background(rng: random.Random, width: int, height: int):
+    """Mặt đường: xám nhiễu + vài vạch sơn."""
+    np_rng = np.random.default_rng(rng.getrandbits(32))
+    base = rng.randint(70, 100)
+    img = np_rng.normal(base, 8, (height, width, 1)).clip(0, 255).astype(np.uint8)
+    img = np.repeat(img, 3, axis=2)
+    for _ in range(2):
+        x = rng.randint(0, width)
+        cv2.line(img, (x, 0), (x + rng.randint(-200, 200), height), (200, 200, 200), 6)
+    return img
+
+
+def _draw_plate(img, plate: str, x: int, y: int, w: int, h: int, variant: str, rng: random.Random):
+    plate_color, text_color = (235, 235, 235), (20, 20, 20)
+    if variant == "low_contrast":
+        plate_color, text_color = (150, 150, 150), (90, 90, 90)
+    cv2.rectangle(img, (x, y), (x + w, y + h), plate_color, -1)
+    cv2.rectangle(img, (x, y), (x + w, y + h), text_color, 3)
+
+    thickness = 3
+    (tw, th), _ = cv2.getTextSize(plate, FONT, 1.0, thickness)
+    scale = min((w * 0.88) / tw, (h * 0.62) / th)
+    (tw, th), _ = cv2.getTextSize(plate, FONT, scale, thickness)
+    origin = (x + (w - tw) // 2, y + (h + th) // 2)
+    cv2.putText(img, plate, origin, FONT, scale, text_color, thickness, cv2.LINE_AA)
+
+    if variant == "glare":
+        # Vệt sáng hình elip chồng lên 1 phần biển số (không lóa hết chữ)
+        overlay = np.zeros(img.shape[:2], np.float32)
+        cx = x + rng.randint(w // 5, w - w // 5)
+        cv2.ellipse(overlay, (cx, y + h // 2), (w // 4, h), rng.randint(-30, 30), 0, 360, 1.0, -1)
+        overlay = cv2.GaussianBlur(overlay, (0, 0), h / 2.5)[..., None] * 0.55
+        img[:] = (img * (1 - overlay) + 255 * overlay).astype(np.uint8)
+
+
+def make_sample(rng: random.Random, variant: str = "normal", width: int = 1280, height: int = 960, quality: int = 90):
+    """
+    Sinh 1 ảnh tổng hợp. Trả về dict:
+    jpeg (bytes), plate (biển số đúng), variant, box (x1, y1, x2, y2) của xe trong ảnh.
+    """
+    plate = random_plate(rng)
+    img = _background(rng, width, height)
+
+    car_w = rng.randint(int(width * 0.5), int(width * 0.62))
+    car_h = int(car_w * rng.uniform(0.62, 0.72))
+    x1 = rng.randint(int(width * 0.08), width - car_w - int(width * 0.08))
+    y1 = rng.randint(int(height * 0.08), height - car_h - int(height * 0.05))
+    x2, y2 = x1 + car_w, y1 + car_h
+
+    body = (235, 235, 235) if variant == "white_car" else rng.choice(CAR_COLORS)
+    # Thân xe + nóc + kính chắn gió + bánh + đèn
+    cv2.rectangle(img, (x1, y1 + car_h // 3), (x2, y2 - car_h // 8), body, -1)
+    roof = (x1 + car_w // 6, y1, x2 - car_w // 6, y1 + car_h // 3)
+    cv2.rectangle(img, roof[:2], roof[2:], body, -1)
+    cv2.rectangle(img, (roof[0] + 15, roof[1] + 15), (roof[2] - 15, roof[3]), (70, 60, 50), -1)
+    for wx in (x1 + car_w // 6, x2 - car_w // 6):
+        cv2.circle(img, (wx, y2 - car_h // 8), car_h // 8, (15, 15, 15), -1)
+    for lx in (x1 + 20, x2 - 20 - car_w // 8):
+        cv2.rectangle(img, (lx, y1 + car_h // 3 + 20), (lx + car_w // 8, y1 + car_h // 3 + 50), (180, 230, 250), -1)
+
+    plate_w = int(car_w * 0.42)
+    plate_h = int(plate_w / 4.5)
+    px = x1 + (car_w - plate_w) // 2
+    py = y2 - car_h // 8 - plate_h - car_h // 10
+    _draw_plate(img, plate, px, py, plate_w, plate_h, variant, rng)
+
+    if variant == "low_contrast":
+        img = cv2.GaussianBlur(img, (5, 5), 1.2)
+
+    ok, buf = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise RuntimeError("Không mã hóa được ảnh tổng hợp")
+    return {"jpeg": buf.tobytes(), "plate": plate, "variant": variant, "box": (x1, y1, x2, y2)}
+
+
+def make_dataset(count: int, seed: int = 0, variants=VARIANTS):
+    """`count` ảnh, chia đều lần lượt theo các biến thể. Cùng seed -> cùng bộ ảnh."""
+    rng = random.Random(seed)
+    return [make_sample(rng, variants[i % len(variants)]) for i in range(count)]
+
+
+def _invert(table):
+    inverse = {}
+    for src, dst in table.items():
+        inverse.setdefault(dst, src)
+    return inverse
+
+
+# Lỗi đọc OCR giả lập cho bước chuẩn hóa biển số: đúng các cặp dễ nhầm mà bảng sửa lỗi
+# (plate_match.CHAR_TO_DIGIT / DIGIT_TO_CHAR) khôi phục được, VD: số 0 đọc thành O
+_DIGIT_NOISE = _invert(CHAR_TO_DIGIT)
+_SERIES_NOISE = _invert(DIGIT_TO_CHAR)
+
+
+def noisy_raw_text(plate: str, rng: random.Random) -> str:
+    """
+    Chuỗi OCR thô như khi vào fix_vietnamese_plate_format (đã bỏ dấu phân cách): có ký tự
+    dễ nhầm và đôi khi dính chữ rác phía trước (VD: "3OAI2345", "HOND30A12345").
+    """
+    chars = [ch for ch in plate if ch.isalnum()]
+    for i, ch in enumerate(chars):
+        table = _SERIES_NOISE if i == 2 else _DIGIT_NOISE
+        if ch in table and rng.random() < 0.3:
+            chars[i] = table[ch]
+    junk = "".join(rng.choice("HONDAKIAFRT") for _ in range(rng.randint(1, 4))) if rng.random() < 0.3 else ""
+    return junk + "".join(chars)
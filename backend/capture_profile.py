@@ -0,0 +1,155 @@
+"""
+Thông số chụp ảnh mà pipeline thực sự cần (độ phân giải, định dạng, chất lượng nén) để
+client chụp và nén đúng ngay trên thiết bị, thay vì gửi ảnh gốc camera nhiều MB mà server
+lại thu nhỏ về ~640px cho YOLO.
+
+- `profile()`: thông số trả cho client (GET /capture/profile).
+- `validate()`: kiểm tra ảnh upload (định dạng, dung lượng) chỉ bằng header, không giải mã.
+- `stats`: dung lượng và thời gian giải mã của các request (GET /capture/stats).
+"""
+import struct
+import threading
+
+import config
+from image_decode import jpeg_dimensions
+
+# Định dạng ảnh -> MIME type
+MIME_TYPES = {"jpeg": "image/jpeg", "webp": "image/webp", "png": "image/png"}
+
+# Ảnh lớn hơn profile quá tỉ lệ này bị tính là "không theo profile" (chỉ thống kê, vẫn nhận)
+SIZE_TOLERANCE = 1.1
+
+
+class ProfileViolation(Exception):
+    """Ảnh upload không đúng profile đến mức không nhận xử lý (sai định dạng / quá dung lượng)."""
+
+    def __init__(self, status_code: int, reason: str, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+        self.reason = reason
+        self.message = message
+
+
+def sniff_format(data: bytes):
+    """Định dạng ảnh theo magic bytes ("jpeg" / "webp" / "png") hoặc None."""
+    if data[:3] == b"\xff\xd8\xff":
+        return "jpeg"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "webp"
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return "png"
+    return None
+
+
+def _webp_dimensions(data: bytes):
+    chunk = data[12:16]
+    if chunk == b"VP8X" and len(data) >= 30:
+        width = int.from_bytes(data[24:27], "little") + 1
+        height = int.from_bytes(data[27:30], "little") + 1
+        return width, height
+    if chunk == b"VP8 " and len(data) >= 30:
+        width, height = struct.unpack("<HH", data[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b"VP8L" and len(data) >= 25:
+        bits = int.from_bytes(data[21:25], "little")
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    return None
+
+
+def image_dimensions(data: bytes, fmt: str = None):
+    """(width, height) đọc từ header ảnh, không giải mã. None nếu không đọc được."""
+    fmt = fmt or sniff_format(data)
+    if fmt == "jpeg":
+        return jpeg_dimensions(data)
+    if fmt == "webp":
+        return _webp_dimensions(data)
+    if fmt == "png" and len(data) >= 24:
+        return struct.unpack(">II", data[16:24])
+    return None
+
+
+def accepted_formats():
+    return [f.strip().lower() for f in config.CAPTURE_ACCEPT_FORMATS.split(",") if f.strip()]
+
+
+def profile() -> dict:
+    """Thông số chụp gửi cho client."""
+    return {
+        "max_width": config.CAPTURE_MAX_WIDTH,
+        "max_height": config.CAPTURE_MAX_HEIGHT,
+        "format": MIME_TYPES.get(config.CAPTURE_FORMAT, "image/jpeg"),
+        "quality": config.CAPTURE_QUALITY,
+        "max_bytes": config.CAPTURE_MAX_BYTES,
+        "accept": [MIME_TYPES[f] for f in accepted_formats() if f in MIME_TYPES],
+    }
+
+
+def validate(data: bytes) -> dict:
+    """
+    Kiểm tra ảnh upload theo profile. Sai định dạng (415) hoặc quá dung lượng (413) -> ProfileViolation.
+    Trả về thông tin ảnh: format, bytes, width, height, on_profile (độ phân giải không vượt profile).
+    """
+    size = len(data)
+    if size > config.CAPTURE_MAX_BYTES:
+        stats.reject("too_large")
+        raise ProfileViolation(413, "too_large",
+                               f"Ảnh quá lớn ({size // 1024} KB), tối đa {config.CAPTURE_MAX_BYTES // 1024} KB. "
+                               f"Vui lòng tải lại trang để dùng cấu hình chụp mới.")
+    fmt = sniff_format(data)
+    if fmt not in accepted_formats():
+        stats.reject("unsupported_format")
+        raise ProfileViolation(415, "unsupported_format",
+                               f"Định dạng ảnh không hỗ trợ: {fmt or 'không rõ'}. Chấp nhận: {config.CAPTURE_ACCEPT_FORMATS}")
+    dims = image_dimensions(data, fmt)
+    on_profile = dims is None or (
+        dims[0] <= config.CAPTURE_MAX_WIDTH * SIZE_TOLERANCE and dims[1] <= config.CAPTURE_MAX_HEIGHT * SIZE_TOLERANCE
+    )
+    return {
+        "format": fmt,
+        "bytes": size,
+        "width": dims[0] if dims else None,
+        "height": dims[1] if dims else None,
+        "on_profile": on_profile,
+    }
+
+
+class CaptureStats:
+    """Thống kê dung lượng ảnh và thời gian giải mã theo định dạng."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._formats = {}  # format -> [số request, tổng byte, byte lớn nhất, tổng ms giải mã, số lần giải mã]
+        self.off_profile = 0
+        self.rejected = {"too_large": 0, "unsupported_format": 0}
+
+    def reject(self, reason: str):
+        with self._lock:
+            self.rejected[reason] = self.rejected.get(reason, 0) + 1
+
+    def record(self, info: dict, decode_ms: float = None):
+        with self._lock:
+            entry = self._formats.setdefault(info["format"], [0, 0, 0, 0.0, 0])
+            entry[0] += 1
+            entry[1] += info["bytes"]
+            entry[2] = max(entry[2], info["bytes"])
+            if decode_ms is not None:
+                entry[3] += decode_ms
+                entry[4] += 1
+            if not info["on_profile"]:
+                self.off_profile += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            formats = {
+                fmt: {
+                    "requests": n,
+                    "avg_bytes": round(total / n) if n else 0,
+                    "max_bytes": biggest,
+                    "avg_decode_ms": round(decode_total / decoded, 2) if decoded else None,
+                }
+                for fmt, (n, total, biggest, decode_total, decoded) in self._formats.items()
+            }
+            return {"formats": formats, "off_profile": self.off_profile, "rejected": dict(self.rejected)}
+
+
+stats = CaptureStats()
@@ -0,0 +1,199 @@
+import os
+
+# Cấu hình hệ thống. Mỗi giá trị có thể ghi đè bằng biến môi trường cùng tên
+# (tiền tố SPAS_), VD: SPAS_BATCH_MAX_SIZE=16 python run_https.py
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value not in (None, "") else default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value in (None, ""):
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _env_str(name: str, default: str) -> str:
+    value = os.getenv(name)
+    return value if value not in (None, "") else default
+
+
+# --- Thông số chụp ảnh gửi cho client (GET /capture/profile) ---
+# Kích thước tối đa ảnh client gửi lên (ảnh được thu nhỏ giữ tỉ lệ để nằm trong khung này).
+# YOLO chạy ở 640px; 1280px giữ đủ chi tiết để ảnh xe cắt ra vẫn rộng ~640px cho OCR
+CAPTURE_MAX_WIDTH = _env_int("SPAS_CAPTURE_MAX_WIDTH", 1280)
+CAPTURE_MAX_HEIGHT = _env_int("SPAS_CAPTURE_MAX_HEIGHT", 1280)
+# Định dạng nén trên client: "jpeg" (server giải mã rút gọn được, nhanh nhất) hoặc "webp"
+CAPTURE_FORMAT = _env_str("SPAS_CAPTURE_FORMAT", "jpeg")
+# Chất lượng nén (0..1, theo canvas.toBlob)
+CAPTURE_QUALITY = _env_float("SPAS_CAPTURE_QUALITY", 0.85)
+# Dung lượng tối đa 1 ảnh upload (byte); lớn hơn bị từ chối (413)
+CAPTURE_MAX_BYTES = _env_int("SPAS_CAPTURE_MAX_BYTES", 1536 * 1024)
+# Các định dạng ảnh server nhận (cách nhau bởi dấu phẩy); định dạng khác bị từ chối (415)
+CAPTURE_ACCEPT_FORMATS = _env_str("SPAS_CAPTURE_ACCEPT_FORMATS", "jpeg,webp")
+
+# --- Gom batch nhận diện xe (YOLO) giữa các request đồng thời ---
+# Bật/tắt bộ gom batch. Khi tắt, mỗi request tự chạy YOLO trên 1 ảnh như cũ.
+BATCH_ENABLED = _env_bool("SPAS_BATCH_ENABLED", True)
+# Số ảnh tối đa trong 1 lần gọi YOLO
+BATCH_MAX_SIZE = _env_int("SPAS_BATCH_MAX_SIZE", 8)
+# Thời gian chờ tối đa (ms) để gom thêm ảnh kể từ khi ảnh đầu tiên của batch tới
+BATCH_MAX_WAIT_MS = _env_float("SPAS_BATCH_MAX_WAIT_MS", 10.0)
+
+# --- Hàng đợi tiếp nhận /upload (admission control) ---
+# Số worker xử lý song song các bước nặng (YOLO, OCR, ghi DB, ghi file)
+UPLOAD_WORKERS = _env_int("SPAS_UPLOAD_WORKERS", 4)
+# Số request tối đa được phép chờ worker; vượt quá sẽ bị từ chối (429)
+UPLOAD_MAX_QUEUE = _env_int("SPAS_UPLOAD_MAX_QUEUE", 16)
+# Deadline mặc định của 1 request (ms); client có thể gửi header X-Request-Deadline-Ms
+UPLOAD_DEADLINE_MS = _env_float("SPAS_UPLOAD_DEADLINE_MS", 10000.0)
+
+# --- Log + đo thời gian (telemetry.py) ---
+# Mức log tối thiểu được ghi: DEBUG / INFO / WARNING / ERROR
+LOG_LEVEL = _env_str("SPAS_LOG_LEVEL", "INFO")
+# Định dạng log: "text" (dễ đọc) hoặc "json" (1 object/dòng, cho hệ thống gom log)
+LOG_FORMAT = _env_str("SPAS_LOG_FORMAT", "text")
+# Trả header Server-Timing (thời gian từng bước) trong response /upload
+SERVER_TIMING_ENABLED = _env_bool("SPAS_SERVER_TIMING", True)
+
+# --- Tiến trình suy luận dùng chung (inference_server.py) ---
+# Địa chỉ tiến trình giữ model YOLO + EasyOCR: "host:port" hoặc đường dẫn Unix socket.
+# Để trống: mỗi tiến trình API tự nạp model như cũ. Khi chạy nhiều worker uvicorn, đặt địa chỉ
+# này để mọi worker dùng chung 1 bản model (python inference_server.py)
+INFERENCE_ADDRESS = _env_str("SPAS_INFERENCE_ADDRESS", "")
+# Khóa xác thực kết nối giữa API và tiến trình suy luận
+INFERENCE_AUTHKEY = _env_str("SPAS_INFERENCE_AUTHKEY", "spas-inference")
+# Số thread xử lý ảnh trong tiến trình suy luận (năng lực suy luận, độc lập với số worker API)
+INFERENCE_WORKERS = _env_int("SPAS_INFERENCE_WORKERS", 2)
+# Số vùng nhớ dùng chung (shared memory) mỗi worker API, = số ảnh gửi đồng thời tối đa
+INFERENCE_SLOTS = _env_int("SPAS_INFERENCE_SLOTS", 8)
+# Dung lượng phần chứa ảnh xe (kết quả) trong mỗi vùng nhớ; ảnh xe lớn hơn được gửi qua socket
+INFERENCE_CROP_BYTES = _env_int("SPAS_INFERENCE_CROP_BYTES", 8 * 1024 * 1024)
+# Thời gian chờ tối đa 1 lần suy luận (giây)
+INFERENCE_TIMEOUT_S = _env_float("SPAS_INFERENCE_TIMEOUT_S", 30.0)
+
+# --- Backend nhận diện xe ---
+# "ultralytics" (PyTorch, mặc định), "onnx" (ONNX Runtime CPU) hoặc "openvino"
+DETECTOR_BACKEND = _env_str("SPAS_DETECTOR_BACKEND", "ultralytics")
+# Đường dẫn file model; để trống sẽ dùng mặc định của backend
+# (yolov8n.pt / yolov8n.onnx / yolov8n_openvino_model/yolov8n.xml)
+DETECTOR_MODEL = _env_str("SPAS_DETECTOR_MODEL", "")
+# Số thread CPU cho ONNX Runtime / OpenVINO (0 = để runtime tự chọn)
+DETECTOR_THREADS = _env_int("SPAS_DETECTOR_THREADS", 0)
+# Cho phép tự tải file model (yolov8n.pt, model EasyOCR) khi chưa có. Tắt (mặc định): thiếu file
+# thì báo lỗi rõ ràng ngay khi khởi động thay vì treo chờ tải trên máy không có mạng
+MODEL_DOWNLOAD = _env_bool("SPAS_MODEL_DOWNLOAD", False)
+# Chạy thử YOLO + OCR 1 lần sau khi nạp model, để xe đầu tiên không bị chậm
+MODEL_WARMUP = _env_bool("SPAS_MODEL_WARMUP", True)
+# Dùng model giả (stub_models) thay YOLO + EasyOCR: không cần torch/easyocr, không tải model.
+# Chỉ dành cho CI và benchmark trên ảnh tổng hợp (benchmarks/bench_pipeline.py)
+STUB_MODELS = _env_bool("SPAS_STUB_MODELS", False)
+
+# --- Định vị vùng biển số trước khi OCR ---
+# Bật: tìm vùng biển trong ảnh xe và chỉ OCR vùng đó (nhanh hơn, ít đọc nhầm chữ trên xe).
+# Không tìm được vùng biển thì tự động OCR cả ảnh xe như cũ.
+PLATE_LOCALIZATION_ENABLED = _env_bool("SPAS_PLATE_LOCALIZATION", True)
+
+# --- OCR biển số ---
+# Ngưỡng độ tin cậy (0..1) để dừng sớm: biến thể tiền xử lý đầu tiên đạt ngưỡng sẽ được dùng
+# luôn, không chạy thêm các biến thể còn lại
+OCR_CONFIDENCE_THRESHOLD = _env_float("SPAS_OCR_CONFIDENCE_THRESHOLD", 0.6)
+
+# --- Xử lý ảnh đa độ phân giải ---
+# Ảnh xe được cắt lại từ ảnh gốc ở mức giải mã JPEG nhỏ nhất (1/8, 1/4, 1/2, gốc)
+# mà vùng xe vẫn rộng ít nhất bấy nhiêu px
+CROP_MIN_WIDTH = _env_int("SPAS_CROP_MIN_WIDTH", 640)
+
+# --- Cache kết quả nhận diện cho ảnh chụp lại / bấm trùng ---
+RESULT_CACHE_ENABLED = _env_bool("SPAS_RESULT_CACHE", True)
+# Số ảnh tối đa được nhớ (LRU)
+RESULT_CACHE_SIZE = _env_int("SPAS_RESULT_CACHE_SIZE", 256)
+# Thời gian sống của 1 kết quả (giây)
+RESULT_CACHE_TTL_S = _env_float("SPAS_RESULT_CACHE_TTL_S", 10.0)
+# Số bit perceptual hash (256 bit) được phép lệch để coi là cùng 1 ảnh
+RESULT_CACHE_MAX_DISTANCE = _env_int("SPAS_RESULT_CACHE_MAX_DISTANCE", 12)
+
+# --- Check-out với biển số đọc gần đúng ---
+# Không có xe nào khớp chính xác biển số đọc được -> tìm xe trong bãi có biển gần nhất
+FUZZY_CHECKOUT_ENABLED = _env_bool("SPAS_FUZZY_CHECKOUT", True)
+# Khoảng cách tối đa được chấp nhận: mỗi ký tự dễ nhầm (O/0, B/8/3, S/5...) tính 0.25,
+# mỗi ký tự sai/thừa/thiếu khác tính 1. Mặc định 0.5: tối đa 2 ký tự dễ nhầm (phải < 2)
+FUZZY_CHECKOUT_MAX_DISTANCE = _env_float("SPAS_FUZZY_CHECKOUT_MAX_DISTANCE", 0.5)
+# Xe gần thứ 2 phải xa hơn xe gần nhất ít nhất bấy nhiêu, không thì coi là mơ hồ và từ chối
+FUZZY_CHECKOUT_MIN_MARGIN = _env_float("SPAS_FUZZY_CHECKOUT_MIN_MARGIN", 0.5)
+
+# --- Chế độ cổng tự động (WebSocket /ws/gate, stream_gate.py) ---
+# Số khung/giây tối đa nhận từ mỗi làn; khung tới nhanh hơn bị bỏ
+STREAM_MAX_FPS = _env_float("SPAS_STREAM_MAX_FPS", 4.0)
+# Khung tới khi khung trước chưa xử lý xong: "latest" = giữ khung mới nhất, "oldest" = bỏ khung mới
+STREAM_DROP_POLICY = _env_str("SPAS_STREAM_DROP_POLICY", "latest")
+# Phần CPU (của 1 nhân, 0..1) mỗi làn được dùng cho YOLO/OCR
+STREAM_CPU_BUDGET = _env_float("SPAS_STREAM_CPU_BUDGET", 0.5)
+# Tỉ lệ điểm ảnh khác ảnh nền (làn trống) để coi là có xe
+STREAM_PRESENCE_RATIO = _env_float("SPAS_STREAM_PRESENCE_RATIO", 0.08)
+# Tỉ lệ điểm ảnh khác khung trước để coi là còn chuyển động
+STREAM_MOTION_RATIO = _env_float("SPAS_STREAM_MOTION_RATIO", 0.02)
+# Số khung đứng yên liên tiếp trước khi chạy nhận diện
+STREAM_STABLE_FRAMES = _env_int("SPAS_STREAM_STABLE_FRAMES", 2)
+# Bỏ phiếu biển số trên bấy nhiêu lần đọc gần nhất
+STREAM_VOTE_WINDOW = _env_int("SPAS_STREAM_VOTE_WINDOW", 5)
+# Số phiếu tối thiểu để ghi check-in/check-out
+STREAM_VOTE_MIN = _env_int("SPAS_STREAM_VOTE_MIN", 3)
+# Xe/vật đứng yên trong làn quá bấy nhiêu giây sau khi đã ghi -> lấy làm ảnh nền mới
+STREAM_ABSORB_AFTER_S = _env_float("SPAS_STREAM_ABSORB_AFTER_S", 30.0)
+
+# --- Bảng giá + thống kê (tariff.py, rollups.py) ---
+# Các bậc giá "số giờ tối đa:mức phí (VNĐ)", bậc cuối "*" = không giới hạn số giờ
+TARIFF = _env_str("SPAS_TARIFF", "4:5000,12:30000,*:50000")
+
+# --- SQLite ---
+# Chế độ journal: WAL cho phép đọc và ghi song song
+SQLITE_JOURNAL_MODE = _env_str("SPAS_SQLITE_JOURNAL_MODE", "WAL")
+# NORMAL: an toàn với WAL (chỉ có thể mất giao dịch cuối nếu mất điện), nhanh hơn FULL nhiều
+SQLITE_SYNCHRONOUS = _env_str("SPAS_SQLITE_SYNCHRONOUS", "NORMAL")
+# Bộ nhớ đệm trang dữ liệu cho mỗi kết nối (KB)
+SQLITE_CACHE_SIZE_KB = _env_int("SPAS_SQLITE_CACHE_SIZE_KB", 20000)
+# Kích thước vùng memory-map file DB (byte)
+SQLITE_MMAP_SIZE = _env_int("SPAS_SQLITE_MMAP_SIZE", 256 * 1024 * 1024)
+# Thời gian chờ khóa ghi trước khi báo "database is locked" (ms)
+SQLITE_BUSY_TIMEOUT_MS = _env_int("SPAS_SQLITE_BUSY_TIMEOUT_MS", 5000)
+
+# --- Thread ghi check-in/check-out (session_writer.py) ---
+# Số lượt vào/ra tối đa ghi chung trong 1 giao dịch (group commit)
+SESSION_COMMIT_MAX_BATCH = _env_int("SPAS_SESSION_COMMIT_MAX_BATCH", 64)
+# Thời gian chờ thêm lượt vào/ra cho lô (ms). 0 = chỉ gom các lượt đang chờ sẵn, không làm chậm lượt lẻ
+SESSION_COMMIT_MAX_WAIT_MS = _env_float("SPAS_SESSION_COMMIT_MAX_WAIT_MS", 0.0)
+
+# --- Xóa dữ liệu cũ (purge) ---
+# Số session xóa trong 1 giao dịch (giao dịch ngắn -> check-in/out không phải chờ lâu)
+PURGE_BATCH_SIZE = _env_int("SPAS_PURGE_BATCH_SIZE", 500)
+# Số thread xóa file ảnh chạy nền
+PURGE_FILE_WORKERS = _env_int("SPAS_PURGE_FILE_WORKERS", 4)
+# Thư mục chứa file nén ảnh khi chọn "lưu ảnh vào file nén" thay vì xóa
+PURGE_ARCHIVE_DIR = _env_str("SPAS_PURGE_ARCHIVE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "archive"))
+
+# --- Kho ảnh (uploads/, crops/) ---
+# Nén lại ảnh gốc khi lưu: "" = giữ nguyên byte ảnh upload, hoặc "jpg" / "webp"
+IMAGE_STORE_FORMAT = _env_str("SPAS_IMAGE_STORE_FORMAT", "")
+# Chất lượng nén (0..100) cho ảnh gốc được nén lại và ảnh cắt vùng xe
+IMAGE_STORE_QUALITY = _env_int("SPAS_IMAGE_STORE_QUALITY", 90)
+# Số thread ghi ảnh chạy nền
+IMAGE_STORE_WORKERS = _env_int("SPAS_IMAGE_STORE_WORKERS", 2)
+
+# --- Gom ảnh cũ vào file pack (image_pack.py) ---
+# Thư mục chứa các file pack
+PACK_DIR = _env_str("SPAS_PACK_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "packs"))
+# Ảnh của session vào bãi cách đây hơn bấy nhiêu ngày sẽ được gom vào pack
+PACK_AFTER_DAYS = _env_float("SPAS_PACK_AFTER_DAYS", 30.0)
+# Kích thước tối đa 1 file pack (byte); đầy thì mở file pack mới
+PACK_MAX_BYTES = _env_int("SPAS_PACK_MAX_BYTES", 1024 * 1024 * 1024)
+# Số session xử lý mỗi lượt gom (mỗi lượt 1 lần fsync + 1 giao dịch ghi chỉ mục)
+PACK_BATCH_SIZE = _env_int("SPAS_PACK_BATCH_SIZE", 500)
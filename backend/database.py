@@ -1,14 +1,50 @@
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Float
+from sqlalchemy import create_engine, event, text, Column, Integer, String, DateTime, Float, Index, Boolean
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from datetime import datetime
 
+import config
+
 # 1. Cấu hình SQLite (File database sẽ tên là parking.db)
 SQLALCHEMY_DATABASE_URL = "sqlite:///./parking.db"
 
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
 )
+
+# Tinh chỉnh SQLite cho MỌI kết nối trong pool (PRAGMA chỉ có hiệu lực trên từng kết nối):
+# - WAL: đọc (báo cáo) không chặn ghi (check-in/out) và ngược lại
+# - synchronous=NORMAL: an toàn với WAL, bớt fsync mỗi lần commit
+# - cache_size / mmap_size: giữ trang dữ liệu nóng trong RAM
+# - busy_timeout: chờ khóa thay vì lỗi ngay "database is locked"
+@event.listens_for(engine, "connect")
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={config.SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={config.SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA cache_size=-{config.SQLITE_CACHE_SIZE_KB}")
+    cursor.execute(f"PRAGMA mmap_size={config.SQLITE_MMAP_SIZE}")
+    cursor.execute(f"PRAGMA busy_timeout={config.SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+# Kết nối ghi check-in/check-out (session_writer.py): mỗi giao dịch mở bằng BEGIN IMMEDIATE, tức
+# nắm khóa ghi SQLite ngay từ lệnh đọc đầu tiên. Nhiều tiến trình API cùng ghi 1 file DB thì các
+# lô ghi lần lượt, lô sau luôn đọc thấy lô trước (kiểm tra xe trong bãi + ghi không bị chen ngang)
+write_engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+)
+event.listen(write_engine, "connect", _set_sqlite_pragmas)
+
+@event.listens_for(write_engine, "connect")
+def _manual_begin(dbapi_connection, connection_record):
+    # Tắt BEGIN tự động của sqlite3 (chỉ mở giao dịch trước lệnh ghi), để _begin_immediate tự mở
+    dbapi_connection.isolation_level = None
+
+@event.listens_for(write_engine, "begin")
+def _begin_immediate(conn):
+    conn.exec_driver_sql("BEGIN IMMEDIATE")
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
@@ -29,10 +65,57 @@ class ParkingSession(Base):
     
     fee = Column(Float, default=0.0)
 
-# 3. Hàm tạo bảng (Chạy 1 lần đầu để sinh file .db)
+    __table_args__ = (
+        # Tìm session đang mở theo biển số: chỉ đánh chỉ mục các dòng PARKING (chỉ mục nhỏ, luôn nóng).
+        # UNIQUE: DB không cho 2 session mở cùng biển số, kể cả khi chỉ mục trong RAM bị lệch
+        Index("ix_sessions_open_plate", "plate_number", unique=True, sqlite_where=text("status = 'PARKING'")),
+        # Báo cáo / xóa dữ liệu theo khoảng thời gian vào
+        Index("ix_sessions_checkin_time", "checkin_time"),
+    )
+
+# 3. Danh sách file ảnh chờ xóa / chờ đưa vào file nén (purge.py).
+# Được ghi cùng giao dịch với lệnh xóa session, nên tắt server giữa chừng thì khởi động lại
+# vẫn dọn tiếp được các file còn sót.
+class PurgeFile(Base):
+    __tablename__ = "purge_queue"
+
+    id = Column(Integer, primary_key=True)
+    path = Column(String, nullable=False)    # Đường dẫn file ảnh cần dọn
+    archive = Column(String, nullable=True)  # File .zip để chuyển ảnh vào; None = xóa hẳn
+    created_at = Column(DateTime, default=datetime.now)
+
+# 4. Chỉ mục ảnh đã được gom vào file pack (image_pack.py): ảnh nằm ở đoạn
+# [offset, offset + length) của file pack, không còn file rời trong uploads/ / crops/.
+class PackedImage(Base):
+    __tablename__ = "packed_images"
+
+    name = Column(String, primary_key=True)    # Tên ảnh như trong checkin_img / checkout_img
+    crop = Column(Boolean, primary_key=True)   # True = ảnh cắt vùng xe của ảnh `name`
+    pack = Column(String, nullable=False)      # Tên file pack
+    offset = Column(Integer, nullable=False)
+    length = Column(Integer, nullable=False)
+    packed_at = Column(DateTime, default=datetime.now)
+
+# 5. Số liệu tổng hợp theo giờ / theo ngày (rollups.py): được cập nhật trong CÙNG giao dịch
+# với mỗi lần check-in/check-out, nên GET /stats chỉ đọc bảng nhỏ này thay vì quét parking_sessions.
+class StatsRollup(Base):
+    __tablename__ = "stats_rollups"
+
+    period = Column(String, primary_key=True)         # "hour" | "day"
+    bucket_start = Column(DateTime, primary_key=True) # Đầu giờ / đầu ngày (giờ địa phương)
+    checkins = Column(Integer, nullable=False, default=0)
+    checkouts = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0.0)       # Tổng phí các lượt ra trong khoảng
+    dwell_seconds = Column(Float, nullable=False, default=0.0) # Tổng thời gian gửi các lượt ra
+    peak_occupancy = Column(Integer, nullable=False, default=0)  # Số xe trong bãi cao nhất
+    occupancy_end = Column(Integer, nullable=False, default=0)   # Số xe trong bãi sau lượt vào/ra cuối cùng
+
+# 6. Hàm tạo bảng (Chạy 1 lần đầu để sinh file .db)
 def init_db():
-    Base.metadata.create_all(bind=engine)
-    print("Đã tạo xong database parking.db!")
+    # Tạo/nâng cấp schema qua cơ chế migration có đánh số phiên bản (migrations.py)
+    import migrations
+    version = migrations.upgrade(engine)
+    print(f"Đã tạo xong database parking.db! (schema version {version})")
 
 # Hàm tiện ích để lấy kết nối DB
 def get_db():
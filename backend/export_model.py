@@ -0,0 +1,114 @@
+"""
+Export model YOLOv8 sang ONNX / OpenVINO để chạy nhanh trên CPU, có thể lượng tử hoá INT8.
+
+Ví dụ:
+    python export_model.py --format onnx
+    python export_model.py --format onnx --int8 --calib-dir uploads
+    python export_model.py --format openvino
+
+Sau đó chạy backend với:
+    SPAS_DETECTOR_BACKEND=onnx SPAS_DETECTOR_MODEL=yolov8n_int8.onnx python run_https.py
+Nên chạy parity_check.py để chắc chắn backend mới cắt đúng xe như backend mặc định.
+"""
+import argparse
+import glob
+import os
+
+import cv2
+import numpy as np
+
+from inference_backends import letterbox
+
+IMAGE_PATTERNS = ("*.jpg", "*.jpeg", "*.png")
+
+
+def export(weights: str, fmt: str, imgsz: int, dynamic: bool) -> str:
+    """Export bằng Ultralytics, trả về đường dẫn model đã export."""
+    from ultralytics import YOLO
+
+    model = YOLO(weights)
+    kwargs = {"format": fmt, "imgsz": imgsz, "dynamic": dynamic}
+    if fmt == "onnx":
+        kwargs.update(simplify=True, opset=12)
+    path = model.export(**kwargs)
+    if fmt == "openvino":
+        # Ultralytics trả về thư mục chứa file .xml
+        xml = glob.glob(os.path.join(path, "*.xml"))
+        path = xml[0] if xml else path
+    return path
+
+
+def _calibration_images(calib_dir: str, limit: int):
+    paths = []
+    for pattern in IMAGE_PATTERNS:
+        paths.extend(glob.glob(os.path.join(calib_dir, "**", pattern), recursive=True))
+    return sorted(paths)[:limit]
+
+
+def quantize_onnx(model_path: str, output_path: str, imgsz: int, calib_dir: str = None, calib_limit: int = 100) -> str:
+    """
+    Lượng tử hoá INT8 model ONNX.
+    - Có `calib_dir`: lượng tử hoá tĩnh (QDQ) với ảnh thật làm dữ liệu hiệu chuẩn (chính xác hơn).
+    - Không có: lượng tử hoá động chỉ trọng số.
+    """
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_dynamic, quantize_static
+
+    if not calib_dir:
+        quantize_dynamic(model_path, output_path, weight_type=QuantType.QUInt8)
+        return output_path
+
+    images = _calibration_images(calib_dir, calib_limit)
+    if not images:
+        raise SystemExit(f"Không có ảnh hiệu chuẩn trong '{calib_dir}'")
+
+    import onnxruntime as ort
+    input_name = ort.InferenceSession(model_path, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+
+    class _Reader(CalibrationDataReader):
+        def __init__(self):
+            self._it = iter(images)
+
+        def get_next(self):
+            for path in self._it:
+                img = cv2.imread(path)
+                if img is None:
+                    continue
+                padded, _, _ = letterbox(img, imgsz)
+                blob = np.ascontiguousarray(padded[:, :, ::-1].transpose(2, 0, 1), dtype=np.float32) / 255.0
+                return {input_name: blob[None]}
+            return None
+
+    quantize_static(
+        model_path, output_path, _Reader(),
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=True,
+    )
+    return output_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export YOLOv8 sang ONNX/OpenVINO (+ INT8)")
+    parser.add_argument("--weights", default="yolov8n.pt")
+    parser.add_argument("--format", choices=["onnx", "openvino"], default="onnx")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--dynamic", action="store_true", help="Cho phép batch động (chạy cả batch 1 lần)")
+    parser.add_argument("--int8", action="store_true", help="Lượng tử hoá INT8 (chỉ với ONNX)")
+    parser.add_argument("--calib-dir", default=None, help="Thư mục ảnh dùng hiệu chuẩn INT8 tĩnh")
+    parser.add_argument("--calib-limit", type=int, default=100)
+    args = parser.parse_args()
+
+    path = export(args.weights, args.format, args.imgsz, args.dynamic)
+    print(f"Đã export: {path}")
+
+    if args.int8:
+        if args.format != "onnx":
+            raise SystemExit("--int8 chỉ hỗ trợ với --format onnx")
+        out = os.path.splitext(path)[0] + "_int8.onnx"
+        quantize_onnx(path, out, args.imgsz, args.calib_dir, args.calib_limit)
+        print(f"Đã lượng tử hoá INT8: {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+import struct
+
+import cv2
+import numpy as np
+
+import config
+
+# Chiều rộng ảnh đưa vào YOLO (YOLOv8n được train ở 640x640)
+DETECTION_WIDTH = 640
+
+# Các mức giải mã rút gọn của libjpeg (giải mã thẳng ra ảnh 1/2, 1/4, 1/8 - rẻ hơn nhiều
+# so với giải mã full rồi resize)
+_REDUCED_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+
+# Marker SOF (Start Of Frame) chứa kích thước ảnh JPEG (bỏ DHT=C4, JPG=C8, DAC=CC)
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def jpeg_dimensions(data):
+    """Đọc (width, height) từ header JPEG mà không giải mã ảnh. Không phải JPEG -> None."""
+    if len(data) < 4 or data[0] != 0xFF or data[1] != 0xD8:
+        return None
+    i = 2
+    n = len(data)
+    while i + 4 <= n:
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:  # byte đệm
+            i += 1
+            continue
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            i += 2
+            continue
+        length = struct.unpack(">H", data[i + 2:i + 4])[0]
+        if marker in _SOF_MARKERS:
+            if i + 9 > n:
+                return None
+            height, width = struct.unpack(">HH", data[i + 5:i + 9])
+            return width, height
+        i += 2 + length
+    return None
+
+
+class Frame:
+    """
+    1 ảnh upload ở nhiều độ phân giải:
+    - `det_img`: ảnh nhỏ (<= 640px) dùng cho YOLO, giải mã rút gọn nếu là JPEG.
+    - `crop()`: cắt vùng xe ở mức giải mã vừa đủ chi tiết cho OCR (tới mức ảnh gốc),
+      chỉ giải mã khi thực sự cần. Box trên `det_img` được quy đổi theo tỉ lệ.
+    """
+
+    def __init__(self, data, det_img, full_img=None, full_width: int = None):
+        self.data = data
+        self.det_img = det_img
+        self._decoded = {}
+        if full_img is not None:
+            self._decoded[1] = full_img
+            full_width = full_img.shape[1]
+        self.full_width = full_width or det_img.shape[1]
+
+    def _decode(self, factor: int):
+        """Giải mã ảnh ở mức 1/factor (1 = ảnh gốc), có cache."""
+        img = self._decoded.get(factor)
+        if img is None:
+            flag = dict(_REDUCED_FLAGS).get(factor, cv2.IMREAD_COLOR)
+            img = cv2.imdecode(np.frombuffer(self.data, np.uint8), flag)
+            self._decoded[factor] = img
+        return img
+
+    def full(self):
+        """Ảnh gốc đầy đủ điểm ảnh."""
+        return self._decode(1)
+
+    def crop(self, box, min_width: int = None):
+        """
+        Cắt vùng `box` (toạ độ `det_img`) từ ảnh ở mức giải mã nhỏ nhất mà vùng cắt
+        vẫn rộng >= `min_width` px (mặc định `config.CROP_MIN_WIDTH`; từ ảnh gốc nếu không mức nào đủ).
+        """
+        if box is None:
+            return None
+        if min_width is None:
+            min_width = config.CROP_MIN_WIDTH
+        box_width_full = (box[2] - box[0]) * self.full_width / float(self.det_img.shape[1])
+        factor = 1
+        if 1 not in self._decoded:
+            for f, _ in _REDUCED_FLAGS:
+                if box_width_full / f >= min_width:
+                    factor = f
+                    break
+        img = self._decode(factor)
+        if img is None:
+            return None
+
+        h, w = img.shape[:2]
+        sx = w / float(self.det_img.shape[1])
+        sy = h / float(self.det_img.shape[0])
+        x1, y1, x2, y2 = box
+        x1, y1 = max(0, int(x1 * sx)), max(0, int(y1 * sy))
+        x2, y2 = min(w, int(round(x2 * sx))), min(h, int(round(y2 * sy)))
+        return img[y1:y2, x1:x2]
+
+
+def decode_frame(image_data, detection_width: int = DETECTION_WIDTH):
+    """
+    Giải mã ảnh (bytes) cho bước nhận diện.
+    JPEG lớn được giải mã rút gọn (1/2, 1/4, 1/8) sao cho chiều rộng vẫn >= `detection_width`,
+    rồi resize về đúng chiều rộng `detection_width`. Trả về `Frame` hoặc None.
+    """
+    nparr = np.frombuffer(image_data, np.uint8)
+    flag = cv2.IMREAD_COLOR
+    dims = jpeg_dimensions(image_data)
+    if dims is not None:
+        width = dims[0]
+        for factor, reduced_flag in _REDUCED_FLAGS:
+            if width // factor >= detection_width:
+                flag = reduced_flag
+                break
+
+    img = cv2.imdecode(nparr, flag)
+    if img is None:
+        return None
+
+    # Ảnh đã giải mã full (không phải JPEG hoặc ảnh nhỏ) -> giữ lại làm ảnh gốc, khỏi giải mã lại
+    full_img = img if flag == cv2.IMREAD_COLOR else None
+    full_width = dims[0] if dims is not None else None
+
+    # Resize ảnh lớn xuống kích thước vừa phải để YOLO chạy nhanh hơn
+    height, width = img.shape[:2]
+    if width > detection_width:
+        scale = detection_width / width
+        img = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+    return Frame(image_data, img, full_img, full_width)
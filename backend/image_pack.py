@@ -0,0 +1,259 @@
+"""
+Gom ảnh cũ (ảnh gốc + ảnh cắt) vào file pack để giữ lại làm bằng chứng khi khiếu nại
+mà không để lại hàng triệu file nhỏ.
+
+- File pack `pack_000001.pack` chỉ ghi nối thêm (append-only): byte ảnh nối tiếp nhau,
+  vị trí mỗi ảnh (pack, offset, length) nằm trong bảng `packed_images`.
+- Mỗi lượt gom: ghi nối ảnh vào pack -> fsync -> ghi chỉ mục (1 giao dịch) -> xóa file rời.
+  Tắt giữa chừng chỉ để lại vài byte thừa cuối pack, ảnh vẫn còn nguyên ở file rời.
+- Đọc: file rời (image_store) trước, không có thì cắt thẳng 1 đoạn trên file pack đã
+  memory-map (memoryview, không copy).
+
+Chạy tay (cùng lúc chỉ 1 tiến trình được gom):
+    python image_pack.py                # gom ảnh cũ hơn SPAS_PACK_AFTER_DAYS ngày
+    python image_pack.py --days 7
+    python image_pack.py --stats
+"""
+import argparse
+import mmap
+import os
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert, select
+
+import config
+import database
+import image_store
+
+PACK_NAME = re.compile(r"^pack_(\d{6})\.pack$")
+
+
+class PackStore:
+    """Các file pack trong `pack_dir`: ghi nối thêm + đọc qua mmap."""
+
+    def __init__(self, pack_dir: str, max_pack_bytes: int = 1024 * 1024 * 1024):
+        self.pack_dir = pack_dir
+        self.max_pack_bytes = max(1, int(max_pack_bytes))
+        self._maps = {}  # tên pack -> mmap (chỉ đọc)
+        self._map_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    def _pack_names(self):
+        if not os.path.isdir(self.pack_dir):
+            return []
+        return sorted(n for n in os.listdir(self.pack_dir) if PACK_NAME.match(n))
+
+    def _writable_pack(self, incoming: int) -> str:
+        """Pack cuối còn chỗ cho `incoming` byte, hoặc tên pack mới."""
+        names = self._pack_names()
+        if names:
+            last = names[-1]
+            size = os.path.getsize(os.path.join(self.pack_dir, last))
+            if size == 0 or size + incoming <= self.max_pack_bytes:
+                return last
+            number = int(PACK_NAME.match(last).group(1)) + 1
+        else:
+            number = 1
+        return f"pack_{number:06d}.pack"
+
+    def append(self, items):
+        """
+        Ghi nối các ảnh `items` = [(name, crop, path)] vào pack, fsync rồi trả về
+        các dòng chỉ mục [{name, crop, pack, offset, length}]. File rời không đọc được bị bỏ qua.
+        """
+        rows = []
+        os.makedirs(self.pack_dir, exist_ok=True)
+        with self._write_lock:
+            f = pack = None
+            try:
+                for name, crop, path in items:
+                    try:
+                        with open(path, "rb") as src:
+                            data = src.read()
+                    except FileNotFoundError:
+                        continue
+                    if f is None or f.tell() + len(data) > self.max_pack_bytes:
+                        if f is not None:
+                            f.flush()
+                            os.fsync(f.fileno())
+                            f.close()
+                        pack = self._writable_pack(len(data))
+                        f = open(os.path.join(self.pack_dir, pack), "ab")
+                    offset = f.tell()
+                    f.write(data)
+                    rows.append({"name": name, "crop": crop, "pack": pack, "offset": offset, "length": len(data)})
+            finally:
+                if f is not None:
+                    f.flush()
+                    os.fsync(f.fileno())
+                    f.close()
+        return rows
+
+    def _map(self, pack: str, end: int):
+        with self._map_lock:
+            mm = self._maps.get(pack)
+            if mm is None or len(mm) < end:
+                # Pack đang được ghi thêm: map lại để thấy phần mới. Map cũ không đóng
+                # (có thể còn memoryview đang dùng), để GC thu hồi.
+                with open(os.path.join(self.pack_dir, pack), "rb") as f:
+                    mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self._maps[pack] = mm
+            return mm
+
+    def read(self, pack: str, offset: int, length: int) -> memoryview:
+        """Đoạn byte của 1 ảnh trong pack (memoryview trên mmap, không copy)."""
+        mm = self._map(pack, offset + length)
+        if len(mm) < offset + length:
+            raise ValueError(f"Pack {pack} ngắn hơn chỉ mục ({len(mm)} < {offset + length})")
+        return memoryview(mm)[offset:offset + length]
+
+    def total_bytes(self) -> int:
+        return sum(os.path.getsize(os.path.join(self.pack_dir, n)) for n in self._pack_names())
+
+    def pack_count(self) -> int:
+        return len(self._pack_names())
+
+
+# Kho pack dùng chung của tiến trình
+packs = PackStore(config.PACK_DIR, config.PACK_MAX_BYTES)
+
+
+def lookup(name: str, crop: bool = False):
+    """Vị trí ảnh trong pack (pack, offset, length) hoặc None nếu ảnh chưa được gom."""
+    # SQL thuần qua driver: bỏ chi phí dựng câu lệnh SQLAlchemy trên đường đọc ảnh
+    with database.engine.connect() as conn:
+        return conn.exec_driver_sql(
+            "SELECT pack, offset, length FROM packed_images WHERE name = ? AND crop = ?", (name, bool(crop))
+        ).first()
+
+
+def read(name: str, crop: bool = False, store: image_store.ImageStore = None, pack_store: PackStore = None):
+    """
+    Byte ảnh gốc / ảnh cắt của `name`: từ file rời (bytes) hoặc từ pack (memoryview).
+    File rời được kiểm tra trước: lúc gom, chỉ mục được ghi trước khi xóa file rời,
+    nên ảnh luôn tìm thấy ở 1 trong 2 nơi. None nếu không có.
+    """
+    store = store or image_store.store
+    pack_store = pack_store or packs
+    data = store.read(name, crop=crop)
+    if data is not None:
+        return data
+    loc = lookup(name, crop)
+    if loc is None:
+        return None
+    return pack_store.read(loc.pack, loc.offset, loc.length)
+
+
+def compact(days: float = None, batch_size: int = None, store: image_store.ImageStore = None,
+            pack_store: PackStore = None) -> dict:
+    """
+    Gom ảnh (gốc + cắt) của các session vào bãi trước `days` ngày vào pack rồi xóa file rời.
+    Trả về thống kê lượt gom.
+    """
+    days = config.PACK_AFTER_DAYS if days is None else days
+    batch_size = max(1, int(batch_size or config.PACK_BATCH_SIZE))
+    store = store or image_store.store
+    pack_store = pack_store or packs
+    S = database.ParkingSession.__table__
+    P = database.PackedImage.__table__
+    cutoff = datetime.now() - timedelta(days=days)
+
+    # Ảnh của session vừa tạo có thể vẫn nằm trong hàng đợi ghi nền
+    store.flush()
+    t0 = time.perf_counter()
+    files = packed_bytes = freed = 0
+    last_id = 0
+    while True:
+        with database.engine.connect() as conn:
+            rows = conn.execute(
+                select(S.c.id, S.c.checkin_img, S.c.checkout_img)
+                .where(S.c.checkin_time < cutoff, S.c.id > last_id)
+                .order_by(S.c.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            names = sorted({n for row in rows for n in (row.checkin_img, row.checkout_img) if n})
+            already = {
+                (r.name, bool(r.crop))
+                for r in conn.execute(select(P.c.name, P.c.crop).where(P.c.name.in_(names)))
+            } if names else set()
+        last_id = rows[-1].id
+
+        items = []
+        for name in names:
+            for crop, path in ((False, store.path(name)), (True, store.crop_path(name))):
+                if (name, crop) in already:
+                    # Đã có trong pack (VD: lần gom trước tắt giữa chừng trước khi xóa file rời)
+                    freed += image_store.remove_file(path) or 0
+                elif os.path.exists(path):
+                    items.append((name, crop, path))
+        if not items:
+            continue
+
+        index_rows = pack_store.append(items)
+        if index_rows:
+            with database.engine.begin() as conn:
+                conn.execute(insert(P), index_rows)
+        packed = {(r["name"], r["crop"]) for r in index_rows}
+        for name, crop, path in items:
+            if (name, crop) in packed:
+                freed += image_store.remove_file(path) or 0
+        files += len(index_rows)
+        packed_bytes += sum(r["length"] for r in index_rows)
+
+    elapsed = time.perf_counter() - t0
+    return {
+        "files_packed": files,
+        "bytes_packed": packed_bytes,
+        "bytes_freed": freed,
+        "elapsed_s": round(elapsed, 3),
+        "files_per_s": round(files / elapsed, 1) if elapsed else 0.0,
+        "mb_per_s": round(packed_bytes / 1e6 / elapsed, 2) if elapsed else 0.0,
+    }
+
+
+def forget(conn, names):
+    """Xóa chỉ mục pack của các ảnh `names` (gọi trong giao dịch xóa session).
+    Byte ảnh vẫn nằm trong pack (append-only) nhưng không còn đọc được."""
+    P = database.PackedImage.__table__
+    names = list(names)
+    for i in range(0, len(names), 500):
+        conn.execute(P.delete().where(P.c.name.in_(names[i:i + 500])))
+
+
+def stats(pack_store: PackStore = None) -> dict:
+    pack_store = pack_store or packs
+    P = database.PackedImage.__table__
+    with database.engine.connect() as conn:
+        count, live = conn.execute(select(func.count(), func.coalesce(func.sum(P.c.length), 0))).one()
+    total = pack_store.total_bytes()
+    return {
+        "packs": pack_store.pack_count(),
+        "images": count,
+        "live_bytes": live,
+        "pack_bytes": total,
+        # Byte của ảnh đã bị xóa dữ liệu (purge) hoặc ghi dở, vẫn nằm trong pack
+        "dead_bytes": max(0, total - live),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gom ảnh cũ vào file pack")
+    parser.add_argument("--days", type=float, default=None, help="Gom ảnh của session vào bãi trước bấy nhiêu ngày")
+    parser.add_argument("--stats", action="store_true", help="Chỉ xem thống kê pack")
+    args = parser.parse_args()
+
+    import migrations
+    migrations.upgrade(database.engine, verbose=False)
+    if not args.stats:
+        print(compact(args.days))
+        image_store.store.shutdown()
+    print(stats())
+
+
+if __name__ == "__main__":
+    main()
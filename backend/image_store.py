@@ -0,0 +1,241 @@
+"""
+Kho ảnh gốc + ảnh cắt vùng xe, ghi file ở chế độ nền (write-behind).
+
+- Tên ảnh = hash nội dung (BLAKE2b) ảnh gốc, chia thư mục con theo 2 cấp tiền tố hash:
+  `uploads/ab/cd/abcd....jpg`, ảnh cắt tương ứng `crops/ab/cd/crop_abcd....jpg`.
+  Không còn trùng tên khi 2 ảnh tới trong cùng 1 giây, mỗi thư mục chỉ vài trăm file
+  dù kho có hàng trăm nghìn ảnh.
+- `save()` / `save_crop()` chỉ đưa ảnh vào hàng đợi rồi trả về ngay; thread nền mã hóa
+  (tùy chọn nén lại sang định dạng/chất lượng gọn hơn) và ghi file qua file tạm + rename,
+  nên không bao giờ thấy file ghi dở. Ảnh chưa kịp ghi vẫn đọc được từ RAM (`read()`).
+- Tên cũ dạng phẳng (`1767427704_a.jpg`, `crop_1767427704_a.jpg`) vẫn được phân giải như cũ.
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+import config
+import telemetry
+
+log = logging.getLogger("spas.images")
+
+# Đuôi file ảnh được giữ nguyên khi không nén lại; đuôi lạ -> ".jpg" (ảnh từ camera là JPEG)
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".webp", ".bmp")
+# Số ký tự hash cho mỗi cấp thư mục con
+SHARD_WIDTH = 2
+
+
+def _ext_of(filename: str) -> str:
+    ext = os.path.splitext(filename or "")[1].lower()
+    return ext if ext in IMAGE_EXTS else ".jpg"
+
+
+def _encode_params(ext: str, quality: int):
+    if ext in (".jpg", ".jpeg"):
+        return [cv2.IMWRITE_JPEG_QUALITY, quality]
+    if ext == ".webp":
+        return [cv2.IMWRITE_WEBP_QUALITY, quality]
+    return []
+
+
+def original_path(upload_dir: str, name: str) -> str:
+    """Đường dẫn ảnh gốc (tên phân thư mục `ab/cd/<hash>.jpg` hoặc tên phẳng kiểu cũ)."""
+    return os.path.join(upload_dir, *name.split("/"))
+
+
+def crop_path(crop_dir: str, name: str) -> str:
+    """Đường dẫn ảnh cắt vùng xe của ảnh `name` (cùng thư mục con, tiền tố `crop_`)."""
+    parts = name.split("/")
+    parts[-1] = f"crop_{parts[-1]}"
+    return os.path.join(crop_dir, *parts)
+
+
+def archive_name(path: str) -> str:
+    """Tên trong file nén: `<uploads|crops>/[ab/cd/]<file>` (giữ nguyên các cấp thư mục con theo hash)."""
+    parts = [os.path.basename(path)]
+    head = os.path.dirname(path)
+    while True:
+        head, part = os.path.split(head)
+        parts.insert(0, part)
+        if not (len(part) == SHARD_WIDTH and all(c in "0123456789abcdef" for c in part)):
+            return "/".join(parts)
+
+
+def _write_atomic(path: str, data: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def remove_file(path: str):
+    """Xóa 1 file, trả về số byte giải phóng (None nếu file không còn)."""
+    try:
+        size = os.path.getsize(path)
+        os.remove(path)
+        return size
+    except FileNotFoundError:
+        return None
+
+
+class ImageStore:
+    """
+    Kho ảnh ghi nền. `fmt` rỗng: giữ nguyên byte ảnh gốc; "jpg"/"webp"/...: nén lại ảnh gốc
+    sang định dạng đó với chất lượng `quality` (ảnh cắt luôn được mã hóa cùng đuôi với ảnh gốc).
+    """
+
+    def __init__(self, upload_dir: str, crop_dir: str, fmt: str = "", quality: int = 90, workers: int = 2):
+        self.upload_dir = upload_dir
+        self.crop_dir = crop_dir
+        self.fmt = f".{fmt.lower().lstrip('.')}" if fmt else ""
+        self.quality = int(quality)
+        os.makedirs(upload_dir, exist_ok=True)
+        os.makedirs(crop_dir, exist_ok=True)
+        self._executor = ThreadPoolExecutor(max_workers=max(1, int(workers)), thread_name_prefix="image-writer")
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._pending = {}  # đường dẫn -> byte ảnh gốc / ảnh numpy chưa ghi
+        self.writes = 0
+        self.deduplicated = 0
+        self.errors = 0
+        self.bytes_in = 0
+        self.bytes_written = 0
+
+    # --- Tên / đường dẫn ---
+    def name_for(self, content: bytes, filename: str = None) -> str:
+        """Tên lưu trữ của ảnh: `ab/cd/<hash><đuôi>` (cùng nội dung -> cùng tên)."""
+        digest = hashlib.blake2b(content, digest_size=16).hexdigest()
+        ext = self.fmt or _ext_of(filename)
+        return f"{digest[:SHARD_WIDTH]}/{digest[SHARD_WIDTH:2 * SHARD_WIDTH]}/{digest}{ext}"
+
+    def path(self, name: str) -> str:
+        return original_path(self.upload_dir, name)
+
+    def crop_path(self, name: str) -> str:
+        return crop_path(self.crop_dir, name)
+
+    def paths(self, name: str):
+        """Các file của 1 lần chụp: ảnh gốc + ảnh cắt vùng xe."""
+        if not name:
+            return []
+        return [self.path(name), self.crop_path(name)]
+
+    # --- Ghi ---
+    def save(self, content: bytes, filename: str = None) -> str:
+        """Đưa ảnh gốc vào hàng đợi ghi, trả về tên lưu trữ ngay (chưa chờ ghi xong)."""
+        name = self.name_for(content, filename)
+        self._submit(self.path(name), content)
+        return name
+
+    def save_crop(self, name: str, img) -> str:
+        """Đưa ảnh cắt (numpy BGR) của ảnh `name` vào hàng đợi ghi, trả về tên file ảnh cắt."""
+        path = self.crop_path(name)
+        self._submit(path, img)
+        return os.path.basename(path)
+
+    def _submit(self, path: str, payload):
+        with self._lock:
+            if path in self._pending:
+                return
+            self._pending[path] = payload
+        self._executor.submit(self._write, path, payload)
+
+    def _encode(self, path: str, payload) -> bytes:
+        ext = os.path.splitext(path)[1]
+        if isinstance(payload, np.ndarray):
+            img = payload
+        elif self.fmt:
+            img = cv2.imdecode(np.frombuffer(payload, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if img is None:  # không giải mã được -> lưu nguyên byte
+                return payload
+        else:
+            return payload
+        ok, buf = cv2.imencode(ext, img, _encode_params(ext, self.quality))
+        if not ok:
+            raise ValueError(f"Không mã hóa được ảnh {ext}")
+        return buf.tobytes()
+
+    def _write(self, path: str, payload):
+        try:
+            if os.path.exists(path):
+                # Cùng nội dung đã được lưu trước đó (nội dung quyết định tên file)
+                with self._lock:
+                    self.deduplicated += 1
+                return
+            t0 = time.perf_counter()
+            data = self._encode(path, payload)
+            _write_atomic(path, data)
+            telemetry.record("image_write", time.perf_counter() - t0)
+            with self._lock:
+                self.writes += 1
+                self.bytes_in += payload.nbytes if isinstance(payload, np.ndarray) else len(payload)
+                self.bytes_written += len(data)
+        except Exception as exc:
+            log.error("⚠️ Không ghi được ảnh %s: %s", path, exc)
+            with self._lock:
+                self.errors += 1
+        finally:
+            with self._lock:
+                self._pending.pop(path, None)
+                if not self._pending:
+                    self._idle.notify_all()
+
+    # --- Đọc / xóa ---
+    def read(self, name: str, crop: bool = False):
+        """Byte ảnh (ảnh gốc hoặc ảnh cắt); ảnh chưa kịp ghi được lấy từ hàng đợi. None nếu không có."""
+        path = self.crop_path(name) if crop else self.path(name)
+        with self._lock:
+            payload = self._pending.get(path)
+        if payload is not None:
+            return self._encode(path, payload)
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def remove(self, name: str) -> int:
+        """Xóa ảnh gốc + ảnh cắt của `name`, trả về số byte giải phóng."""
+        self.flush()
+        return sum(remove_file(p) or 0 for p in self.paths(name))
+
+    def flush(self, timeout: float = None) -> bool:
+        """Chờ ghi hết các ảnh trong hàng đợi (gọi khi tắt server / trước khi xóa file)."""
+        with self._lock:
+            return self._idle.wait_for(lambda: not self._pending, timeout)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "pending": len(self._pending),
+                "writes": self.writes,
+                "deduplicated": self.deduplicated,
+                "errors": self.errors,
+                "bytes_in": self.bytes_in,
+                "bytes_written": self.bytes_written,
+                "format": self.fmt or "original",
+                "quality": self.quality,
+            }
+
+    def shutdown(self):
+        self.flush()
+        self._executor.shutdown(wait=True)
+
+
+_BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Kho ảnh dùng chung của tiến trình
+store = ImageStore(
+    upload_dir=os.path.join(_BACKEND_DIR, "uploads"),
+    crop_dir=os.path.join(_BACKEND_DIR, "crops"),
+    fmt=config.IMAGE_STORE_FORMAT,
+    quality=config.IMAGE_STORE_QUALITY,
+    workers=config.IMAGE_STORE_WORKERS,
+)
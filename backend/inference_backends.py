@@ -0,0 +1,215 @@
+import os
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+# 1 đối tượng phát hiện được: class COCO, độ tin cậy, box (x1, y1, x2, y2) theo toạ độ ảnh đầu vào
+Detection = namedtuple("Detection", ["cls_id", "conf", "box"])
+
+
+class DetectorBackend:
+    """
+    Giao diện chung cho các backend nhận diện (YOLOv8).
+    `predict(images)` nhận list ảnh BGR (numpy) và trả về list các list `Detection`,
+    cùng thứ tự với ảnh đầu vào.
+    """
+
+    name = "base"
+
+    def predict(self, images):
+        raise NotImplementedError
+
+
+class UltralyticsBackend(DetectorBackend):
+    """Backend mặc định: chạy model PyTorch qua thư viện Ultralytics."""
+
+    name = "ultralytics"
+
+    def __init__(self, weights: str = "yolov8n.pt", allow_download: bool = False):
+        # Ultralytics tự tải file model khi chưa có: chỉ cho phép khi được bật rõ ràng,
+        # máy không có mạng sẽ báo lỗi ngay thay vì treo chờ tải
+        if not allow_download and not os.path.exists(weights):
+            raise FileNotFoundError(
+                f"Không tìm thấy file model '{weights}'. Tải 1 lần khi có mạng: "
+                f"SPAS_MODEL_DOWNLOAD=1 python model_loader.py"
+            )
+        from ultralytics import YOLO
+
+        self.model = YOLO(weights)
+
+    def predict(self, images):
+        results = self.model(list(images), verbose=False)
+        batch = []
+        for result in results:
+            dets = []
+            for box in result.boxes:
+                dets.append(Detection(int(box.cls[0]), float(box.conf[0]), box.xyxy[0].cpu().numpy()))
+            batch.append(dets)
+        return batch
+
+
+def letterbox(img, size: int = 640, color=(114, 114, 114)):
+    """
+    Resize giữ tỉ lệ + thêm viền cho đủ `size` x `size` (giống LetterBox của Ultralytics).
+    Trả về (ảnh, tỉ lệ, (pad_x, pad_y)).
+    """
+    h, w = img.shape[:2]
+    ratio = min(size / h, size / w)
+    new_w, new_h = int(round(w * ratio)), int(round(h * ratio))
+    dw, dh = (size - new_w) / 2, (size - new_h) / 2
+
+    if (w, h) != (new_w, new_h):
+        img = cv2.resize(img, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    top, bottom = int(round(dh - 0.1)), int(round(dh + 0.1))
+    left, right = int(round(dw - 0.1)), int(round(dw + 0.1))
+    img = cv2.copyMakeBorder(img, top, bottom, left, right, cv2.BORDER_CONSTANT, value=color)
+    return img, ratio, (left, top)
+
+
+class _ExportedYoloBackend(DetectorBackend):
+    """
+    Phần tiền xử lý / hậu xử lý dùng chung cho model YOLOv8 đã export
+    (đầu ra dạng [batch, 4 + số class, số anchor]).
+    """
+
+    def __init__(self, imgsz: int = 640, conf_threshold: float = 0.25, iou_threshold: float = 0.7, max_det: int = 300):
+        self.imgsz = imgsz
+        self.conf_threshold = conf_threshold
+        self.iou_threshold = iou_threshold
+        self.max_det = max_det
+        # Model export với batch cố định = 1 thì phải chạy từng ảnh
+        self.dynamic_batch = False
+
+    def _preprocess(self, img):
+        padded, ratio, pad = letterbox(img, self.imgsz)
+        blob = padded[:, :, ::-1].transpose(2, 0, 1)  # BGR -> RGB, HWC -> CHW
+        blob = np.ascontiguousarray(blob, dtype=np.float32) / 255.0
+        return blob, ratio, pad
+
+    def _postprocess(self, output, ratio, pad, shape):
+        preds = output.T  # [số anchor, 4 + số class]
+        scores = preds[:, 4:]
+        cls_ids = scores.argmax(axis=1)
+        confs = scores[np.arange(len(cls_ids)), cls_ids]
+        keep = confs > self.conf_threshold
+        if not keep.any():
+            return []
+
+        preds, cls_ids, confs = preds[keep], cls_ids[keep], confs[keep]
+        cx, cy, bw, bh = preds[:, 0], preds[:, 1], preds[:, 2], preds[:, 3]
+        boxes = np.stack([cx - bw / 2, cy - bh / 2, cx + bw / 2, cy + bh / 2], axis=1)
+
+        # NMS theo từng class: dịch box của mỗi class ra xa nhau để không đè lên nhau
+        offset = cls_ids[:, None].astype(np.float32) * 7680.0
+        shifted = boxes + offset
+        rects = [[float(x1), float(y1), float(x2 - x1), float(y2 - y1)] for x1, y1, x2, y2 in shifted]
+        idxs = cv2.dnn.NMSBoxes(rects, confs.astype(float).tolist(), self.conf_threshold, self.iou_threshold)
+        idxs = np.array(idxs).reshape(-1)[: self.max_det]
+
+        # Đưa box về toạ độ ảnh gốc (bỏ viền + chia tỉ lệ)
+        h, w = shape[:2]
+        dets = []
+        for i in idxs:
+            x1, y1, x2, y2 = boxes[i]
+            box = np.array([
+                min(max((x1 - pad[0]) / ratio, 0), w),
+                min(max((y1 - pad[1]) / ratio, 0), h),
+                min(max((x2 - pad[0]) / ratio, 0), w),
+                min(max((y2 - pad[1]) / ratio, 0), h),
+            ], dtype=np.float32)
+            dets.append(Detection(int(cls_ids[i]), float(confs[i]), box))
+        return dets
+
+    def _infer(self, blob):
+        raise NotImplementedError
+
+    def predict(self, images):
+        images = list(images)
+        prepared = [self._preprocess(img) for img in images]
+        if self.dynamic_batch:
+            outputs = self._infer(np.stack([p[0] for p in prepared]))
+        else:
+            outputs = [self._infer(p[0][None])[0] for p in prepared]
+        return [
+            self._postprocess(out, ratio, pad, img.shape)
+            for out, (_, ratio, pad), img in zip(outputs, prepared, images)
+        ]
+
+
+class OnnxRuntimeBackend(_ExportedYoloBackend):
+    """Chạy model ONNX (có thể đã lượng tử hoá INT8) bằng ONNX Runtime trên CPU."""
+
+    name = "onnx"
+
+    def __init__(self, model_path: str = "yolov8n.onnx", num_threads: int = 0, **kwargs):
+        import onnxruntime as ort
+
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(
+                f"Không tìm thấy model ONNX '{model_path}'. Hãy chạy: python export_model.py --format onnx"
+            )
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            opts.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(model_path, sess_options=opts, providers=["CPUExecutionProvider"])
+        inp = self.session.get_inputs()[0]
+        self.input_name = inp.name
+
+        super().__init__(imgsz=inp.shape[2] if isinstance(inp.shape[2], int) else 640, **kwargs)
+        self.dynamic_batch = not isinstance(inp.shape[0], int)
+
+    def _infer(self, blob):
+        return self.session.run(None, {self.input_name: blob})[0]
+
+
+class OpenVinoBackend(_ExportedYoloBackend):
+    """Chạy model OpenVINO IR (.xml) hoặc ONNX bằng OpenVINO Runtime trên CPU."""
+
+    name = "openvino"
+
+    def __init__(self, model_path: str = "yolov8n_openvino_model/yolov8n.xml", num_threads: int = 0, **kwargs):
+        import openvino as ov
+
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(
+                f"Không tìm thấy model OpenVINO '{model_path}'. Hãy chạy: python export_model.py --format openvino"
+            )
+        core = ov.Core()
+        model = core.read_model(model_path)
+        cfg = {"INFERENCE_NUM_THREADS": num_threads} if num_threads else {}
+        self.compiled = core.compile_model(model, "CPU", cfg)
+        self.output = self.compiled.output(0)
+
+        shape = model.input(0).partial_shape
+        super().__init__(imgsz=shape[2].get_length() if shape[2].is_static else 640, **kwargs)
+        self.dynamic_batch = not shape[0].is_static
+
+    def _infer(self, blob):
+        return self.compiled(blob)[self.output]
+
+
+BACKENDS = {
+    UltralyticsBackend.name: UltralyticsBackend,
+    OnnxRuntimeBackend.name: OnnxRuntimeBackend,
+    OpenVinoBackend.name: OpenVinoBackend,
+}
+
+# File model mặc định của từng backend (khi không cấu hình SPAS_DETECTOR_MODEL)
+DEFAULT_MODELS = {
+    "ultralytics": "yolov8n.pt",
+    "onnx": "yolov8n.onnx",
+    "openvino": "yolov8n_openvino_model/yolov8n.xml",
+}
+
+
+def create_backend(name: str, model_path: str = None, num_threads: int = 0, allow_download: bool = False) -> DetectorBackend:
+    """Khởi tạo backend nhận diện theo tên (ultralytics / onnx / openvino).
+    `allow_download`: cho Ultralytics tự tải file model chưa có (backend khác không tải)."""
+    if name not in BACKENDS:
+        raise ValueError(f"Backend nhận diện không hợp lệ: '{name}'. Chọn một trong: {', '.join(BACKENDS)}")
+    model_path = model_path or DEFAULT_MODELS[name]
+    if name == "ultralytics":
+        return UltralyticsBackend(model_path, allow_download=allow_download)
+    return BACKENDS[name](model_path, num_threads=num_threads)
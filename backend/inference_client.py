@@ -0,0 +1,300 @@
+"""
+Điểm gọi nhận diện (YOLO + OCR) dùng chung cho main.py và stream_gate.py.
+
+- Không cấu hình SPAS_INFERENCE_ADDRESS: gọi thẳng yolo_utils trong tiến trình (như cũ).
+- Có cấu hình: gửi ảnh sang tiến trình suy luận dùng chung (inference_server.py) đang giữ
+  model. Ảnh được chép 1 lần vào vùng nhớ dùng chung (shared memory) của 1 "slot", qua socket
+  chỉ gửi thông điệp điều khiển nhỏ (số slot, độ dài); ảnh xe kết quả được trả về trong phần
+  sau của cùng slot. Mọi thread của 1 tiến trình API dùng chung 1 kết nối (gửi kèm id, 1 thread
+  nhận trả kết quả đúng request), server gom request của mọi worker API vào cùng bộ gom batch.
+"""
+import itertools
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeout
+from multiprocessing import connection, shared_memory
+
+import numpy as np
+
+import config
+import model_loader
+import telemetry
+
+log = logging.getLogger("spas.inference")
+
+
+class InferenceError(RuntimeError):
+    """Không gọi được tiến trình suy luận (chưa chạy, mất kết nối, quá thời gian, lỗi phía server)."""
+
+
+class InferenceTimeout(InferenceError):
+    """Tiến trình suy luận không trả lời kịp (yêu cầu có thể vẫn đang chạy ở server)."""
+
+
+def parse_address(address: str):
+    """"host:port" -> (host, port); còn lại là đường dẫn Unix socket / named pipe."""
+    host, sep, port = address.rpartition(":")
+    if sep and port.isdigit() and os.sep not in host:
+        return host or "127.0.0.1", int(port)
+    return address
+
+
+def attach(name: str):
+    """
+    Mở vùng nhớ dùng chung do tiến trình khác tạo. Không để resource_tracker của tiến trình
+    này xóa vùng nhớ khi thoát (bên tạo mới là bên xóa).
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # Python < 3.13 chưa có tham số track
+        shm = shared_memory.SharedMemory(name=name)
+        try:
+            from multiprocessing import resource_tracker
+
+            resource_tracker.unregister(shm._name, "shared_memory")
+        except Exception:
+            pass
+        return shm
+
+
+def local_stats() -> dict:
+    """Thống kê bộ gom batch YOLO + cache kết quả của tiến trình đang giữ model."""
+    import yolo_utils
+
+    return {
+        "batching_enabled": config.BATCH_ENABLED,
+        "yolo": yolo_utils.scheduler.stats(),
+        "result_cache_enabled": config.RESULT_CACHE_ENABLED,
+        "result_cache": yolo_utils.result_cache.stats(),
+    }
+
+
+class InferenceClient:
+    """Kết nối tới tiến trình suy luận + các slot shared memory của tiến trình API này."""
+
+    def __init__(self, address: str, authkey: str, slots: int, input_bytes: int, crop_bytes: int, timeout: float):
+        self.address = address
+        self.input_bytes = input_bytes
+        self.crop_bytes = crop_bytes
+        self.timeout = timeout
+        self._conn = connection.Client(parse_address(address), authkey=authkey.encode())
+        self._segments = [shared_memory.SharedMemory(create=True, size=input_bytes + crop_bytes)
+                          for _ in range(max(1, slots))]
+        self._free = queue.Queue()
+        for i in range(len(self._segments)):
+            self._free.put(i)
+
+        self._ids = itertools.count()
+        self._pending = {}
+        # req_id -> slot của yêu cầu đã quá thời gian: server có thể vẫn đang đọc ảnh / ghi ảnh xe
+        # vào slot, chỉ trả slot khi nhận được trả lời muộn của đúng yêu cầu đó
+        self._late_slots = {}
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self.closed = False
+        self._conn.send(("hello", [s.name for s in self._segments], input_bytes, crop_bytes))
+        self._receiver = threading.Thread(target=self._receive, name="inference-client", daemon=True)
+        self._receiver.start()
+
+    def _receive(self):
+        try:
+            while True:
+                req_id, ok, payload = self._conn.recv()
+                with self._lock:
+                    fut = self._pending.pop(req_id, None)
+                    late_slot = self._late_slots.pop(req_id, None)
+                if late_slot is not None:
+                    self._free.put(late_slot)
+                if fut is None:
+                    continue
+                if ok:
+                    fut.set_result(payload)
+                else:
+                    fut.set_exception(InferenceError(payload))
+        except (EOFError, OSError) as exc:
+            log.warning("Mất kết nối tới tiến trình suy luận %s: %s", self.address, exc)
+        finally:
+            self.close()
+
+    def call(self, op: str, *args, slot: int = None):
+        """
+        Gửi 1 yêu cầu và chờ kết quả (an toàn khi gọi từ nhiều thread). `slot`: slot shared memory
+        yêu cầu đang dùng; quá thời gian thì slot được giữ tới khi trả lời muộn về (ném InferenceTimeout).
+        """
+        if self.closed:
+            raise InferenceError("Chưa kết nối tới tiến trình suy luận")
+        req_id = next(self._ids)
+        fut = Future()
+        with self._lock:
+            self._pending[req_id] = fut
+        try:
+            with self._send_lock:
+                self._conn.send((req_id, op, args))
+        except (OSError, ValueError) as exc:
+            with self._lock:
+                self._pending.pop(req_id, None)
+            self.close()
+            raise InferenceError(f"Không gửi được yêu cầu tới tiến trình suy luận: {exc}") from exc
+        try:
+            return fut.result(timeout=self.timeout)
+        except FutureTimeout:
+            with self._lock:
+                still_pending = self._pending.pop(req_id, None) is not None
+                if still_pending and slot is not None:
+                    self._late_slots[req_id] = slot
+            if not still_pending:
+                # Trả lời về đúng lúc vừa hết thời gian chờ
+                return fut.result()
+            raise InferenceTimeout(f"Tiến trình suy luận không trả lời sau {self.timeout:.0f}s")
+
+    def recognize_plate(self, image_data, timings: dict = None):
+        """Như `yolo_utils.recognize_plate`, chạy ở tiến trình suy luận."""
+        try:
+            slot = self._free.get(timeout=self.timeout)
+        except queue.Empty:
+            raise InferenceError("Hết slot bộ nhớ dùng chung (quá nhiều ảnh đang chờ suy luận)")
+        t0 = time.perf_counter()
+        release = True
+        try:
+            buf = self._segments[slot].buf
+            size = len(image_data)
+            inline = None
+            if size <= self.input_bytes:
+                buf[:size] = image_data
+            else:
+                inline = bytes(image_data)  # ảnh lớn hơn slot: gửi kèm thông điệp
+            try:
+                crop_meta, plate, conf, remote_timings, stages = self.call("recognize", slot, size, inline, slot=slot)
+            except InferenceTimeout:
+                release = False  # _receive trả slot khi trả lời muộn về
+                raise
+            crop = None
+            if crop_meta is not None:
+                if crop_meta[0] == "shm":
+                    _, shape, dtype = crop_meta
+                    # Chép ảnh xe ra khỏi slot trước khi trả slot cho request khác
+                    crop = np.ndarray(shape, dtype=np.dtype(dtype), buffer=buf, offset=self.input_bytes).copy()
+                else:
+                    crop = crop_meta[1]
+        finally:
+            if release:
+                self._free.put(slot)
+
+        elapsed = time.perf_counter() - t0
+        for name, ms in stages.items():
+            telemetry.record(name, ms / 1000)
+        # Phần thời gian không nằm trong các bước của server: chép ảnh + gửi/nhận thông điệp + chờ
+        telemetry.record("inference_ipc", max(0.0, elapsed - sum(stages.values()) / 1000))
+        if timings is not None:
+            timings.update(remote_timings)
+        return crop, plate, conf
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self._conn.close()
+        except OSError:
+            pass
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for fut in pending.values():
+            fut.set_exception(InferenceError("Mất kết nối tới tiến trình suy luận"))
+        for segment in self._segments:
+            try:
+                segment.close()
+                segment.unlink()
+            except (BufferError, FileNotFoundError):
+                pass
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def remote() -> bool:
+    """True nếu nhận diện chạy ở tiến trình suy luận riêng."""
+    return bool(config.INFERENCE_ADDRESS)
+
+
+def client() -> InferenceClient:
+    """Kết nối của tiến trình này (tạo khi cần, tự kết nối lại nếu đã mất)."""
+    global _client
+    with _client_lock:
+        if _client is None or _client.closed:
+            try:
+                _client = InferenceClient(
+                    config.INFERENCE_ADDRESS, config.INFERENCE_AUTHKEY, config.INFERENCE_SLOTS,
+                    config.CAPTURE_MAX_BYTES, config.INFERENCE_CROP_BYTES, config.INFERENCE_TIMEOUT_S,
+                )
+            except (OSError, EOFError, connection.AuthenticationError) as exc:
+                raise InferenceError(f"Không kết nối được tiến trình suy luận {config.INFERENCE_ADDRESS}: {exc}") from exc
+            log.info("Đã kết nối tiến trình suy luận %s", config.INFERENCE_ADDRESS)
+        return _client
+
+
+def start():
+    """
+    Gọi khi khởi động API: nạp model ở thread nền trong tiến trình (chế độ mặc định) hoặc thử kết
+    nối tiến trình suy luận (chưa chạy thì chỉ ghi log, request sau sẽ tự kết nối lại).
+    """
+    if not remote():
+        model_loader.loader.start()
+        return
+    try:
+        client()
+    except InferenceError as exc:
+        log.warning("%s", exc)
+
+
+def recognize_plate(image_data, timings: dict = None):
+    """Giải mã -> YOLO -> cắt xe -> OCR. Trả về (ảnh xe hoặc None, biển số hoặc None, độ tin cậy)."""
+    if not remote():
+        loader = model_loader.loader
+        if loader.state == model_loader.LOADING:
+            raise InferenceError("Model đang được nạp, thử lại sau")
+        if loader.state == model_loader.FAILED:
+            raise InferenceError(f"Không nạp được model: {loader.error}")
+        import yolo_utils
+
+        return yolo_utils.recognize_plate(image_data, timings)
+    return client().recognize_plate(image_data, timings)
+
+
+def readiness() -> dict:
+    """Trạng thái nạp model (model_loader.ModelLoader.status) của tiến trình đang giữ model."""
+    if not remote():
+        return model_loader.loader.status()
+    try:
+        return dict(client().call("ready"), address=config.INFERENCE_ADDRESS)
+    except InferenceError as exc:
+        return {"state": "unavailable", "ready": False, "error": str(exc), "address": config.INFERENCE_ADDRESS}
+
+
+def stats() -> dict:
+    if not remote():
+        return local_stats()
+    return dict(client().call("stats"), address=config.INFERENCE_ADDRESS)
+
+
+def metrics_text() -> str:
+    """Metrics của tiến trình suy luận (số lần OCR, cache...) để ghép vào GET /metrics."""
+    if not remote():
+        return ""
+    try:
+        return client().call("metrics")
+    except InferenceError:
+        return ""
+
+
+def shutdown():
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
@@ -0,0 +1,145 @@
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+
+class BatchScheduler:
+    """
+    Gom các yêu cầu suy luận đồng thời thành 1 batch rồi gọi model 1 lần.
+
+    - Một batch được chạy khi đủ `max_batch_size` phần tử, hoặc khi phần tử đầu
+      tiên của batch đã chờ quá `max_wait_ms`.
+    - `infer_fn(items)` nhận list đầu vào và phải trả về list kết quả cùng độ dài,
+      cùng thứ tự. Kết quả thứ i được trả về đúng Future của yêu cầu thứ i.
+    - Chạy trên 1 thread nền riêng nên có thể gọi từ event loop (qua
+      `asyncio.wrap_future`) lẫn từ thread thường (`.result()`).
+    """
+
+    def __init__(self, infer_fn, max_batch_size: int = 8, max_wait_ms: float = 10.0, name: str = "batch"):
+        self.infer_fn = infer_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.name = name
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._closed = False
+
+        # Thống kê
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._errors = 0
+        self._size_hist = {}
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+        self._wait_total = 0.0
+        self._recent = deque(maxlen=100)  # (batch_size, latency_ms)
+
+    def submit(self, item) -> Future:
+        """Đưa 1 đầu vào vào hàng đợi, trả về Future chứa kết quả của riêng nó."""
+        if self._closed:
+            raise RuntimeError(f"Scheduler '{self.name}' đã dừng")
+        self._ensure_started()
+        fut = Future()
+        self._queue.put((item, fut, time.perf_counter()))
+        return fut
+
+    def run(self, item):
+        """Gọi đồng bộ: chờ tới khi batch chứa `item` chạy xong."""
+        return self.submit(item).result()
+
+    def close(self):
+        self._closed = True
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout=5)
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name=f"{self.name}-scheduler", daemon=True)
+                self._thread.start()
+
+    def _collect(self, first):
+        """Lấy thêm phần tử từ hàng đợi cho tới khi đủ batch hoặc hết thời gian chờ."""
+        batch = [first]
+        deadline = first[2] + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            try:
+                entry = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is None:
+                self._queue.put(None)  # Trả lại tín hiệu dừng cho vòng lặp chính
+                break
+            batch.append(entry)
+        return batch
+
+    def _loop(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+
+            batch = self._collect(first)
+            # Bỏ qua các yêu cầu đã bị huỷ trong lúc chờ
+            batch = [e for e in batch if e[1].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            started = time.perf_counter()
+            try:
+                results = self.infer_fn([e[0] for e in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(f"infer_fn trả về {len(results)} kết quả cho batch {len(batch)} phần tử")
+            except Exception as exc:
+                for _, fut, _ in batch:
+                    fut.set_exception(exc)
+                self._record(batch, started, error=True)
+                continue
+
+            for (_, fut, _), res in zip(batch, results):
+                fut.set_result(res)
+            self._record(batch, started)
+
+    def _record(self, batch, started, error: bool = False):
+        latency = time.perf_counter() - started
+        wait = sum(started - e[2] for e in batch)
+        size = len(batch)
+        with self._stats_lock:
+            self._batches += 1
+            self._items += size
+            self._errors += int(error)
+            self._size_hist[size] = self._size_hist.get(size, 0) + 1
+            self._latency_total += latency
+            self._latency_max = max(self._latency_max, latency)
+            self._wait_total += wait
+            self._recent.append((size, round(latency * 1000, 2)))
+
+    def stats(self) -> dict:
+        """Thống kê kích thước batch và độ trễ (ms)."""
+        with self._stats_lock:
+            batches = self._batches or 1
+            items = self._items or 1
+            return {
+                "name": self.name,
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000,
+                "queue_depth": self._queue.qsize(),
+                "batches": self._batches,
+                "items": self._items,
+                "errors": self._errors,
+                "avg_batch_size": round(self._items / batches, 2),
+                "batch_size_histogram": dict(sorted(self._size_hist.items())),
+                "avg_batch_latency_ms": round(self._latency_total / batches * 1000, 2),
+                "max_batch_latency_ms": round(self._latency_max * 1000, 2),
+                "avg_queue_wait_ms": round(self._wait_total / items * 1000, 2),
+                "recent_batches": [{"size": s, "latency_ms": l} for s, l in self._recent],
+            }
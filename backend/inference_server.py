@@ -0,0 +1,178 @@
+"""
+Tiến trình suy luận dùng chung: giữ 1 bản model YOLO + EasyOCR cho mọi worker API.
+
+Chạy nhiều worker uvicorn (run_https.py --workers N) mà mỗi worker tự nạp model thì tốn N lần
+RAM/VRAM và N lần khởi động nguội. Với tiến trình này, worker API chỉ lo HTTP, DB, ghi file;
+ảnh được đưa qua vùng nhớ dùng chung (inference_client.py), request của mọi worker được xử lý
+bởi `SPAS_INFERENCE_WORKERS` thread và gom chung vào bộ gom batch YOLO.
+
+Ví dụ (chạy trong thư mục backend/):
+    python inference_server.py                          # nghe ở 127.0.0.1:8765
+    SPAS_INFERENCE_ADDRESS=127.0.0.1:8765 python run_https.py --workers 4
+    python run_https.py --workers 4 --inference         # tự chạy kèm tiến trình này
+"""
+import argparse
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import connection
+
+import numpy as np
+
+import config
+import inference_client
+import model_loader
+import telemetry
+
+log = logging.getLogger("spas.inference")
+
+DEFAULT_ADDRESS = "127.0.0.1:8765"
+
+
+class InferenceServer:
+    """Nhận yêu cầu từ các worker API, chạy yolo_utils.recognize_plate trên pool thread."""
+
+    def __init__(self, address: str, authkey: str, workers: int):
+        self.address = address
+        self.listener = connection.Listener(inference_client.parse_address(address), authkey=authkey.encode())
+        self.executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="inference")
+        self.workers = max(1, workers)
+        self._lock = threading.Lock()
+        self.connections = 0
+        self.requests = 0
+        self.errors = 0
+
+    def serve_forever(self):
+        log.info("Tiến trình suy luận nghe tại %s (%d thread)", self.address, self.workers)
+        while True:
+            try:
+                conn = self.listener.accept()
+            except (OSError, EOFError, connection.AuthenticationError) as exc:
+                log.warning("Từ chối kết nối: %s", exc)
+                continue
+            threading.Thread(target=self._handle, args=(conn,), name="inference-conn", daemon=True).start()
+
+    def _handle(self, conn):
+        segments = []
+        registered = False
+        try:
+            kind, names, input_bytes, crop_bytes = conn.recv()
+            if kind != "hello":
+                raise ValueError(f"Thông điệp mở đầu không hợp lệ: {kind}")
+            segments = [inference_client.attach(name) for name in names]
+            with self._lock:
+                self.connections += 1
+            registered = True
+            send_lock = threading.Lock()
+            pending = []
+            while True:
+                try:
+                    req_id, op, args = conn.recv()
+                except (EOFError, OSError):
+                    break
+                pending.append(self.executor.submit(
+                    self._run, conn, send_lock, segments, input_bytes, crop_bytes, req_id, op, args
+                ))
+                pending = [f for f in pending if not f.done()]
+            # Chờ các request đang chạy xong trước khi đóng vùng nhớ của kết nối này
+            for fut in pending:
+                fut.exception()
+        except Exception as exc:
+            log.warning("Lỗi kết nối suy luận: %s", exc)
+        finally:
+            if registered:
+                with self._lock:
+                    self.connections -= 1
+            for segment in segments:
+                try:
+                    segment.close()
+                except BufferError:
+                    pass
+            conn.close()
+
+    def _run(self, conn, send_lock, segments, input_bytes, crop_bytes, req_id, op, args):
+        try:
+            if op == "recognize":
+                result = self._recognize(segments, input_bytes, crop_bytes, *args)
+            elif op == "ready":
+                result = model_loader.loader.status()
+            elif op == "stats":
+                result = self.stats()
+            elif op == "metrics":
+                # Thời gian từng bước đã được worker API ghi lại theo từng request
+                result = telemetry.render(exclude=(telemetry.stage_seconds.name,))
+            else:
+                raise ValueError(f"Yêu cầu không hỗ trợ: {op}")
+            ok = True
+        except Exception as exc:
+            log.exception("Lỗi khi xử lý yêu cầu %s", op)
+            with self._lock:
+                self.errors += 1
+            result, ok = f"{type(exc).__name__}: {exc}", False
+        with send_lock:
+            try:
+                conn.send((req_id, ok, result))
+            except OSError:
+                pass
+
+    def _recognize(self, segments, input_bytes, crop_bytes, slot, size, inline):
+        loader = model_loader.loader
+        if not loader.ready:
+            raise RuntimeError(f"Không nạp được model: {loader.error}" if loader.error else "Model đang được nạp, thử lại sau")
+        import yolo_utils
+
+        with self._lock:
+            self.requests += 1
+        buf = segments[slot].buf
+        # Đọc ảnh thẳng trên vùng nhớ dùng chung (memoryview, không copy)
+        data = inline if inline is not None else buf[:size]
+        trace = telemetry.Trace()
+        timings = {}
+        try:
+            with telemetry.activate(trace):
+                crop, plate, conf = yolo_utils.recognize_plate(data, timings)
+        finally:
+            if isinstance(data, memoryview):
+                try:
+                    data.release()
+                except BufferError:  # còn mảng numpy tham chiếu tới, để GC giải phóng
+                    pass
+
+        crop_meta = None
+        if crop is not None:
+            crop = np.ascontiguousarray(crop)
+            if crop.nbytes <= crop_bytes:
+                out = np.ndarray(crop.shape, dtype=crop.dtype, buffer=buf, offset=input_bytes)
+                out[...] = crop
+                crop_meta = ("shm", crop.shape, crop.dtype.str)
+            else:
+                crop_meta = ("inline", crop)
+        return crop_meta, plate, conf, timings, trace.stages
+
+    def stats(self) -> dict:
+        result = inference_client.local_stats()
+        with self._lock:
+            result["server"] = {
+                "workers": self.workers,
+                "connections": self.connections,
+                "requests": self.requests,
+                "errors": self.errors,
+            }
+        return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tiến trình suy luận YOLO + OCR dùng chung cho các worker API")
+    parser.add_argument("--address", default=config.INFERENCE_ADDRESS or DEFAULT_ADDRESS,
+                        help="host:port hoặc đường dẫn Unix socket")
+    parser.add_argument("--workers", type=int, default=config.INFERENCE_WORKERS, help="Số thread suy luận")
+    args = parser.parse_args()
+
+    telemetry.setup_logging()
+    # Nhận kết nối ngay, model được nạp + chạy thử ở thread nền (worker API hỏi qua "ready")
+    model_loader.loader.start()
+    InferenceServer(args.address, config.INFERENCE_AUTHKEY, args.workers).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,62 @@
+import logging
+import mimetypes
 import os
 import time
-import re
-import cv2
-from datetime import datetime
-from io import BytesIO
-from fastapi import FastAPI, File, UploadFile, Form, Depends
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from fastapi import FastAPI, File, UploadFile, Form, Depends, Header, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
 from sqlalchemy.orm import Session
 
-import crud, models, yolo_utils
-from database import SessionLocal, engine, get_db
+import capture_profile
+import config
+import crud
+import image_pack
+import image_store
+import inference_client
+import migrations
+import occupancy
+import plate_match
+import purge
+import report_export
+import rollups
+import session_writer
+import stream_gate
+import tariff
+import telemetry
+from admission import AdmissionController, Overloaded
+from database import ParkingSession, SessionLocal, engine, get_db
 
-app = FastAPI()
+# Log ghi qua hàng đợi ở thread nền (telemetry.py), không chặn request
+telemetry.setup_logging()
+log = logging.getLogger("spas.upload")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # create / upgrade DB tables through versioned migrations (migrations.py)
+    migrations.upgrade(engine)
+    # Dựng chỉ mục xe đang trong bãi (biển số -> session đang mở) từ DB
+    session_writer.start()
+    # Dọn tiếp ảnh còn sót của lần xóa dữ liệu trước (nếu server bị tắt giữa chừng)
+    purge.reclaimer.resume()
+    # Nạp model YOLO + OCR ở thread nền (model_loader.py), hoặc kết nối tiến trình suy luận dùng
+    # chung (SPAS_INFERENCE_ADDRESS). Server nhận request ngay, /readyz báo khi model sẵn sàng
+    inference_client.start()
+    yield
+    # Chờ các upload đang xử lý xong (bỏ các request còn chờ worker)
+    admission.shutdown()
+    # Ghi nốt các ảnh còn trong hàng đợi trước khi tắt server
+    images.shutdown()
+    # Ghi nốt các lượt vào/ra còn trong hàng đợi của thread ghi
+    session_writer.shutdown()
+    inference_client.shutdown()
+    telemetry.shutdown_logging()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -22,17 +66,47 @@ app.add_middleware(
 )
 
 
-# ensure uploads folder exists
-UPLOAD_DIR = os.path.join(os.path.dirname(__file__), 'uploads')
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+# Kho ảnh gốc + ảnh cắt (uploads/, crops/), ghi file ở thread nền (image_store.py)
+images = image_store.store
+UPLOAD_DIR = images.upload_dir
+CROP_DIR = images.crop_dir
+
+# Pool worker + hàng đợi tiếp nhận có giới hạn cho /upload
+admission = AdmissionController(
+    max_workers=config.UPLOAD_WORKERS,
+    max_queue=config.UPLOAD_MAX_QUEUE,
+    default_deadline_ms=config.UPLOAD_DEADLINE_MS,
+)
+
+
+def _occupancy_count() -> int:
+    """Số xe trong bãi, đã đối chiếu chỉ mục với DB (tiến trình API khác có thể vừa check-in/check-out)."""
+    with SessionLocal() as db:
+        return occupancy.index.sync(db)
+
+
+# Metrics cho GET /metrics (các bước xử lý được đo trong telemetry.stage_seconds)
+uploads_total = telemetry.Counter("spas_uploads_total", "Số request /upload theo loại và kết quả", ("kind", "outcome"))
+upload_rejects = telemetry.Counter("spas_upload_rejects_total", "Số request /upload bị từ chối theo lý do", ("reason",))
+upload_seconds = telemetry.Histogram("spas_upload_duration_seconds", "Tổng thời gian xử lý 1 request /upload trên server")
+telemetry.gauge("spas_admission_queue_depth", "Số request đang chờ worker", lambda: admission.stats()["queue_depth"])
+telemetry.gauge("spas_admission_running", "Số request đang được worker xử lý", lambda: admission.stats()["running"])
+telemetry.gauge("spas_image_store_pending", "Số ảnh đang chờ ghi xuống đĩa", lambda: images.stats()["pending"])
+telemetry.gauge("spas_occupancy_vehicles", "Số xe đang trong bãi", _occupancy_count)
+
 
-# create crops folder
-CROP_DIR = os.path.join(os.path.dirname(__file__), 'crops')
-os.makedirs(CROP_DIR, exist_ok=True)
+def _timed_response(content: dict, trace: telemetry.Trace, started: float, status_code: int = 200, headers: dict = None):
+    """JSONResponse kèm header Server-Timing (thời gian từng bước + tổng) và ghi metrics của request."""
+    elapsed = time.perf_counter() - started
+    upload_seconds.observe(elapsed)
+    headers = dict(headers or {})
+    if config.SERVER_TIMING_ENABLED:
+        timing = trace.server_timing()
+        headers["Server-Timing"] = f"{timing}, total;dur={elapsed * 1000:.1f}" if timing else f"total;dur={elapsed * 1000:.1f}"
+        # Cho phép trang web khác origin (frontend HTTPS) đọc Server-Timing
+        headers["Timing-Allow-Origin"] = "*"
+    return JSONResponse(status_code=status_code, content=content, headers=headers)
 
-# create DB tables
-# models.Base refers to the Base imported in models.py from database.py
-models.Base.metadata.create_all(bind=engine)
 
 
 @app.post('/upload')
@@ -40,42 +114,118 @@ async def upload_image(
     image: UploadFile = File(...), 
     status: int = Form(...), 
     plate_number: str = Form(None), # Nhận thêm biển số nhập tay (Optional)
-    db: Session = Depends(get_db)
+    x_request_deadline_ms: float = Header(None), # Deadline riêng của request (tùy chọn)
 ):
     """Receive uploaded image and a status field (1=checkin,0=checkout).
-    Saves file to `uploads/` and inserts a record into SQLite DB.
+    Queues the file for the image store (`uploads/`, written in the background)
+    and inserts a record into SQLite DB.
+
+    The heavy work (YOLO, OCR, DB commit, file writes) runs on the admission
+    worker pool; when the server is overloaded the request is rejected fast
+    with 429/503 and a `Retry-After` header.
     """
-    # --- DEBUG: In ra ngay khi nhận được request ---
-    print(f"📡 ĐANG NHẬN REQUEST: Filename='{image.filename}', Status={status}")
+    started = time.perf_counter()
+    trace = telemetry.Trace()
+    kind = "checkin" if status == 1 else "checkout"
+    # --- DEBUG: ghi log ngay khi nhận được request (chỉ hiện khi SPAS_LOG_LEVEL=DEBUG) ---
+    log.debug("📡 ĐANG NHẬN REQUEST: Filename='%s', Status=%s", image.filename, status)
+
+    with telemetry.activate(trace):
+        with telemetry.stage("read_body"):
+            content = await image.read()
+        # Kiểm tra ảnh theo capture profile (chỉ đọc header, không giải mã)
+        try:
+            with telemetry.stage("validate"):
+                info = capture_profile.validate(content)
+        except capture_profile.ProfileViolation as exc:
+            log.warning("⛔ TỪ CHỐI ẢNH (%s): Filename='%s', %d bytes", exc.reason, image.filename, len(content),
+                        extra={"fields": {"reason": exc.reason}})
+            upload_rejects.inc(exc.reason)
+            uploads_total.inc(kind, "rejected")
+            return _timed_response({
+                "success": False,
+                "id": None,
+                "cropped_image": None,
+                "plate_number": None,
+                "fee": 0,
+                "message": f"⚠️ {exc.message}"
+            }, trace, started, status_code=exc.status_code)
+    try:
+        result = await admission.run(
+            _process_upload, content, image.filename, status, plate_number, info, trace, time.perf_counter(),
+            deadline_ms=x_request_deadline_ms,
+        )
+    except Overloaded as exc:
+        log.warning("⛔ TỪ CHỐI DO QUÁ TẢI (%s): Filename='%s'", exc.reason, image.filename,
+                    extra={"fields": {"reason": exc.reason}})
+        upload_rejects.inc(exc.reason)
+        uploads_total.inc(kind, "rejected")
+        return _timed_response({
+            "success": False,
+            "id": None,
+            "cropped_image": None,
+            "plate_number": None,
+            "fee": 0,
+            "message": f"⚠️ {exc.message}"
+        }, trace, started, status_code=exc.status_code, headers={"Retry-After": str(exc.retry_after)})
+    except inference_client.InferenceError as exc:
+        log.error("⛔ LỖI TIẾN TRÌNH SUY LUẬN: %s", exc)
+        upload_rejects.inc("inference_unavailable")
+        uploads_total.inc(kind, "rejected")
+        return _timed_response({
+            "success": False,
+            "id": None,
+            "cropped_image": None,
+            "plate_number": None,
+            "fee": 0,
+            "message": "⚠️ Dịch vụ nhận diện chưa sẵn sàng, vui lòng thử lại sau giây lát."
+        }, trace, started, status_code=503, headers={"Retry-After": "1"})
+    uploads_total.inc(kind, "success" if result.get("success") else "rejected")
+    return _timed_response(result, trace, started)
 
-    content = await image.read()
-    ts = int(time.time())
-    safe_name = f"{ts}_{os.path.basename(image.filename)}"
-    dest_path = os.path.join(UPLOAD_DIR, safe_name)
+def _process_upload(content: bytes, filename: str, status: int, plate_number: str = None, info: dict = None,
+                    trace: telemetry.Trace = None, enqueued_at: float = None):
+    """Xử lý 1 ảnh upload (chạy trên worker, không chạy trên event loop)"""
+    with telemetry.activate(trace or telemetry.Trace()):
+        if enqueued_at is not None:
+            telemetry.record("queue", time.perf_counter() - enqueued_at)
+        return _recognize_and_commit(content, filename, status, plate_number, info)
+
+def _recognize_and_commit(content: bytes, filename: str, status: int, plate_number: str = None, info: dict = None):
+    # Tên lưu trữ theo hash nội dung ảnh (không trùng tên khi 2 ảnh tới cùng 1 giây)
+    safe_name = images.name_for(content, filename)
 
     size = len(content)
     
     # Xử lý biển số: Ưu tiên nhập tay, nếu không có mới chạy AI
     plate_text = None
-    cropped_path = None
+    plate_conf = None
+    timings = {}
+    cropped_name = None
     cropped_img = None
     crop_msg = ""
     
     if plate_number:
         plate_text = plate_number.strip().upper()
+        plate_conf = 1.0
         crop_msg = "Biển số nhập tay từ Frontend"
     else:
-        # Tiến hành cắt ảnh xe (nếu có)
-        cropped_img = yolo_utils.detect_and_crop_vehicle(content)
+        # Tiến hành cắt ảnh xe (nếu có) rồi OCR với ảnh đã cắt sẵn trong RAM
+        # (YOLO đi qua bộ gom batch; ảnh chụp lại/bấm trùng dùng lại kết quả trong cache)
+        cropped_img, plate_text, plate_conf = inference_client.recognize_plate(content, timings)
         crop_msg = "Không tìm thấy xe"
         if cropped_img is not None:
             crop_msg = "Đã cắt ảnh xe"
-            # Tiến hành OCR với ảnh đã cắt sẵn trong RAM (cropped_img)
-            plate_text = yolo_utils.read_plate_text(cropped_img)
+
+    # Ghi nhận dung lượng ảnh + thời gian giải mã của request (GET /capture/stats)
+    decode_ms = timings.get("decode_ms")
+    if info is not None:
+        capture_profile.stats.record(info, decode_ms)
 
     # --- VALIDATION: Kiểm tra định dạng biển số ---
     # 1. Nếu không đọc được biển số
     if not plate_text:
+        upload_rejects.inc("no_plate")
         return {
             "success": False,
             "id": None,
@@ -87,7 +237,8 @@ async def upload_image(
 
     # 2. Kiểm tra regex định dạng 5 số: 2 số + 1 chữ + '-' + 3 số + '.' + 2 số
     # Ví dụ hợp lệ: 30A-123.45. Ví dụ không hợp lệ: 30A-1234 (4 số), 06A-4253 (4 số)
-    if not re.match(r'^\d{2}[A-Z]-\d{3}\.\d{2}$', plate_text):
+    if not plate_match.is_valid_plate(plate_text):
+        upload_rejects.inc("invalid_plate")
         return {
             "success": False,
             "id": None,
@@ -99,11 +250,12 @@ async def upload_image(
 
     # SAU KHI xử lý ảnh xong, mới tiến hành lưu vào DB
     # Kết hợp status, tên file ảnh và biển số vừa đọc được
-    rec, msg = crud.create_session_entry(db, safe_name, int(status), plate_text)
+    rec, msg = crud.create_session_entry(safe_name, int(status), plate_text)
 
     # Nếu bị từ chối (rec is None) do trùng lặp hoặc không tìm thấy xe
     if not rec:
-        print(f"⚠️ TỪ CHỐI: {msg}")
+        log.info("⚠️ TỪ CHỐI: %s", msg, extra={"fields": {"status": status, "plate": plate_text}})
+        upload_rejects.inc("session_rejected")
         return {
             "success": False,
             "id": None,
@@ -114,39 +266,166 @@ async def upload_image(
         }
 
     # --- THÀNH CÔNG: BÂY GIỜ MỚI LƯU FILE ---
-    # 1. Lưu ảnh gốc
-    with open(dest_path, 'wb') as f:
-        f.write(content)
-
-    # 2. Lưu ảnh crop (nếu có)
-    if cropped_img is not None:
-        crop_name = f"crop_{safe_name}"
-        cropped_path = os.path.join(CROP_DIR, crop_name)
-        cv2.imwrite(cropped_path, cropped_img)
+    # Ảnh gốc + ảnh crop (nếu có) được đưa vào hàng đợi ghi nền, không chờ ghi xong mới trả lời
+    with telemetry.stage("image_enqueue"):
+        images.save(content, filename)
+        if cropped_img is not None:
+            cropped_name = images.save_crop(safe_name, cropped_img)
 
-    print(f"Đã nhận ảnh: {size} bytes, status={status}. {crop_msg}. Biển số: {plate_text}. Msg: {msg}")
+    log.info(
+        "Đã nhận ảnh: %d bytes, status=%s. %s. Biển số: %s. Msg: %s", size, status, crop_msg, plate_text, msg,
+        extra={"fields": {"session_id": rec.id, "confidence": plate_conf,
+                          "decode_ms": round(decode_ms, 1) if decode_ms is not None else None}},
+    )
     return {
         "success": True, 
         "id": rec.id, 
-        "cropped_image": os.path.basename(cropped_path) if cropped_path else None,
-        "plate_number": plate_text,
+        "cropped_image": cropped_name,
+        "plate_number": rec.plate_number or plate_text, # Biển của xe trong bãi (khi check-out khớp gần đúng)
+        "confidence": plate_conf,
         "fee": rec.fee if rec.fee else 0,
         "message": msg
     }
 
+@app.websocket('/ws/gate')
+async def gate_stream(websocket: WebSocket, status: int = 1, lane: str = "default"):
+    """Chế độ cổng tự động: client gửi liên tục khung hình JPEG (bytes), server tự phát hiện xe,
+    bỏ phiếu biển số qua nhiều khung rồi ghi check-in (status=1) / check-out (status=0).
+    Server gửi lại sự kiện JSON: config, vehicle, read, committed, rejected, left."""
+    await websocket.accept()
+    await stream_gate.serve(websocket, stream_gate.LaneProcessor(status, lane))
+
+@app.get('/stream/stats')
+def stream_stats():
+    """Thống kê các làn đang chạy chế độ tự động: số khung nhận/bỏ, số lần chạy nhận diện, số lượt ghi"""
+    return stream_gate.stats()
+
+@app.get('/capture/profile')
+def get_capture_profile():
+    """Thông số chụp client nên dùng: kích thước tối đa, định dạng, chất lượng nén, dung lượng tối đa"""
+    return capture_profile.profile()
+
+@app.get('/capture/stats')
+def capture_stats():
+    """Dung lượng ảnh và thời gian giải mã theo định dạng; số ảnh không theo profile / bị từ chối"""
+    return capture_profile.stats.snapshot()
+
+@app.get('/inference/stats')
+def inference_stats():
+    """Thống kê bộ gom batch YOLO (kích thước batch, độ trễ, thời gian chờ) và cache kết quả (hit/miss)
+    (của tiến trình suy luận dùng chung nếu có cấu hình SPAS_INFERENCE_ADDRESS)"""
+    try:
+        return inference_client.stats()
+    except inference_client.InferenceError as exc:
+        return JSONResponse(status_code=503, content={"success": False, "message": str(exc)})
+
+@app.get('/images/stats')
+def image_stats():
+    """Thống kê kho ảnh: số ảnh chờ ghi, đã ghi, trùng nội dung, dung lượng trước/sau nén"""
+    return images.stats()
+
+@app.get('/sessions/{session_id}/image')
+def get_session_image(session_id: int, kind: str = "checkin", crop: bool = False, db: Session = Depends(get_db)):
+    """Ảnh vào/ra (kind=checkin|checkout, crop=true: ảnh cắt vùng xe) của 1 session.
+    Đọc từ file rời, hoặc từ file pack (cắt thẳng trên vùng mmap, không copy) nếu ảnh đã được gom."""
+    if kind not in ("checkin", "checkout"):
+        return JSONResponse(status_code=400, content={"success": False, "message": "kind phải là checkin hoặc checkout"})
+    session = db.get(ParkingSession, session_id)
+    name = getattr(session, f"{kind}_img") if session else None
+    data = image_pack.read(name, crop=crop) if name else None
+    if data is None:
+        return JSONResponse(status_code=404, content={"success": False, "message": "Không tìm thấy ảnh"})
+    media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+    return Response(content=data, media_type=media_type, headers={"Cache-Control": "private, max-age=86400"})
+
+@app.get('/packs/stats')
+def pack_stats():
+    """Thống kê file pack chứa ảnh cũ: số pack, số ảnh, dung lượng còn dùng / đã bỏ"""
+    return image_pack.stats()
+
+@app.get('/healthz')
+def healthz():
+    """Liveness: tiến trình API còn chạy (không phụ thuộc trạng thái model)"""
+    return {"status": "ok"}
+
+@app.get('/readyz')
+def readyz():
+    """Readiness: 200 khi model đã nạp + chạy thử xong, ngược lại 503 (kèm lỗi nếu nạp thất bại).
+    Kèm thời gian từng bước khởi động (imports, nạp model, chạy thử)"""
+    status = inference_client.readiness()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+@app.get('/metrics')
+def metrics():
+    """Metrics dạng Prometheus: histogram thời gian từng bước, số lần OCR, số request bị từ chối
+    theo lý do, hit/miss cache, độ sâu hàng đợi"""
+    return Response(content=telemetry.render() + inference_client.metrics_text(), media_type=telemetry.CONTENT_TYPE)
+
+@app.get('/admission/stats')
+def admission_stats():
+    """Thống kê hàng đợi tiếp nhận: độ sâu hàng đợi, thời gian chờ, số request bị từ chối"""
+    return admission.stats()
+
+@app.get('/writer/stats')
+def writer_stats():
+    """Thống kê thread ghi check-in/check-out: số lượt mỗi giao dịch (group commit), độ trễ commit,
+    thời gian chờ trong hàng đợi"""
+    return session_writer.stats()
+
+@app.get('/occupancy')
+def get_occupancy(include_list: bool = False):
+    """Số xe đang trong bãi (đọc từ chỉ mục trong RAM; chỉ đối chiếu số session mở với DB, không quét bảng)"""
+    result = {"count": _occupancy_count()}
+    if include_list:
+        result["vehicles"] = occupancy.index.snapshot()
+    return result
+
+@app.get('/stats')
+def get_stats(period: str = "hour", start: str = None, end: str = None, db: Session = Depends(get_db)):
+    """Lượt vào/ra, doanh thu, số xe cao nhất, thời gian gửi trung bình theo giờ (mặc định: hôm nay)
+    hoặc theo ngày (mặc định: 7 ngày gần nhất). Chỉ đọc bảng tổng hợp stats_rollups."""
+    if period not in rollups.PERIODS:
+        return JSONResponse(status_code=400, content={"success": False, "message": f"period phải là: {', '.join(rollups.PERIODS)}"})
+    now = datetime.now()
+    today = rollups.bucket_start(now, "day")
+    try:
+        dt_start = datetime.fromisoformat(start) if start else (today if period == "hour" else today - timedelta(days=6))
+        dt_end = datetime.fromisoformat(end) if end else today + timedelta(days=1)
+        result = rollups.query(db, period, dt_start, dt_end, now)
+    except ValueError as exc:
+        return JSONResponse(status_code=400, content={"success": False, "message": str(exc)})
+    result["occupancy"] = occupancy.index.sync(db)
+    result["tariff"] = tariff.tariff.describe()
+    return result
+
+@app.get('/purge/stats')
+def purge_stats():
+    """Kết quả lần xóa dữ liệu gần nhất và tiến độ dọn file ảnh (số file, dung lượng giải phóng, tốc độ)"""
+    return purge.stats()
+
 @app.post('/report')
-async def export_report(
+def export_report(
     start_time: str = Form(...),
     end_time: str = Form(...),
     secret_code: str = Form(...),
     delete_data: bool = Form(False),
+    archive_images: bool = Form(False), # Khi xóa: chuyển ảnh vào file nén thay vì xóa hẳn
+    format: str = Form("xlsx"), # xlsx | csv | ndjson
     db: Session = Depends(get_db)
 ):
-    """Xuất báo cáo Excel và tùy chọn xóa dữ liệu"""
+    """Xuất báo cáo (Excel/CSV/NDJSON) và tùy chọn xóa dữ liệu
+
+    Dữ liệu được lấy từ DB theo từng khối và gửi dần cho client (không dựng toàn bộ
+    báo cáo trong RAM). Endpoint là hàm thường (không async) và bộ sinh dữ liệu chạy
+    trên threadpool, nên xuất báo cáo lớn không chặn các request /upload.
+    """
     # 1. Kiểm tra mã bảo mật
     if secret_code != "123":
         return {"success": False, "message": "Mã xác nhận không đúng!"}
 
+    if format not in report_export.FORMATS:
+        return {"success": False, "message": f"Định dạng báo cáo không hỗ trợ: {format}. Chọn: {', '.join(report_export.FORMATS)}"}
+
     try:
         # Convert string ISO format từ frontend thành datetime
         dt_start = datetime.fromisoformat(start_time)
@@ -154,54 +433,46 @@ async def export_report(
     except ValueError:
         return {"success": False, "message": "Định dạng thời gian không hợp lệ"}
 
-    # 2. Lấy dữ liệu
-    sessions = crud.get_sessions_in_range(db, dt_start, dt_end)
+    # 2. Kiểm tra có dữ liệu không; chốt id lớn nhất để xuất và xóa đúng cùng 1 tập dữ liệu
+    # (xe check-in trong lúc đang xuất không bị xóa khi chưa có trong báo cáo)
+    max_id = crud.get_max_session_id_in_range(db, dt_start, dt_end)
     
-    if not sessions:
+    if max_id is None:
         return {"success": False, "message": "Không có dữ liệu trong khoảng thời gian này"}
 
-    # 3. Tạo file Excel bằng openpyxl
-    try:
-        import openpyxl
-    except ImportError:
-        return {"success": False, "message": "Lỗi Server: Chưa cài thư viện 'openpyxl'. Vui lòng chạy: pip install openpyxl"}
+    # 3. Chọn bộ mã hóa theo định dạng
+    if format == "xlsx":
+        try:
+            import openpyxl
+        except ImportError:
+            return {"success": False, "message": "Lỗi Server: Chưa cài thư viện 'openpyxl'. Vui lòng chạy: pip install openpyxl"}
+    media_type, ext, encoder = report_export.FORMATS[format]
+    body = encoder(report_export.iter_session_rows(dt_start, dt_end, max_id=max_id))
 
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Báo cáo gửi xe"
-    
-    # Header
-    headers = ["ID", "Biển số", "Giờ vào", "Giờ ra", "Trạng thái", "Phí (VNĐ)", "Ảnh vào", "Ảnh ra"]
-    ws.append(headers)
-    
-    for s in sessions:
-        ws.append([
-            s.id,
-            s.plate_number,
-            s.checkin_time.strftime("%Y-%m-%d %H:%M:%S") if s.checkin_time else "",
-            s.checkout_time.strftime("%Y-%m-%d %H:%M:%S") if s.checkout_time else "",
-            s.status,
-            s.fee,
-            s.checkin_img,
-            s.checkout_img
-        ])
-
-    # 4. Xóa dữ liệu nếu được yêu cầu (Sau khi đã đưa vào excel)
-    deleted_count = 0
+    # 4. Xóa dữ liệu nếu được yêu cầu: chạy SAU KHI đã gửi xong báo cáo cho client
+    # (client ngắt giữa chừng thì không xóa)
+    background = None
     if delete_data:
-        deleted_count = crud.delete_sessions_in_range(db, dt_start, dt_end, UPLOAD_DIR, CROP_DIR)
-        print(f"Đã xóa {deleted_count} bản ghi và giải phóng dung lượng.")
+        archive_path = None
+        if archive_images:
+            archive_path = os.path.join(
+                config.PURGE_ARCHIVE_DIR,
+                f"Anh_{dt_start.strftime('%Y%m%d%H%M')}_{dt_end.strftime('%Y%m%d%H%M')}.zip",
+            )
+        background = BackgroundTask(_delete_reported_sessions, dt_start, dt_end, max_id, archive_path)
 
-    # 5. Trả về file Excel
-    buffer = BytesIO()
-    wb.save(buffer)
-    buffer.seek(0)
-    
-    filename = f"BaoCao_{dt_start.strftime('%Y%m%d')}_{dt_end.strftime('%Y%m%d')}.xlsx"
+    filename = f"BaoCao_{dt_start.strftime('%Y%m%d')}_{dt_end.strftime('%Y%m%d')}.{ext}"
     
-    # Trả về file stream
+    # 5. Trả về file stream
     return StreamingResponse(
-        buffer, 
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f"attachment; filename={filename}"}
+        body, 
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+        background=background,
     )
+
+def _delete_reported_sessions(dt_start: datetime, dt_end: datetime, max_id: int, archive_path: str = None):
+    # Xóa session theo lô (giao dịch ngắn), ảnh được dọn ở thread nền (purge.py)
+    deleted_count = purge.purge_sessions(dt_start, dt_end, UPLOAD_DIR, CROP_DIR, max_id=max_id, archive_path=archive_path)
+    action = f"chuyển ảnh vào {archive_path}" if archive_path else "xóa ảnh"
+    log.info("Đã xóa %d bản ghi, đang %s ở chế độ nền.", deleted_count, action)
@@ -0,0 +1,144 @@
+"""
+Migration schema SQLite có đánh số phiên bản.
+
+Phiên bản hiện tại của file DB được lưu trong `PRAGMA user_version`. Khi khởi động,
+`upgrade(engine)` chạy lần lượt các migration có số lớn hơn phiên bản đó, nên file
+parking.db cũ được nâng cấp tại chỗ. Mỗi migration phải chạy lại được an toàn
+(IF NOT EXISTS / checkfirst), vì SQLite tự commit lệnh DDL.
+
+Thêm thay đổi schema mới: viết hàm `_mNNN_...(conn)` rồi thêm vào cuối MIGRATIONS.
+
+Chạy tay:
+    python migrations.py            # nâng cấp lên phiên bản mới nhất
+    python migrations.py --status   # xem phiên bản hiện tại
+"""
+import argparse
+
+from sqlalchemy import inspect
+
+import database
+import models
+
+
+def _m001_baseline(conn):
+    """Bảng chính parking_sessions (giống schema ban đầu)."""
+    database.ParkingSession.__table__.create(conn, checkfirst=True)
+
+
+def _m002_session_indexes(conn):
+    """Chỉ mục cho tra cứu session đang mở và truy vấn theo khoảng thời gian."""
+    conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_sessions_open_plate "
+        "ON parking_sessions (plate_number) WHERE status = 'PARKING'"
+    )
+    conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_sessions_checkin_time ON parking_sessions (checkin_time)"
+    )
+    conn.exec_driver_sql("ANALYZE parking_sessions")
+
+
+def _m003_legacy_parking_records(conn):
+    """
+    Bảng log cũ parking_records (models.ParkingRecord) không còn được ghi.
+    Bảng rỗng thì xóa; còn dữ liệu thì giữ nguyên để tra cứu
+    (crud.create_record tự tạo lại bảng nếu vẫn cần dùng).
+    """
+    table = models.ParkingRecord.__tablename__
+    if not inspect(conn).has_table(table):
+        return
+    count = conn.exec_driver_sql(f"SELECT COUNT(*) FROM {table}").scalar()
+    if count == 0:
+        conn.exec_driver_sql(f"DROP TABLE {table}")
+    else:
+        print(f"Giữ lại bảng cũ '{table}' ({count} dòng).")
+
+
+def _m004_purge_queue(conn):
+    """Hàng đợi file ảnh chờ dọn của chức năng xóa dữ liệu (purge.py)."""
+    database.PurgeFile.__table__.create(conn, checkfirst=True)
+
+
+def _m005_packed_images(conn):
+    """Chỉ mục vị trí ảnh trong các file pack (image_pack.py)."""
+    database.PackedImage.__table__.create(conn, checkfirst=True)
+
+
+def _m006_unique_open_plate(conn):
+    """
+    Mỗi biển số chỉ có tối đa 1 session PARKING (nhiều tiến trình API cùng ghi 1 file DB): thay chỉ
+    mục ix_sessions_open_plate bằng chỉ mục UNIQUE. Nếu DB cũ lỡ có nhiều session mở cùng biển, giữ
+    session mới nhất, các session cũ hơn được đóng (CHECKOUT, giờ ra = giờ vào của session mới nhất, phí 0).
+    """
+    newest = (
+        "(SELECT MAX(m.id) FROM parking_sessions m "
+        "WHERE m.plate_number = parking_sessions.plate_number AND m.status = 'PARKING')"
+    )
+    closed = conn.exec_driver_sql(
+        "UPDATE parking_sessions SET status = 'CHECKOUT', fee = 0, "
+        f"checkout_time = (SELECT n.checkin_time FROM parking_sessions n WHERE n.id = {newest}) "
+        f"WHERE status = 'PARKING' AND plate_number IS NOT NULL AND id < {newest}"
+    ).rowcount
+    if closed:
+        print(f"Đã đóng {closed} session mở trùng biển số")
+    conn.exec_driver_sql("DROP INDEX IF EXISTS ix_sessions_open_plate")
+    conn.exec_driver_sql(
+        "CREATE UNIQUE INDEX ix_sessions_open_plate "
+        "ON parking_sessions (plate_number) WHERE status = 'PARKING'"
+    )
+
+
+def _m007_stats_rollups(conn):
+    """
+    Bảng số liệu tổng hợp theo giờ/ngày (rollups.py). Dữ liệu cũ được dựng lại bằng
+    `python rollups.py --backfill` (không chạy trong migration vì phải quét toàn bộ session).
+    """
+    database.StatsRollup.__table__.create(conn, checkfirst=True)
+
+
+# (phiên bản, mô tả, hàm migration) - chỉ thêm vào cuối, không sửa/xóa migration đã phát hành
+MIGRATIONS = [
+    (1, "baseline parking_sessions", _m001_baseline),
+    (2, "session lookup/time-range indexes", _m002_session_indexes),
+    (3, "legacy parking_records table", _m003_legacy_parking_records),
+    (4, "purge file queue", _m004_purge_queue),
+    (5, "packed image index", _m005_packed_images),
+    (6, "unique open session per plate", _m006_unique_open_plate),
+    (7, "hourly/daily stats rollups", _m007_stats_rollups),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(engine) -> int:
+    with engine.connect() as conn:
+        return conn.exec_driver_sql("PRAGMA user_version").scalar()
+
+
+def upgrade(engine, verbose: bool = True) -> int:
+    """Nâng cấp schema lên phiên bản mới nhất. Trả về phiên bản sau khi nâng cấp."""
+    version = current_version(engine)
+    for number, description, migrate in MIGRATIONS:
+        if number <= version:
+            continue
+        with engine.begin() as conn:
+            migrate(conn)
+            conn.exec_driver_sql(f"PRAGMA user_version = {number}")
+        version = number
+        if verbose:
+            print(f"Đã áp dụng migration {number}: {description}")
+    return version
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migration schema parking.db")
+    parser.add_argument("--status", action="store_true", help="Chỉ xem phiên bản schema hiện tại")
+    args = parser.parse_args()
+
+    if args.status:
+        print(f"Schema version: {current_version(database.engine)} / mới nhất: {LATEST_VERSION}")
+        return
+    print(f"Schema version: {upgrade(database.engine)}")
+
+
+if __name__ == "__main__":
+    main()
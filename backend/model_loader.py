@@ -0,0 +1,133 @@
+"""
+Nạp model YOLO + OCR ở thread nền khi khởi động, chạy thử 1 lần rồi mới báo sẵn sàng.
+
+- API nhận kết nối ngay (GET /healthz), không phải chờ nạp model; GET /readyz trả 200 khi model
+  đã nạp + chạy thử xong (dùng cho load balancer / kiểm tra trước khi mở cổng).
+- Trong lúc nạp, /upload trả 503 + Retry-After thay vì giữ request chờ.
+- Thiếu file model (và không bật SPAS_MODEL_DOWNLOAD) -> trạng thái "failed" kèm thông báo lỗi
+  rõ ràng ở log và /readyz, không tự tải về.
+- Thời gian từng bước (imports, detector_load, ocr_load, warmup_detector, warmup_ocr, total)
+  được ghi log, trả trong /readyz và metrics `spas_startup_phase_seconds` để theo dõi chậm dần.
+
+Chạy tay (VD: tải model 1 lần khi có mạng, hoặc đo thời gian khởi động):
+    SPAS_MODEL_DOWNLOAD=1 python model_loader.py
+    python model_loader.py --json
+"""
+import argparse
+import json
+import logging
+import sys
+import threading
+import time
+
+import config
+import telemetry
+
+log = logging.getLogger("spas.startup")
+
+# Trạng thái của ModelLoader
+IDLE, LOADING, READY, FAILED = "idle", "loading", "ready", "failed"
+
+
+class ModelLoader:
+    """Trạng thái nạp model của tiến trình: idle -> loading -> ready | failed."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._thread = None
+        self.state = IDLE
+        self.error = None
+        self.phases = {}  # bước -> giây
+
+    def start(self):
+        """Bắt đầu nạp ở thread nền (gọi nhiều lần chỉ nạp 1 lần)."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self.state = LOADING
+            self._thread = threading.Thread(target=self.load, name="model-loader", daemon=True)
+            self._thread.start()
+
+    def load(self):
+        """Nạp + chạy thử model ngay trong thread hiện tại. Trả về True nếu sẵn sàng."""
+        self.state = LOADING
+        t0 = time.perf_counter()
+        phases = {}
+        try:
+            import yolo_utils
+        except Exception as exc:
+            return self._finish(phases, t0, exc, traceback=True)
+        phases["imports"] = time.perf_counter() - t0
+        try:
+            yolo_utils.load_models(phases)
+            if config.MODEL_WARMUP:
+                yolo_utils.warm_up(phases)
+        except yolo_utils.ModelLoadError as exc:
+            return self._finish(phases, t0, exc)
+        except Exception as exc:
+            return self._finish(phases, t0, exc, traceback=True)
+        return self._finish(phases, t0)
+
+    def _finish(self, phases: dict, t0: float, exc: Exception = None, traceback: bool = False) -> bool:
+        phases["total"] = time.perf_counter() - t0
+        self.phases = phases
+        if exc is None:
+            self.state = READY
+            log.info("Model sẵn sàng sau %.1fs", phases["total"],
+                     extra={"fields": {k: f"{v * 1000:.0f}ms" for k, v in phases.items()}})
+        else:
+            self.error = f"{type(exc).__name__}: {exc}"
+            self.state = FAILED
+            log.error("Không nạp được model: %s", exc, exc_info=exc if traceback else None)
+        self._done.set()
+        return self.state == READY
+
+    @property
+    def ready(self) -> bool:
+        return self.state == READY
+
+    def wait(self, timeout: float = None) -> bool:
+        """Chờ nạp xong (thành công hoặc lỗi). Trả về True nếu sẵn sàng."""
+        self._done.wait(timeout)
+        return self.ready
+
+    def status(self) -> dict:
+        return {
+            "state": self.state,
+            "ready": self.ready,
+            "error": self.error,
+            "phases_ms": {k: round(v * 1000, 1) for k, v in self.phases.items()},
+        }
+
+
+# Bộ nạp model dùng chung của tiến trình
+loader = ModelLoader()
+
+telemetry.gauge(
+    "spas_startup_phase_seconds", "Thời gian từng bước nạp + chạy thử model khi khởi động",
+    lambda: dict(loader.phases), ("phase",),
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Nạp + chạy thử model YOLO/OCR, in thời gian từng bước")
+    parser.add_argument("--json", action="store_true", help="In kết quả dạng JSON")
+    args = parser.parse_args()
+
+    telemetry.setup_logging()
+    ok = loader.load()
+    telemetry.shutdown_logging()
+    status = loader.status()
+    if args.json:
+        print(json.dumps(status, ensure_ascii=False))
+    else:
+        for name, ms in status["phases_ms"].items():
+            print(f"{name:<16} {ms:>10.1f} ms")
+        if not ok:
+            print(f"LỖI: {status['error']}", file=sys.stderr)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+
+from sqlalchemy import func
+
+import database
+from plate_match import FuzzyPlateIndex
+
+# 1 xe đang trong bãi: id session đang mở và giờ vào
+OpenSession = namedtuple("OpenSession", ["session_id", "checkin_time"])
+
+
+class OccupancyIndex:
+    """
+    Chỉ mục trong RAM các xe đang trong bãi: biển số -> session đang mở (PARKING).
+
+    - Được dựng lại từ DB khi khởi động (`rebuild`), và đối chiếu lại với DB (`sync`) ở đầu mỗi
+      lô ghi: tiến trình API khác (run_https.py --workers N) có thể đã check-in/check-out.
+    - Ghi xuyên (write-through): chỉ cập nhật SAU KHI DB commit thành công.
+    - Mỗi thao tác tự giữ khóa; `lock()` dùng khi cần nhiều bước liền nhau (tra cứu rồi bỏ mục
+      lệch, áp các thay đổi của 1 lô), không giữ qua lệnh ghi DB. 2 làn đọc cùng 1 biển số không
+      check-in trùng vì mọi check-in/check-out đi qua thread ghi (session_writer.py).
+    - Kèm chỉ mục tìm gần đúng (plate_match) để check-out được khi OCR đọc nhầm ký tự dễ lẫn.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._open = {}
+        self._id_sum = 0  # tổng id các session trong chỉ mục, để `sync` so với DB
+        self._fuzzy = FuzzyPlateIndex()
+
+    @contextmanager
+    def lock(self):
+        with self._lock:
+            yield self
+
+    def rebuild(self, db) -> int:
+        """Đọc lại toàn bộ session đang mở từ DB. Trả về số xe trong bãi."""
+        # Giữ khóa cả lúc truy vấn (chỉ đọc) để không lẫn với thay đổi của lô vừa commit
+        with self._lock:
+            rows = db.query(
+                database.ParkingSession.plate_number,
+                database.ParkingSession.id,
+                database.ParkingSession.checkin_time,
+            ).filter(
+                database.ParkingSession.status == "PARKING",
+                database.ParkingSession.plate_number.isnot(None),
+            ).order_by(database.ParkingSession.id).all()
+            # Mỗi biển số có tối đa 1 session PARKING (chỉ mục UNIQUE ix_sessions_open_plate)
+            self._open = {plate: OpenSession(sid, ts) for plate, sid, ts in rows}
+            self._id_sum = sum(entry.session_id for entry in self._open.values())
+            self._fuzzy.clear()
+            for plate in self._open:
+                self._fuzzy.add(plate)
+            return len(self._open)
+
+    def sync(self, db) -> int:
+        """
+        Đối chiếu chỉ mục với DB: số session đang mở + tổng id (chỉ đọc chỉ mục ix_sessions_open_plate,
+        không đọc bảng). Lệch thì dựng lại (`rebuild`). Trả về số xe trong bãi.
+        """
+        with self._lock:
+            count, id_sum = db.query(
+                func.count(database.ParkingSession.id),
+                func.coalesce(func.sum(database.ParkingSession.id), 0),
+            ).filter(
+                database.ParkingSession.status == "PARKING",
+                database.ParkingSession.plate_number.isnot(None),
+            ).one()
+            if count == len(self._open) and id_sum == self._id_sum:
+                return count
+            return self.rebuild(db)
+
+    def get(self, plate_number: str):
+        with self._lock:
+            return self._open.get(plate_number)
+
+    def closest(self, plate_number: str, max_distance: float, min_margin: float):
+        """
+        Xe trong bãi có biển gần nhất với `plate_number` (plate_match.PlateMatch) nếu không mơ hồ,
+        ngược lại None. Dùng khi không có biển khớp chính xác.
+        """
+        with self._lock:
+            return self._fuzzy.best(plate_number, max_distance, min_margin)
+
+    def __contains__(self, plate_number: str) -> bool:
+        with self._lock:
+            return plate_number in self._open
+
+    def add(self, plate_number: str, session_id: int, checkin_time):
+        with self._lock:
+            entry = self._open.get(plate_number)
+            if entry is None:
+                self._fuzzy.add(plate_number)
+            else:
+                self._id_sum -= entry.session_id
+            self._open[plate_number] = OpenSession(session_id, checkin_time)
+            self._id_sum += session_id
+
+    def remove(self, plate_number: str, session_id: int = None):
+        """Bỏ xe khỏi chỉ mục. Có `session_id` thì chỉ bỏ nếu đúng session đó đang mở."""
+        with self._lock:
+            entry = self._open.get(plate_number)
+            if entry is not None and (session_id is None or entry.session_id == session_id):
+                del self._open[plate_number]
+                self._id_sum -= entry.session_id
+                self._fuzzy.remove(plate_number)
+
+    def count(self) -> int:
+        with self._lock:
+            return len(self._open)
+
+    def snapshot(self):
+        """Danh sách xe đang trong bãi, sắp theo giờ vào."""
+        with self._lock:
+            items = list(self._open.items())
+        items.sort(key=lambda kv: (kv[1].checkin_time is None, kv[1].checkin_time))
+        return [
+            {"plate_number": plate, "session_id": entry.session_id, "checkin_time": entry.checkin_time}
+            for plate, entry in items
+        ]
+
+
+# Chỉ mục dùng chung của tiến trình
+index = OccupancyIndex()
@@ -0,0 +1,134 @@
+"""
+So sánh kết quả nhận diện xe giữa 2 backend trên 1 bộ ảnh mẫu, để chắc chắn
+backend nhanh hơn (ONNX / OpenVINO / INT8) không làm thay đổi xe được cắt.
+
+Ví dụ:
+    python parity_check.py --images uploads --b onnx --model-b yolov8n_int8.onnx
+
+Mã thoát khác 0 nếu có ảnh mà 2 backend chọn xe khác nhau.
+"""
+import argparse
+import glob
+import os
+import time
+
+import numpy as np
+
+from image_decode import decode_frame
+from inference_backends import create_backend
+from yolo_utils import VEHICLE_CLASSES, best_vehicle_box
+
+IMAGE_PATTERNS = ("*.jpg", "*.jpeg", "*.png")
+
+
+def iou(a, b) -> float:
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def match_vehicles(dets_a, dets_b, iou_threshold: float):
+    """Ghép cặp tham lam các box xe cùng class giữa 2 backend. Trả về (số cặp, số box lẻ)."""
+    va = sorted((d for d in dets_a if d.cls_id in VEHICLE_CLASSES), key=lambda d: -d.conf)
+    vb = [d for d in dets_b if d.cls_id in VEHICLE_CLASSES]
+    used = set()
+    matched = 0
+    for da in va:
+        best_j, best_iou = None, iou_threshold
+        for j, db in enumerate(vb):
+            if j in used or db.cls_id != da.cls_id:
+                continue
+            score = iou(da.box, db.box)
+            if score >= best_iou:
+                best_j, best_iou = j, score
+        if best_j is not None:
+            used.add(best_j)
+            matched += 1
+    return matched, (len(va) - matched) + (len(vb) - matched)
+
+
+def compare_crops(crop_a, crop_b) -> float:
+    """Độ lệch trung bình điểm ảnh giữa 2 ảnh cắt (0 = giống hệt), so trên vùng chung."""
+    h = min(crop_a.shape[0], crop_b.shape[0])
+    w = min(crop_a.shape[1], crop_b.shape[1])
+    if h == 0 or w == 0:
+        return 255.0
+    diff = np.abs(crop_a[:h, :w].astype(np.int16) - crop_b[:h, :w].astype(np.int16))
+    return float(diff.mean())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Kiểm tra tương đương giữa 2 backend nhận diện xe")
+    parser.add_argument("--images", required=True, help="Thư mục ảnh mẫu")
+    parser.add_argument("--a", default="ultralytics", help="Backend tham chiếu")
+    parser.add_argument("--model-a", default=None)
+    parser.add_argument("--b", default="onnx", help="Backend cần kiểm tra")
+    parser.add_argument("--model-b", default=None)
+    parser.add_argument("--iou", type=float, default=0.9, help="IoU tối thiểu để coi là cùng 1 xe được cắt")
+    args = parser.parse_args()
+
+    paths = []
+    for pattern in IMAGE_PATTERNS:
+        paths.extend(glob.glob(os.path.join(args.images, "**", pattern), recursive=True))
+    paths.sort()
+    if not paths:
+        raise SystemExit(f"Không có ảnh trong '{args.images}'")
+
+    backend_a = create_backend(args.a, args.model_a)
+    backend_b = create_backend(args.b, args.model_b)
+
+    mismatches = 0
+    unmatched_total = 0
+    time_a = time_b = 0.0
+    ious = []
+
+    for path in paths:
+        with open(path, "rb") as f:
+            frame = decode_frame(f.read())
+        if frame is None:
+            print(f"[BỎ QUA] {path}: không giải mã được")
+            continue
+        img = frame.det_img
+
+        t0 = time.perf_counter()
+        dets_a = backend_a.predict([img])[0]
+        t1 = time.perf_counter()
+        dets_b = backend_b.predict([img])[0]
+        t2 = time.perf_counter()
+        time_a += t1 - t0
+        time_b += t2 - t1
+
+        _, unmatched = match_vehicles(dets_a, dets_b, 0.5)
+        unmatched_total += unmatched
+
+        box_a, box_b = best_vehicle_box(dets_a), best_vehicle_box(dets_b)
+        name = os.path.basename(path)
+        if box_a is None and box_b is None:
+            print(f"[OK]   {name}: cả 2 không thấy xe")
+            continue
+        if box_a is None or box_b is None:
+            mismatches += 1
+            print(f"[LỆCH] {name}: chỉ 1 backend thấy xe ({args.a}={box_a is not None}, {args.b}={box_b is not None})")
+            continue
+
+        score = iou(box_a, box_b)
+        ious.append(score)
+        pixel_diff = compare_crops(frame.crop(box_a), frame.crop(box_b))
+        status = "OK" if score >= args.iou else "LỆCH"
+        if score < args.iou:
+            mismatches += 1
+        print(f"[{status}] {name}: IoU={score:.3f}, lệch điểm ảnh crop={pixel_diff:.2f}, số box xe không ghép được={unmatched}")
+
+    n = len(paths)
+    print("-" * 60)
+    print(f"Số ảnh: {n} | Ảnh cắt khác xe: {mismatches} | Box xe không ghép được: {unmatched_total}")
+    if ious:
+        print(f"IoU crop: trung bình {np.mean(ious):.3f}, nhỏ nhất {np.min(ious):.3f}")
+    print(f"Thời gian TB/ảnh: {args.a}={time_a / n * 1000:.1f} ms, {args.b}={time_b / n * 1000:.1f} ms")
+    raise SystemExit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
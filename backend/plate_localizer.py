@@ -0,0 +1,140 @@
+import cv2
+import numpy as np
+
+# Định vị vùng biển số bên trong ảnh xe (đã cắt bởi YOLO) bằng cạnh + hình thái học,
+# rồi nắn thẳng (deskew) để OCR chỉ phải đọc 1 vùng nhỏ thay vì cả chiếc xe.
+#
+# Biển số Việt Nam: biển dài 1 hàng ~ 520x110mm (tỉ lệ ~4.7), biển vuông 2 hàng
+# ~ 330x165mm (ô tô, tỉ lệ ~2.0) hoặc ~ 190x140mm (xe máy, tỉ lệ ~1.4)
+MIN_ASPECT = 1.1
+MAX_ASPECT = 6.0
+# Diện tích vùng biển so với ảnh xe (tỉ lệ)
+MIN_AREA_RATIO = 0.002
+MAX_AREA_RATIO = 0.30
+# Chiều rộng làm việc: ảnh lớn hơn sẽ được thu nhỏ khi tìm vùng biển (toạ độ được quy đổi lại)
+WORK_WIDTH = 640
+# Số ký tự tối thiểu phải thấy trong vùng ứng viên
+MIN_CHARS = 4
+# Nới rộng vùng biển thêm 1 chút để không cắt mất mép ký tự
+PAD_RATIO = 0.06
+
+
+def _order_points(pts):
+    """Sắp 4 góc theo thứ tự: trên-trái, trên-phải, dưới-phải, dưới-trái."""
+    pts = np.asarray(pts, dtype=np.float32)
+    s = pts.sum(axis=1)
+    d = np.diff(pts, axis=1).reshape(-1)
+    return np.array([pts[np.argmin(s)], pts[np.argmin(d)], pts[np.argmax(s)], pts[np.argmax(d)]], dtype=np.float32)
+
+
+def _count_chars(gray_plate) -> int:
+    """Đếm số thành phần liên thông có hình dạng giống ký tự trong vùng biển."""
+    h = gray_plate.shape[0]
+    if h < 8:
+        return 0
+    best = 0
+    # Thử cả chữ tối trên nền sáng lẫn chữ sáng trên nền tối
+    for mode in (cv2.THRESH_BINARY_INV, cv2.THRESH_BINARY):
+        _, binary = cv2.threshold(gray_plate, 0, 255, mode + cv2.THRESH_OTSU)
+        n, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+        count = 0
+        for i in range(1, n):
+            x, y, w, ch, area = stats[i]
+            # Biển 2 hàng: mỗi ký tự cao ~ 1/5 - 1/2 chiều cao biển; biển 1 hàng: ~ 1/2 - 0.9
+            if 0.2 * h <= ch <= 0.95 * h and 0.1 <= w / float(ch) <= 1.2 and area >= 0.15 * w * ch:
+                count += 1
+        best = max(best, count)
+    return best
+
+
+def _candidate_masks(gray):
+    """
+    Tạo các mặt nạ chứa vùng ứng viên biển số:
+    - Viền biển: cạnh Canny khép kín -> contour hình chữ nhật.
+    - Dãy ký tự: vùng có mật độ cạnh dọc cao sau blackhat/tophat, nối liền bằng closing.
+    """
+    masks = []
+    w = gray.shape[1]
+    blurred = cv2.bilateralFilter(gray, 7, 50, 50)
+
+    edges = cv2.Canny(blurred, 50, 150)
+    masks.append(cv2.dilate(edges, None, iterations=1))
+
+    # Kích thước kernel theo độ rộng ảnh, để ký tự to/nhỏ đều được nối thành 1 khối
+    hat_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (max(9, w // 12), max(3, w // 36)))
+    close_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (max(9, w // 20), max(3, w // 60)))
+    # Chữ tối trên nền sáng (biển trắng/vàng) -> blackhat; chữ sáng trên nền tối (biển xanh) -> tophat
+    for op in (cv2.MORPH_BLACKHAT, cv2.MORPH_TOPHAT):
+        hat = cv2.morphologyEx(blurred, op, hat_kernel)
+        grad = np.absolute(cv2.Sobel(hat, cv2.CV_32F, 1, 0, ksize=3))
+        grad = cv2.normalize(grad, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
+        grad = cv2.GaussianBlur(grad, (5, 5), 0)
+        grad = cv2.morphologyEx(grad, cv2.MORPH_CLOSE, close_kernel)
+        _, mask = cv2.threshold(grad, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        mask = cv2.erode(mask, None, iterations=2)
+        mask = cv2.dilate(mask, None, iterations=2)
+        masks.append(mask)
+    return masks
+
+
+def _warp(img, rect, scale: float, pad: bool = True):
+    """Cắt + nắn thẳng vùng `rect` (minAreaRect trên ảnh thu nhỏ) từ ảnh gốc `img`."""
+    (cx, cy), (w, h), angle = rect
+    if w < h:
+        # Đưa cạnh dài về phương ngang
+        w, h = h, w
+        angle += 90
+    if pad:
+        w, h = w * (1 + 2 * PAD_RATIO), h * (1 + 4 * PAD_RATIO)
+    rect = ((cx / scale, cy / scale), (w / scale, h / scale), angle)
+
+    src = _order_points(cv2.boxPoints(rect))
+    out_w, out_h = max(1, int(round(rect[1][0]))), max(1, int(round(rect[1][1])))
+    dst = np.array([[0, 0], [out_w - 1, 0], [out_w - 1, out_h - 1], [0, out_h - 1]], dtype=np.float32)
+    matrix = cv2.getPerspectiveTransform(src, dst)
+    return cv2.warpPerspective(img, matrix, (out_w, out_h), flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE)
+
+
+def localize_plate(vehicle_img):
+    """
+    Tìm vùng biển số trong ảnh xe và trả về ảnh biển đã nắn thẳng (BGR).
+    Trả về None nếu không tìm được vùng nào đủ tin cậy (khi đó nên OCR cả ảnh xe).
+    """
+    if vehicle_img is None or vehicle_img.size == 0:
+        return None
+
+    h, w = vehicle_img.shape[:2]
+    scale = min(1.0, WORK_WIDTH / float(w))
+    small = cv2.resize(vehicle_img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1.0 else vehicle_img
+    gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    total_area = float(gray.shape[0] * gray.shape[1])
+
+    best = None
+    best_score = 0.0
+    for mask in _candidate_masks(gray):
+        contours, _ = cv2.findContours(mask, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+        for cnt in contours:
+            rect = cv2.minAreaRect(cnt)
+            rw, rh = rect[1]
+            if rw < 1 or rh < 1:
+                continue
+            aspect = max(rw, rh) / min(rw, rh)
+            area_ratio = (rw * rh) / total_area
+            if not (MIN_ASPECT <= aspect <= MAX_ASPECT and MIN_AREA_RATIO <= area_ratio <= MAX_AREA_RATIO):
+                continue
+
+            plate = _warp(small, rect, 1.0, pad=False)
+            chars = _count_chars(cv2.cvtColor(plate, cv2.COLOR_BGR2GRAY))
+            if chars < MIN_CHARS:
+                continue
+
+            # Ưu tiên vùng có nhiều ký tự (7-9 là lý tưởng), nằm ở nửa dưới xe, độ phủ contour cao
+            fill = cv2.contourArea(cnt) / (rw * rh)
+            position = 0.5 + 0.5 * (rect[0][1] / gray.shape[0])
+            score = min(chars, 9) * fill * position
+            if score > best_score:
+                best, best_score = rect, score
+
+    if best is None:
+        return None
+    return _warp(vehicle_img, best, scale)
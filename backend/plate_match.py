@@ -0,0 +1,135 @@
+"""
+Tìm gần đúng biển số trong danh sách xe đang trong bãi, dùng khi check-out mà OCR
+đọc nhầm 1-2 ký tự dễ lẫn (O/0, B/8/3, S/5...) nên không khớp chính xác.
+
+- Khoảng cách: edit distance có trọng số trên biển số đã bỏ dấu `-` `.`; thay 1 ký tự bằng
+  ký tự cùng nhóm dễ nhầm tốn `CONFUSION_COST`, các thao tác khác (thay/thêm/bớt) tốn 1.
+- Chỉ mục: mỗi biển được quy về "dạng chuẩn" (mỗi ký tự -> đại diện nhóm dễ nhầm) và lưu
+  cùng các biến thể bớt 1 ký tự (deletion neighbourhood). Biển lệch bất kỳ số ký tự dễ nhầm
+  + tối đa 1 thao tác thường luôn có chung ít nhất 1 khóa với biển truy vấn, nên chỉ cần
+  ~10 lần tra dict rồi tính khoảng cách trên vài ứng viên, không phụ thuộc số xe trong bãi.
+"""
+import re
+from collections import namedtuple
+
+# Bảng ký tự OCR hay đọc nhầm (dùng chung với yolo_utils.fix_vietnamese_plate_format)
+# Nhầm Chữ -> Số (2 ký tự đầu và dãy số cuối)
+CHAR_TO_DIGIT = {'O': '0', 'D': '0', 'Q': '0', 'I': '1', 'L': '1', 'Z': '2', 'B': '3', 'S': '5', 'G': '6'}
+# Nhầm Số -> Chữ (ký tự thứ 3 - Series)
+DIGIT_TO_CHAR = {'0': 'O', '1': 'I', '2': 'Z', '3': 'B', '4': 'A', '5': 'S', '6': 'G', '7': 'T', '8': 'B', '9': 'G'}
+
+# Định dạng biển số hợp lệ sau chuẩn hóa (VD: 30A-123.45)
+PLATE_PATTERN = r'^\d{2}[A-Z]-\d{3}\.\d{2}$'
+
+# Chi phí thay 1 ký tự bằng ký tự cùng nhóm dễ nhầm (thay ký tự khác nhóm = 1)
+CONFUSION_COST = 0.25
+
+PlateMatch = namedtuple("PlateMatch", ["plate_number", "distance"])
+
+
+def _confusion_groups():
+    """Gộp các cặp dễ nhầm thành nhóm (VD: B, 3, 8), trả về ký tự -> đại diện nhóm."""
+    parent = {}
+
+    def find(c):
+        parent.setdefault(c, c)
+        while parent[c] != c:
+            c = parent[c]
+        return c
+
+    for a, b in list(CHAR_TO_DIGIT.items()) + list(DIGIT_TO_CHAR.items()):
+        ra, rb = find(a), find(b)
+        if ra != rb:
+            parent[max(ra, rb)] = min(ra, rb)
+    return {c: find(c) for c in parent}
+
+
+_GROUP = _confusion_groups()
+
+
+def is_valid_plate(text: str) -> bool:
+    """Biển 5 số đúng định dạng: 2 số + 1 chữ + '-' + 3 số + '.' + 2 số (VD: 30A-123.45)"""
+    return bool(text) and re.match(PLATE_PATTERN, text) is not None
+
+
+def normalize(plate: str) -> str:
+    """Bỏ dấu phân cách, viết hoa: "30a-123.45" -> "30A12345"."""
+    return "".join(ch for ch in plate.upper() if ch.isalnum())
+
+
+def canonical(plate: str) -> str:
+    """Dạng chuẩn: mỗi ký tự thay bằng đại diện nhóm dễ nhầm của nó."""
+    return "".join(_GROUP.get(ch, ch) for ch in normalize(plate))
+
+
+def _keys(canon: str):
+    """Dạng chuẩn + mọi biến thể bớt 1 ký tự."""
+    keys = {canon}
+    keys.update(canon[:i] + canon[i + 1:] for i in range(len(canon)))
+    return keys
+
+
+def weighted_distance(a: str, b: str) -> float:
+    """Edit distance có trọng số giữa 2 biển số (đã bỏ dấu phân cách)."""
+    a, b = normalize(a), normalize(b)
+    prev = [float(j) for j in range(len(b) + 1)]
+    for i, ca in enumerate(a, 1):
+        cur = [float(i)]
+        ga = _GROUP.get(ca, ca)
+        for j, cb in enumerate(b, 1):
+            if ca == cb:
+                sub = 0.0
+            elif ga == _GROUP.get(cb, cb):
+                sub = CONFUSION_COST
+            else:
+                sub = 1.0
+            cur.append(min(prev[j - 1] + sub, prev[j] + 1.0, cur[j - 1] + 1.0))
+        prev = cur
+    return prev[-1]
+
+
+class FuzzyPlateIndex:
+    """
+    Chỉ mục tìm gần đúng trên tập biển số. Không tự khóa: được gọi bên trong khóa của
+    `occupancy.OccupancyIndex`. Tìm đủ mọi biển có khoảng cách < 2.
+    """
+
+    def __init__(self):
+        self._buckets = {}  # khóa -> tập biển số
+
+    def clear(self):
+        self._buckets = {}
+
+    def add(self, plate: str):
+        for key in _keys(canonical(plate)):
+            self._buckets.setdefault(key, set()).add(plate)
+
+    def remove(self, plate: str):
+        for key in _keys(canonical(plate)):
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.discard(plate)
+                if not bucket:
+                    del self._buckets[key]
+
+    def candidates(self, plate: str, max_distance: float):
+        """Các biển có khoảng cách <= `max_distance`, sắp tăng dần theo khoảng cách."""
+        found = set()
+        for key in _keys(canonical(plate)):
+            found.update(self._buckets.get(key, ()))
+        matches = [PlateMatch(p, weighted_distance(plate, p)) for p in found]
+        matches = [m for m in matches if m.distance <= max_distance]
+        matches.sort(key=lambda m: (m.distance, m.plate_number))
+        return matches
+
+    def best(self, plate: str, max_distance: float, min_margin: float):
+        """
+        Biển gần nhất nếu không mơ hồ: biển thứ 2 phải xa hơn ít nhất `min_margin`.
+        None nếu không có biển đủ gần hoặc có nhiều biển gần như nhau.
+        """
+        matches = self.candidates(plate, max_distance + min_margin)
+        if not matches or matches[0].distance > max_distance:
+            return None
+        if len(matches) > 1 and matches[1].distance - matches[0].distance < min_margin:
+            return None
+        return matches[0]
@@ -0,0 +1,310 @@
+"""
+Xóa dữ liệu cũ (session + ảnh) theo khoảng thời gian, không làm nghẽn cổng vào/ra.
+
+- Session được xóa bằng lệnh DELETE theo lô `PURGE_BATCH_SIZE` dòng, mỗi lô 1 giao dịch
+  ngắn; giữa các lô check-in/check-out vẫn ghi DB bình thường.
+- Đường dẫn ảnh của mỗi lô được ghi vào bảng `purge_queue` CÙNG giao dịch với lệnh xóa,
+  rồi `FileReclaimer` xóa file (hoặc chuyển vào file .zip) ở thread nền. Tắt server giữa
+  chừng -> lần khởi động sau `reclaimer.resume()` dọn tiếp phần còn lại.
+"""
+import logging
+import os
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import delete, func, insert, select
+
+import config
+import database
+import image_pack
+import image_store
+import occupancy
+
+log = logging.getLogger("spas.purge")
+
+# Số file lấy ra từ purge_queue mỗi lượt
+FILE_CHUNK = 256
+
+
+# Số tham số tối đa trong 1 mệnh đề IN (...) (SQLite cũ giới hạn 999 tham số/câu lệnh)
+IN_CHUNK = 500
+
+
+def session_image_paths(img_name: str, upload_dir: str, crop_dir: str):
+    """Các file ảnh của 1 lần chụp: ảnh gốc + ảnh cắt vùng xe (tên phân thư mục hoặc tên phẳng cũ)."""
+    if not img_name:
+        return []
+    return [image_store.original_path(upload_dir, img_name), image_store.crop_path(crop_dir, img_name)]
+
+
+def _still_referenced(conn, S, names):
+    """Tên ảnh vẫn được session còn lại dùng (ảnh đặt tên theo nội dung có thể dùng chung)."""
+    names = list(names)
+    used = set()
+    for i in range(0, len(names), IN_CHUNK):
+        chunk = names[i:i + IN_CHUNK]
+        for col in (S.c.checkin_img, S.c.checkout_img):
+            used.update(r[0] for r in conn.execute(select(col).where(col.in_(chunk)).distinct()))
+    return used
+
+
+_remove_file = image_store.remove_file
+
+
+class FileReclaimer:
+    """
+    Thread nền dọn các file trong `purge_queue`:
+    - chế độ xóa: xóa song song bằng pool `workers` thread;
+    - chế độ lưu trữ: ghi lần lượt vào file .zip (zipfile không ghi song song được) rồi xóa file gốc.
+    Dòng trong purge_queue chỉ bị xóa sau khi file đã được xử lý xong.
+    """
+
+    def __init__(self, workers: int = 4, chunk: int = FILE_CHUNK):
+        self.chunk = max(1, int(chunk))
+        self._executor = ThreadPoolExecutor(max_workers=max(1, int(workers)), thread_name_prefix="purge-file")
+        self._wake = threading.Event()
+        self._idle = threading.Event()
+        self._idle.set()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.files_removed = 0
+        self.files_archived = 0
+        self.files_missing = 0
+        self.errors = 0
+        self.bytes_freed = 0
+        self.archive_bytes = 0
+        self.busy_s = 0.0
+
+    def notify(self):
+        """Báo có file mới trong purge_queue (khởi động thread nền nếu chưa chạy)."""
+        with self._thread_lock:
+            self._idle.clear()
+            self._wake.set()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="purge-reclaimer", daemon=True)
+                self._thread.start()
+
+    def resume(self) -> int:
+        """Gọi khi khởi động: còn file chờ dọn từ lần chạy trước thì dọn tiếp."""
+        pending = self.pending()
+        if pending:
+            log.info("🧹 Dọn tiếp %d file ảnh còn lại từ lần xóa dữ liệu trước.", pending)
+            self.notify()
+        return pending
+
+    def wait_idle(self, timeout: float = None) -> bool:
+        """Chờ dọn hết purge_queue (dùng cho CLI / benchmark)."""
+        return self._idle.wait(timeout)
+
+    def pending(self) -> int:
+        with database.engine.connect() as conn:
+            return conn.execute(select(func.count()).select_from(database.PurgeFile.__table__)).scalar()
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            try:
+                while self._drain_chunk():
+                    pass
+            except Exception as exc:  # DB lỗi: giữ nguyên hàng đợi, lần notify/khởi động sau thử lại
+                with self._stats_lock:
+                    self.errors += 1
+                log.error("⚠️ Lỗi khi dọn file ảnh: %s", exc)
+            if not self._wake.is_set():
+                self._idle.set()
+
+    def _drain_chunk(self) -> bool:
+        table = database.PurgeFile.__table__
+        with database.engine.connect() as conn:
+            rows = conn.execute(
+                select(table.c.id, table.c.path, table.c.archive).order_by(table.c.id).limit(self.chunk)
+            ).all()
+        if not rows:
+            return False
+
+        # Ảnh của session vừa tạo có thể vẫn nằm trong hàng đợi ghi nền
+        image_store.store.flush()
+        t0 = time.perf_counter()
+        to_delete = [r for r in rows if not r.archive]
+        to_archive = [r for r in rows if r.archive]
+        done_ids = []
+
+        for row, result in zip(to_delete, self._executor.map(self._safe_remove, [r.path for r in to_delete])):
+            if result is not False:
+                done_ids.append(row.id)
+
+        archives = {}
+        for row in to_archive:
+            archives.setdefault(row.archive, []).append(row)
+        for archive_path, archive_rows in archives.items():
+            done_ids.extend(self._archive(archive_path, archive_rows))
+
+        if done_ids:
+            with database.engine.begin() as conn:
+                conn.execute(delete(table).where(table.c.id.in_(done_ids)))
+        with self._stats_lock:
+            self.busy_s += time.perf_counter() - t0
+        # File lỗi (VD: đang bị khóa) vẫn ở lại hàng đợi; dừng lượt này để không lặp vô hạn
+        return len(done_ids) == len(rows)
+
+    def _safe_remove(self, path: str):
+        try:
+            size = _remove_file(path)
+        except OSError as exc:
+            log.warning("⚠️ Không xóa được %s: %s", path, exc)
+            with self._stats_lock:
+                self.errors += 1
+            return False
+        with self._stats_lock:
+            if size is None:
+                self.files_missing += 1
+            else:
+                self.files_removed += 1
+                self.bytes_freed += size
+        return size
+
+    def _archive(self, archive_path: str, rows):
+        """Chuyển file vào `archive_path` (.zip, nén deflate) rồi xóa file gốc. Trả về id đã xong."""
+        done = []
+        os.makedirs(os.path.dirname(os.path.abspath(archive_path)), exist_ok=True)
+        try:
+            zf = zipfile.ZipFile(archive_path, "a", compression=zipfile.ZIP_DEFLATED)
+        except (OSError, zipfile.BadZipFile) as exc:
+            log.error("⚠️ Không mở được file nén %s: %s", archive_path, exc)
+            with self._stats_lock:
+                self.errors += 1
+            return done
+        with zf:
+            existing = set(zf.namelist())
+            for row in rows:
+                arcname = image_store.archive_name(row.path)
+                try:
+                    if not os.path.exists(row.path):
+                        with self._stats_lock:
+                            self.files_missing += 1
+                        done.append(row.id)
+                        continue
+                    # Đã ghi vào file nén ở lần chạy trước (tắt server trước khi kịp xóa file gốc)
+                    if arcname not in existing:
+                        zf.write(row.path, arcname)
+                        existing.add(arcname)
+                        compressed = zf.getinfo(arcname).compress_size
+                    else:
+                        compressed = 0
+                    size = _remove_file(row.path) or 0
+                except OSError as exc:
+                    log.warning("⚠️ Không lưu trữ được %s: %s", row.path, exc)
+                    with self._stats_lock:
+                        self.errors += 1
+                    continue
+                with self._stats_lock:
+                    self.files_archived += 1
+                    self.bytes_freed += size
+                    self.archive_bytes += compressed
+                done.append(row.id)
+        return done
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            files = self.files_removed + self.files_archived
+            busy = self.busy_s
+            result = {
+                "files_removed": self.files_removed,
+                "files_archived": self.files_archived,
+                "files_missing": self.files_missing,
+                "errors": self.errors,
+                "bytes_freed": self.bytes_freed,
+                "archive_bytes": self.archive_bytes,
+                "busy_s": round(busy, 3),
+                "files_per_s": round(files / busy, 1) if busy else 0.0,
+                "mb_per_s": round(self.bytes_freed / 1e6 / busy, 2) if busy else 0.0,
+            }
+        result["pending"] = self.pending()
+        result["running"] = not self._idle.is_set()
+        return result
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+# Thread dọn file dùng chung của tiến trình
+reclaimer = FileReclaimer(workers=config.PURGE_FILE_WORKERS)
+
+# Kết quả lần xóa dữ liệu gần nhất (GET /purge/stats)
+_last_purge = {}
+_last_purge_lock = threading.Lock()
+
+
+def purge_sessions(start_date, end_date, upload_dir: str, crop_dir: str, max_id: int = None,
+                   archive_path: str = None, batch_size: int = None) -> int:
+    """
+    Xóa các session có checkin_time trong [start_date, end_date] (và id <= max_id nếu có)
+    theo lô, đưa ảnh của chúng vào purge_queue (xóa, hoặc chuyển vào `archive_path` nếu có).
+    Trả về số session đã xóa; file ảnh được dọn dần ở thread nền.
+    """
+    batch_size = max(1, int(batch_size or config.PURGE_BATCH_SIZE))
+    S = database.ParkingSession.__table__
+    queue = database.PurgeFile.__table__
+    in_range = [S.c.checkin_time >= start_date, S.c.checkin_time <= end_date]
+    if max_id is not None:
+        in_range.append(S.c.id <= max_id)
+
+    t0 = time.perf_counter()
+    deleted = files = batches = 0
+    last_id = 0
+    while True:
+        # Không giữ khóa chỉ mục xe trong bãi qua giao dịch: lô ghi check-in/check-out giữ khóa ghi
+        # SQLite (BEGIN IMMEDIATE) nên không chen vào giữa lô xóa, và tự đối chiếu chỉ mục với DB
+        with database.engine.begin() as conn:
+            rows = conn.execute(
+                select(S.c.id, S.c.plate_number, S.c.status, S.c.checkin_img, S.c.checkout_img)
+                .where(*in_range, S.c.id > last_id)
+                .order_by(S.c.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            # Xóa cả lô bằng 1 lệnh theo khoảng id (không giới hạn số tham số như IN (...))
+            conn.execute(delete(S).where(*in_range, S.c.id >= rows[0].id, S.c.id <= rows[-1].id))
+            names = {n for row in rows for n in (row.checkin_img, row.checkout_img) if n}
+            names -= _still_referenced(conn, S, names)
+            # Ảnh đã gom vào pack: bỏ chỉ mục (file pack chỉ ghi nối thêm, không xóa được từng ảnh)
+            image_pack.forget(conn, names)
+            paths = []
+            for name in sorted(names):
+                paths += session_image_paths(name, upload_dir, crop_dir)
+            if paths:
+                conn.execute(insert(queue), [{"path": p, "archive": archive_path} for p in paths])
+        # Chỉ cập nhật chỉ mục sau khi giao dịch đã commit
+        for row in rows:
+            if row.status == "PARKING" and row.plate_number:
+                occupancy.index.remove(row.plate_number, row.id)
+
+        last_id = rows[-1].id
+        deleted += len(rows)
+        files += len(paths)
+        batches += 1
+        reclaimer.notify()
+
+    elapsed = time.perf_counter() - t0
+    with _last_purge_lock:
+        _last_purge.clear()
+        _last_purge.update({
+            "rows_deleted": deleted,
+            "batches": batches,
+            "files_queued": files,
+            "archive": archive_path,
+            "elapsed_s": round(elapsed, 3),
+            "rows_per_s": round(deleted / elapsed, 1) if elapsed else 0.0,
+        })
+    return deleted
+
+
+def stats() -> dict:
+    with _last_purge_lock:
+        last = dict(_last_purge)
+    return {"last_purge": last or None, "files": reclaimer.stats()}
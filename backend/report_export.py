@@ -0,0 +1,113 @@
+import csv
+import io
+import json
+import tempfile
+
+import database
+from database import SessionLocal
+
+# Header báo cáo (dùng chung cho mọi định dạng)
+REPORT_HEADERS = ["ID", "Biển số", "Giờ vào", "Giờ ra", "Trạng thái", "Phí (VNĐ)", "Ảnh vào", "Ảnh ra"]
+NDJSON_KEYS = ["id", "plate_number", "checkin_time", "checkout_time", "status", "fee", "checkin_img", "checkout_img"]
+
+# Số dòng lấy từ DB mỗi lần (không giữ toàn bộ khoảng thời gian trong RAM)
+CHUNK_ROWS = 1000
+# Kích thước tối thiểu 1 khối dữ liệu gửi cho client
+CHUNK_BYTES = 64 * 1024
+# File xlsx được dựng trên file tạm; nhỏ hơn ngưỡng này thì giữ trong RAM
+XLSX_SPOOL_BYTES = 8 * 1024 * 1024
+
+
+def _fmt_time(value):
+    return value.strftime("%Y-%m-%d %H:%M:%S") if value else ""
+
+
+def iter_session_rows(start_date, end_date, max_id: int = None, chunk_rows: int = CHUNK_ROWS):
+    """
+    Lấy các session trong khoảng thời gian (theo checkin_time) theo từng khối `chunk_rows` dòng
+    (server-side cursor, yield_per), trả về từng dòng dạng list đã định dạng.
+    Dùng session DB riêng, đóng khi duyệt xong hoặc khi client ngắt kết nối.
+    """
+    S = database.ParkingSession
+    db = SessionLocal()
+    try:
+        query = db.query(
+            S.id, S.plate_number, S.checkin_time, S.checkout_time, S.status, S.fee, S.checkin_img, S.checkout_img
+        ).filter(S.checkin_time >= start_date, S.checkin_time <= end_date)
+        if max_id is not None:
+            query = query.filter(S.id <= max_id)
+        query = query.order_by(S.checkin_time, S.id).execution_options(yield_per=chunk_rows)
+        for row in query:
+            yield [
+                row.id,
+                row.plate_number,
+                _fmt_time(row.checkin_time),
+                _fmt_time(row.checkout_time),
+                row.status,
+                row.fee,
+                row.checkin_img,
+                row.checkout_img,
+            ]
+    finally:
+        db.close()
+
+
+def stream_csv(rows):
+    """CSV UTF-8 (có BOM để Excel hiển thị đúng tiếng Việt), gửi theo từng khối."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write("\ufeff")
+    writer.writerow(REPORT_HEADERS)
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= CHUNK_BYTES:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+
+def stream_ndjson(rows):
+    """Mỗi dòng 1 object JSON (NDJSON), gửi theo từng khối."""
+    parts = []
+    size = 0
+    for row in rows:
+        line = json.dumps(dict(zip(NDJSON_KEYS, row)), ensure_ascii=False) + "\n"
+        parts.append(line)
+        size += len(line)
+        if size >= CHUNK_BYTES:
+            yield "".join(parts).encode("utf-8")
+            parts, size = [], 0
+    yield "".join(parts).encode("utf-8")
+
+
+def stream_xlsx(rows):
+    """
+    Excel dựng bằng workbook write-only của openpyxl: từng dòng được ghi thẳng ra file tạm,
+    không giữ toàn bộ bảng trong RAM. Định dạng zip của xlsx chỉ hoàn tất khi đã có mọi dòng,
+    nên byte đầu tiên được gửi sau khi ghi xong (dùng csv/ndjson nếu cần byte đầu tiên sớm).
+    """
+    import openpyxl
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("Báo cáo gửi xe")
+    ws.append(REPORT_HEADERS)
+    for row in rows:
+        ws.append(row)
+
+    with tempfile.SpooledTemporaryFile(max_size=XLSX_SPOOL_BYTES) as tmp:
+        wb.save(tmp)
+        tmp.seek(0)
+        while True:
+            chunk = tmp.read(CHUNK_BYTES)
+            if not chunk:
+                break
+            yield chunk
+
+
+# định dạng -> (media type, phần mở rộng file, hàm sinh dữ liệu)
+FORMATS = {
+    "xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "xlsx", stream_xlsx),
+    "csv": ("text/csv; charset=utf-8", "csv", stream_csv),
+    "ndjson": ("application/x-ndjson", "ndjson", stream_ndjson),
+}
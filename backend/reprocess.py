@@ -0,0 +1,454 @@
+"""
+Chạy lại nhận diện (giải mã -> YOLO -> cắt xe -> OCR) trên ảnh đã lưu, để kiểm tra lại lịch sử
+sau khi sửa read_plate_text / fix_vietnamese_plate_format, không cần gửi từng ảnh qua HTTP.
+
+- Nguồn ảnh: ảnh vào/ra của các session trong parking_sessions (lọc theo khoảng giờ vào / id),
+  đọc từ file rời hoặc file pack (image_pack.read); hoặc mọi ảnh trong 1 thư mục (--images).
+- Chạy song song trên pool tiến trình: mỗi tiến trình nạp + chạy thử model 1 lần (model_loader)
+  rồi xử lý lần lượt từng ảnh (không qua bộ gom batch / cache kết quả của server).
+- Kết quả từng ảnh được ghi nối vào `<out>/results.ndjson` ngay khi có, file này cũng là điểm
+  lưu tiến độ: bị ngắt giữa chừng thì chạy lại với --resume để làm tiếp phần còn lại.
+- `<out>/diff.csv`: các ảnh có biển đọc lại khác biển đang lưu.
+- --apply: ghi biển đọc lại (đủ tin cậy, đúng định dạng) vào parking_sessions theo lô, mỗi lô
+  1 giao dịch. Chỉ sửa session đã check-out (session đang mở nằm trong chỉ mục trong RAM của
+  server) và chỉ khi biển trong DB chưa bị đổi kể từ lúc đọc.
+- --scaling 1,2,4: đo số ảnh/giây theo số tiến trình trên 1 mẫu ảnh (không ghi kết quả).
+
+Ví dụ (chạy trong thư mục backend/):
+    python reprocess.py --out runs/ocr_v2 --workers 4
+    python reprocess.py --out runs/ocr_v2 --start 2026-10-01 --end 2026-10-08
+    python reprocess.py --out runs/ocr_v2 --resume              # làm tiếp sau khi bị ngắt
+    python reprocess.py --out runs/ocr_v2 --resume --apply      # ghi biển đã sửa vào DB
+    python reprocess.py --out runs/uploads --images uploads
+    python reprocess.py --scaling 1,2,4 --sample 64
+"""
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+
+from sqlalchemy import bindparam, or_, select, update
+
+import config
+import database
+
+# 1 ảnh cần xử lý lại. key: "<session_id>:<checkin|checkout>" hoặc "file:<tên>"
+Item = namedtuple("Item", ["key", "session_id", "kind", "name", "path", "stored_plate"])
+
+RESULTS_FILE = "results.ndjson"
+META_FILE = "meta.json"
+DIFF_FILE = "diff.csv"
+DIFF_COLUMNS = ["key", "session_id", "kind", "image", "stored_plate", "new_plate", "confidence", "change"]
+# Tham số chọn ảnh được lưu trong meta.json, --resume dùng lại đúng tập ảnh này
+SELECTION_ARGS = ("images", "start", "end", "min_id", "max_id", "kinds")
+# Số session đọc từ DB mỗi lượt
+SESSION_CHUNK = 500
+# Số tham số tối đa trong 1 mệnh đề IN (...)
+IN_CHUNK = 500
+# Thời gian chờ tối đa để mọi tiến trình nạp xong model (giây)
+READY_TIMEOUT_S = 600
+
+S = database.ParkingSession.__table__
+
+
+# --- Nguồn ảnh ---
+def iter_session_items(start: datetime = None, end: datetime = None, min_id: int = None, max_id: int = None,
+                       kinds=("checkin", "checkout")):
+    """Ảnh vào/ra của các session (theo id tăng dần, đọc DB theo từng khối)."""
+    last_id = (min_id - 1) if min_id else 0
+    while True:
+        query = select(S.c.id, S.c.plate_number, S.c.checkin_img, S.c.checkout_img).where(S.c.id > last_id)
+        if max_id:
+            query = query.where(S.c.id <= max_id)
+        if start:
+            query = query.where(S.c.checkin_time >= start)
+        if end:
+            query = query.where(S.c.checkin_time <= end)
+        with database.engine.connect() as conn:
+            rows = conn.execute(query.order_by(S.c.id).limit(SESSION_CHUNK)).all()
+        if not rows:
+            return
+        for row in rows:
+            for kind in kinds:
+                name = getattr(row, f"{kind}_img")
+                if name:
+                    yield Item(f"{row.id}:{kind}", row.id, kind, name, None, row.plate_number)
+        last_id = rows[-1].id
+
+
+def _sessions_by_image(names):
+    """Tên ảnh -> (session_id, loại ảnh, biển đang lưu) của session dùng ảnh đó."""
+    found = {}
+    with database.engine.connect() as conn:
+        for i in range(0, len(names), IN_CHUNK):
+            chunk = names[i:i + IN_CHUNK]
+            rows = conn.execute(
+                select(S.c.id, S.c.plate_number, S.c.checkin_img, S.c.checkout_img)
+                .where(or_(S.c.checkin_img.in_(chunk), S.c.checkout_img.in_(chunk)))
+            )
+            for row in rows:
+                for kind in ("checkin", "checkout"):
+                    name = getattr(row, f"{kind}_img")
+                    if name in chunk:
+                        found.setdefault(name, (row.id, kind, row.plate_number))
+    return found
+
+
+def iter_dir_items(root: str):
+    """Mọi ảnh gốc trong thư mục `root` (bỏ ảnh cắt crop_*), kèm session dùng ảnh đó nếu có."""
+    from image_store import IMAGE_EXTS
+
+    def flush(batch):
+        known = _sessions_by_image([name for name, _ in batch])
+        for name, path in batch:
+            session_id, kind, plate = known.get(name, (None, None, None))
+            yield Item(f"file:{name}", session_id, kind, name, path, plate)
+
+    batch = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if filename.startswith("crop_") or os.path.splitext(filename)[1].lower() not in IMAGE_EXTS:
+                continue
+            path = os.path.join(dirpath, filename)
+            batch.append((os.path.relpath(path, root).replace(os.sep, "/"), path))
+            if len(batch) >= IN_CHUNK:
+                yield from flush(batch)
+                batch = []
+    if batch:
+        yield from flush(batch)
+
+
+def iter_items(selection: dict):
+    if selection.get("images"):
+        return iter_dir_items(selection["images"])
+    parse = lambda v: datetime.fromisoformat(v) if v else None
+    return iter_session_items(
+        parse(selection.get("start")), parse(selection.get("end")),
+        selection.get("min_id"), selection.get("max_id"), selection.get("kinds") or ("checkin", "checkout"),
+    )
+
+
+# --- Tiến trình xử lý ---
+_worker_error = None
+_ready_barrier = None
+
+
+def _init_worker(threads: int, barrier):
+    """Chạy 1 lần trong mỗi tiến trình: giới hạn số thread, nạp + chạy thử model."""
+    global _worker_error, _ready_barrier
+    _ready_barrier = barrier
+    try:
+        # N tiến trình x mọi nhân CPU mỗi tiến trình -> tranh nhau CPU; đặt trước khi import torch
+        for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+            os.environ[var] = str(threads)
+        import cv2
+
+        cv2.setNumThreads(threads)
+        # Mỗi tiến trình xử lý tuần tự: không chờ gom batch, không dùng lại kết quả ảnh gần giống
+        config.BATCH_ENABLED = False
+        config.RESULT_CACHE_ENABLED = False
+        # Không dùng chung kết nối SQLite kế thừa từ tiến trình cha (fork)
+        database.engine.dispose(close=False)
+
+        import model_loader
+
+        if model_loader.loader.load():
+            if "torch" in sys.modules:
+                sys.modules["torch"].set_num_threads(threads)
+        else:
+            _worker_error = model_loader.loader.error
+    except Exception as exc:
+        _worker_error = f"{type(exc).__name__}: {exc}"
+
+
+def _wait_ready():
+    """
+    Giữ tiến trình này tới khi mọi tiến trình trong pool đã nạp xong model. Gửi đúng `workers`
+    yêu cầu này: mỗi yêu cầu chiếm 1 tiến trình, nên pool phải khởi động đủ số tiến trình.
+    """
+    try:
+        _ready_barrier.wait(READY_TIMEOUT_S)
+    except threading.BrokenBarrierError:
+        return _worker_error or "Có tiến trình không nạp xong model"
+    return _worker_error
+
+
+def _read_image(item: Item):
+    if item.path:
+        with open(item.path, "rb") as f:
+            return f.read()
+    import image_pack
+
+    return image_pack.read(item.name)
+
+
+def _process(item: Item) -> dict:
+    import yolo_utils
+    from plate_match import is_valid_plate
+
+    result = {
+        "key": item.key, "session_id": item.session_id, "kind": item.kind, "image": item.name,
+        "stored_plate": item.stored_plate, "new_plate": None, "confidence": 0.0,
+    }
+    t0 = time.perf_counter()
+    try:
+        data = _read_image(item)
+        if data is None:
+            result["error"] = "missing_image"
+        else:
+            crop, plate, conf = yolo_utils.recognize_plate(data)
+            result["new_plate"] = plate if is_valid_plate(plate) else None
+            result["raw_plate"] = plate
+            result["confidence"] = conf
+            result["vehicle"] = crop is not None
+    except Exception as exc:
+        result["error"] = f"{type(exc).__name__}: {exc}"
+    result["ms"] = round((time.perf_counter() - t0) * 1000, 1)
+    return result
+
+
+def run(items, workers: int, threads: int = 1, on_result=None, progress_s: float = 5.0) -> dict:
+    """
+    Xử lý `items` trên `workers` tiến trình. `on_result(dict)` được gọi (ở tiến trình chính) cho
+    từng kết quả. Trả về thống kê: số ảnh, thời gian nạp model, số ảnh/giây sau khi nạp xong
+    (chỉ bắt đầu tính giờ khi MỌI tiến trình đã sẵn sàng, nên đo được đúng khả năng mở rộng).
+    """
+    ctx = multiprocessing.get_context()
+    barrier = ctx.Barrier(workers)
+    stats = {"workers": workers, "images": 0, "errors": 0, "startup_s": None, "elapsed_s": 0.0, "images_per_s": 0.0}
+    items = iter(items)
+    window = workers * 4
+    launched = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker,
+                             initargs=(threads, barrier)) as executor:
+        for fut in [executor.submit(_wait_ready) for _ in range(workers)]:
+            error = fut.result()
+            if error:
+                raise RuntimeError(f"Không nạp được model: {error}")
+        started = last_report = time.perf_counter()
+        stats["startup_s"] = round(started - launched, 2)
+
+        pending = set()
+        while True:
+            while len(pending) < window:
+                item = next(items, None)
+                if item is None:
+                    break
+                pending.add(executor.submit(_process, item))
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                result = fut.result()
+                stats["images"] += 1
+                stats["errors"] += "error" in result
+                if on_result is not None:
+                    on_result(result)
+            now = time.perf_counter()
+            if progress_s and now - last_report >= progress_s:
+                last_report = now
+                print(f"  ... {stats['images']} ảnh, {stats['images'] / (now - started):.1f} ảnh/s", file=sys.stderr)
+
+    elapsed = time.perf_counter() - started
+    stats["elapsed_s"] = round(elapsed, 2)
+    stats["images_per_s"] = round(stats["images"] / elapsed, 2) if elapsed else 0.0
+    return stats
+
+
+# --- Kết quả, điểm lưu tiến độ, diff ---
+def load_results(path: str) -> dict:
+    """key -> kết quả mới nhất trong results.ndjson (bỏ dòng ghi dở cuối file nếu bị ngắt)."""
+    results = {}
+    if not os.path.exists(path):
+        return results
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            results[entry["key"]] = entry
+    return results
+
+
+def change_kind(entry: dict):
+    """Loại thay đổi giữa biển đang lưu và biển đọc lại (None nếu giống nhau / ảnh lỗi)."""
+    if "error" in entry:
+        return None
+    stored, new = entry.get("stored_plate"), entry.get("new_plate")
+    if stored == new:
+        return None
+    if stored is None:
+        return "new_read"
+    if new is None:
+        return "unreadable"
+    return "changed"
+
+
+def write_diff(results: dict, path: str) -> dict:
+    """Ghi các ảnh có biển đọc lại khác biển đang lưu. Trả về số ảnh theo loại thay đổi."""
+    counts = {"same": 0, "changed": 0, "new_read": 0, "unreadable": 0, "error": 0}
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f)
+        writer.writerow(DIFF_COLUMNS)
+        for entry in sorted(results.values(), key=lambda e: (e.get("session_id") or 0, e["key"])):
+            if "error" in entry:
+                counts["error"] += 1
+                continue
+            change = change_kind(entry)
+            if change is None:
+                counts["same"] += 1
+                continue
+            counts[change] += 1
+            writer.writerow([entry["key"], entry.get("session_id"), entry.get("kind"), entry.get("image"),
+                             entry.get("stored_plate"), entry.get("new_plate"), entry.get("confidence"), change])
+    return counts
+
+
+def apply_corrections(results: dict, min_confidence: float, batch_size: int) -> dict:
+    """
+    Ghi biển đọc lại từ ảnh vào vào parking_sessions, mỗi lô `batch_size` session 1 giao dịch.
+    Bỏ qua: độ tin cậy thấp, ảnh ra đọc được biển khác (mâu thuẫn), session còn đang mở,
+    biển trong DB đã bị đổi kể từ lúc đọc.
+    """
+    counts = {"applied": 0, "low_confidence": 0, "conflict": 0, "open_or_stale": 0}
+    by_session = {}
+    for entry in results.values():
+        if entry.get("session_id") is not None and entry.get("kind") and "error" not in entry:
+            by_session.setdefault(entry["session_id"], {})[entry["kind"]] = entry
+
+    updates = []
+    for session_id, entries in sorted(by_session.items()):
+        checkin = entries.get("checkin")
+        if checkin is None or change_kind(checkin) not in ("changed", "new_read"):
+            continue
+        if checkin["confidence"] < min_confidence:
+            counts["low_confidence"] += 1
+            continue
+        checkout = entries.get("checkout")
+        if checkout is not None and checkout.get("new_plate") not in (None, checkin["new_plate"]):
+            counts["conflict"] += 1
+            continue
+        updates.append({"sid": session_id, "old": checkin["stored_plate"], "new": checkin["new_plate"]})
+
+    stmt = (
+        update(S)
+        .where(S.c.id == bindparam("sid"), S.c.plate_number.is_not_distinct_from(bindparam("old")),
+               S.c.status == "CHECKOUT")
+        .values(plate_number=bindparam("new"))
+    )
+    for i in range(0, len(updates), batch_size):
+        batch = updates[i:i + batch_size]
+        with database.engine.begin() as conn:
+            changed = conn.execute(stmt, batch).rowcount
+        counts["applied"] += changed
+        counts["open_or_stale"] += len(batch) - changed
+    return counts
+
+
+# --- CLI ---
+def _selection(args) -> dict:
+    return {name: getattr(args, name) for name in SELECTION_ARGS}
+
+
+def cmd_run(args):
+    os.makedirs(args.out, exist_ok=True)
+    meta_path = os.path.join(args.out, META_FILE)
+    results_path = os.path.join(args.out, RESULTS_FILE)
+
+    selection = _selection(args)
+    if args.resume and os.path.exists(meta_path):
+        with open(meta_path, encoding="utf-8") as f:
+            selection = json.load(f)["selection"]
+    elif os.path.exists(results_path) and not args.resume:
+        sys.exit(f"{args.out} đã có kết quả. Dùng --resume để làm tiếp hoặc chọn thư mục --out khác.")
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump({"selection": selection, "updated_at": datetime.now().isoformat()}, f, ensure_ascii=False, indent=2)
+
+    results = load_results(results_path)
+    done = {key for key, entry in results.items() if "error" not in entry}
+    if done:
+        print(f"Làm tiếp: bỏ qua {len(done)} ảnh đã xử lý")
+    items = (item for item in iter_items(selection) if item.key not in done)
+
+    with open(results_path, "a", encoding="utf-8") as out:
+        def on_result(entry):
+            results[entry["key"]] = entry
+            out.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            out.flush()
+
+        stats = run(items, args.workers, args.threads, on_result)
+
+    counts = write_diff(results, os.path.join(args.out, DIFF_FILE))
+    print(f"Đã xử lý {stats['images']} ảnh ({stats['errors']} lỗi) trên {args.workers} tiến trình: "
+          f"nạp model {stats['startup_s']}s, {stats['images_per_s']} ảnh/s")
+    print(f"Tổng {len(results)} ảnh: " + ", ".join(f"{k}={v}" for k, v in counts.items()))
+    print(f"Khác biển đang lưu: {os.path.join(args.out, DIFF_FILE)}")
+
+    if args.apply:
+        applied = apply_corrections(results, args.min_confidence, args.batch_size)
+        print("Ghi vào DB: " + ", ".join(f"{k}={v}" for k, v in applied.items()))
+
+
+def cmd_scaling(args):
+    counts = [int(n) for n in args.scaling.split(",") if n.strip()]
+    sample = []
+    for item in iter_items(_selection(args)):
+        sample.append(item)
+        if len(sample) >= args.sample:
+            break
+    if not sample:
+        sys.exit("Không có ảnh nào để đo")
+    print(f"Mẫu {len(sample)} ảnh, {args.threads} thread/tiến trình")
+    print(f"{'tiến trình':>10} {'nạp model (s)':>14} {'ảnh/s':>8} {'tăng tốc':>9} {'hiệu suất':>10}")
+    base = None
+    for n in counts:
+        stats = run(sample, n, args.threads, progress_s=0)
+        rate = stats["images_per_s"]
+        base = base or rate
+        speedup = rate / base if base else 0.0
+        print(f"{n:>10} {stats['startup_s']:>14} {rate:>8} {speedup:>8.2f}x {speedup / n * counts[0]:>9.0%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chạy lại nhận diện biển số trên ảnh đã lưu")
+    parser.add_argument("--out", help="Thư mục kết quả (results.ndjson, diff.csv, meta.json)")
+    parser.add_argument("--resume", action="store_true", help="Làm tiếp lần chạy trước trong --out")
+    parser.add_argument("--images", help="Xử lý mọi ảnh trong thư mục này thay vì ảnh của các session")
+    parser.add_argument("--start", help="Chỉ session có giờ vào từ thời điểm này (ISO)")
+    parser.add_argument("--end", help="Chỉ session có giờ vào đến thời điểm này (ISO)")
+    parser.add_argument("--min-id", type=int, help="Chỉ session có id >= giá trị này")
+    parser.add_argument("--max-id", type=int, help="Chỉ session có id <= giá trị này")
+    parser.add_argument("--kinds", nargs="+", choices=("checkin", "checkout"), help="Loại ảnh (mặc định: cả 2)")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2), help="Số tiến trình")
+    parser.add_argument("--threads", type=int, default=1, help="Số thread CPU mỗi tiến trình")
+    parser.add_argument("--apply", action="store_true", help="Ghi biển đọc lại vào DB (chỉ session đã check-out)")
+    parser.add_argument("--min-confidence", type=float, default=config.OCR_CONFIDENCE_THRESHOLD,
+                        help="Độ tin cậy tối thiểu để ghi biển đọc lại vào DB")
+    parser.add_argument("--batch-size", type=int, default=500, help="Số session mỗi giao dịch khi --apply")
+    parser.add_argument("--scaling", help="Đo ảnh/giây theo số tiến trình, VD: 1,2,4 (không ghi kết quả)")
+    parser.add_argument("--sample", type=int, default=64, help="Số ảnh dùng để đo --scaling")
+    args = parser.parse_args()
+
+    import migrations
+
+    migrations.upgrade(database.engine, verbose=False)
+    if args.scaling:
+        cmd_scaling(args)
+    elif args.out:
+        cmd_run(args)
+    else:
+        parser.error("Cần --out (chạy lại + lưu kết quả) hoặc --scaling (đo tốc độ)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+
+def dhash(img, size: int = 16) -> int:
+    """
+    Perceptual hash (dHash) size*size bit (mặc định 256 bit) của ảnh: so sánh độ sáng
+    các điểm ảnh kề nhau trên ảnh xám thu nhỏ (size+1)x size. Ảnh gần giống nhau -> hash
+    chỉ khác vài bit. Hash 256 bit đủ phân biệt 2 xe khác nhau đứng cùng vị trí cổng,
+    điều mà hash 64 bit hay nhầm.
+    """
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+    small = cv2.resize(gray, (size + 1, size), interpolation=cv2.INTER_AREA)
+    diff = small[:, 1:] > small[:, :-1]
+    return int.from_bytes(np.packbits(diff).tobytes(), "big")
+
+
+class PerceptualCache:
+    """
+    Cache LRU + TTL ngắn, tra cứu theo perceptual hash: ảnh có hash lệch
+    <= `max_distance` bit so với 1 ảnh đã xử lý được coi là cùng 1 ảnh (chụp lại,
+    bấm 2 lần...) và dùng lại kết quả cũ.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl_s: float = 10.0, max_distance: int = 12):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = float(ttl_s)
+        self.max_distance = int(max_distance)
+        self._entries = OrderedDict()  # hash -> (thời điểm lưu, giá trị)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _expire(self, now: float):
+        # Các phần tử cũ nhất nằm ở đầu OrderedDict (thứ tự theo lần dùng gần nhất)
+        expired = [k for k, (ts, _) in self._entries.items() if now - ts > self.ttl]
+        for k in expired:
+            del self._entries[k]
+
+    def get(self, key: int):
+        """Tìm kết quả của ảnh gần giống nhất (khoảng cách Hamming nhỏ nhất). Không có -> None."""
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            best_key, best_dist = None, self.max_distance + 1
+            for k in self._entries:
+                dist = (k ^ key).bit_count()
+                if dist < best_dist:
+                    best_key, best_dist = k, dist
+                    if dist == 0:
+                        break
+            if best_key is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best_key)
+            self.hits += 1
+            return self._entries[best_key][1]
+
+    def put(self, key: int, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_s": self.ttl,
+                "max_distance": self.max_distance,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
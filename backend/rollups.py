@@ -0,0 +1,226 @@
+"""
+Số liệu tổng hợp theo giờ / theo ngày cho dashboard: số lượt vào, lượt ra, doanh thu,
+số xe trong bãi cao nhất, thời gian gửi trung bình.
+
+- Cập nhật dần: mỗi lần check-in/check-out (crud.py) cộng vào dòng của giờ + ngày tương ứng
+  bằng 1 lệnh UPSERT trong CÙNG giao dịch ghi session, nên số liệu luôn khớp với dữ liệu gốc
+  (commit lỗi thì cả 2 cùng không được ghi).
+- Lượt vào tính theo giờ vào; lượt ra, doanh thu, thời gian gửi tính theo giờ ra.
+- Xóa dữ liệu cũ (purge.py) không trừ số liệu đã tổng hợp: thống kê vẫn còn sau khi xóa session.
+- `query()` (GET /stats) chỉ đọc bảng stats_rollups; giờ/ngày không có lượt xe nào được điền
+  bằng số xe còn trong bãi cuối khoảng trước.
+
+Dựng lại số liệu từ parking_sessions (dữ liệu có từ trước khi có bảng này, hoặc sau khi sửa DB
+bằng tay). Nên tắt server khi chạy để không lẫn với check-in/check-out đang ghi:
+    python rollups.py --backfill                     # toàn bộ dữ liệu
+    python rollups.py --backfill --since 2024-01-01  # chỉ dựng lại từ ngày này
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, or_, select
+from sqlalchemy.dialects.sqlite import insert
+
+import database
+
+PERIODS = ("hour", "day")
+STEPS = {"hour": timedelta(hours=1), "day": timedelta(days=1)}
+# Số khoảng tối đa trong 1 lần truy vấn GET /stats
+MAX_BUCKETS = 2000
+
+R = database.StatsRollup.__table__
+S = database.ParkingSession.__table__
+
+
+def bucket_start(ts: datetime, period: str) -> datetime:
+    """Đầu giờ / đầu ngày chứa thời điểm `ts`."""
+    if period == "hour":
+        return ts.replace(minute=0, second=0, microsecond=0)
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _upsert(db, at: datetime, occupancy_peak: int, occupancy_end: int,
+            checkins: int = 0, checkouts: int = 0, revenue: float = 0.0, dwell_seconds: float = 0.0):
+    for period in PERIODS:
+        stmt = insert(R).values(
+            period=period, bucket_start=bucket_start(at, period),
+            checkins=checkins, checkouts=checkouts, revenue=revenue, dwell_seconds=dwell_seconds,
+            peak_occupancy=occupancy_peak, occupancy_end=occupancy_end,
+        )
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=[R.c.period, R.c.bucket_start],
+            set_={
+                "checkins": R.c.checkins + stmt.excluded.checkins,
+                "checkouts": R.c.checkouts + stmt.excluded.checkouts,
+                "revenue": R.c.revenue + stmt.excluded.revenue,
+                "dwell_seconds": R.c.dwell_seconds + stmt.excluded.dwell_seconds,
+                # max(a, b) 2 tham số của SQLite: giá trị lớn hơn
+                "peak_occupancy": func.max(R.c.peak_occupancy, stmt.excluded.peak_occupancy),
+                "occupancy_end": stmt.excluded.occupancy_end,
+            },
+        ))
+
+
+def record_checkin(db, session, occupancy: int):
+    """Cộng 1 lượt vào. `occupancy`: số xe trong bãi sau khi xe này vào. Chưa commit."""
+    _upsert(db, session.checkin_time, occupancy, occupancy, checkins=1)
+
+
+def record_checkout(db, session, occupancy: int):
+    """Cộng 1 lượt ra (phí, thời gian gửi). `occupancy`: số xe trong bãi trước khi xe này ra. Chưa commit."""
+    dwell = (session.checkout_time - session.checkin_time).total_seconds()
+    _upsert(db, session.checkout_time, occupancy, max(0, occupancy - 1),
+            checkouts=1, revenue=session.fee or 0.0, dwell_seconds=dwell)
+
+
+def _bucket_dict(start: datetime, checkins=0, checkouts=0, revenue=0.0, dwell_seconds=0.0, peak=0, end=0):
+    return {
+        "start": start.isoformat(),
+        "checkins": checkins,
+        "checkouts": checkouts,
+        "revenue": revenue,
+        "peak_occupancy": peak,
+        "avg_dwell_minutes": round(dwell_seconds / checkouts / 60, 1) if checkouts else None,
+        "occupancy_end": end,
+    }
+
+
+def query(db, period: str, start: datetime, end: datetime, now: datetime = None):
+    """
+    Số liệu từng giờ/ngày trong [start, end) + tổng cả khoảng, chỉ đọc bảng stats_rollups.
+    Khoảng sau thời điểm hiện tại không được liệt kê.
+    """
+    if period not in PERIODS:
+        raise ValueError(f"period phải là 1 trong: {', '.join(PERIODS)}")
+    step = STEPS[period]
+    start = bucket_start(start, period)
+    now = now or datetime.now()
+    end = min(end, bucket_start(now, period) + step)
+    if (end - start) / step > MAX_BUCKETS:
+        raise ValueError(f"Khoảng thời gian quá dài (tối đa {MAX_BUCKETS} {period})")
+
+    rows = {
+        r.bucket_start: r for r in db.execute(
+            select(R).where(R.c.period == period, R.c.bucket_start >= start, R.c.bucket_start < end)
+        )
+    }
+    # Số xe trong bãi lúc bắt đầu khoảng = số xe cuối khoảng gần nhất trước đó có dữ liệu
+    level = db.execute(
+        select(R.c.occupancy_end).where(R.c.period == period, R.c.bucket_start < start)
+        .order_by(R.c.bucket_start.desc()).limit(1)
+    ).scalar() or 0
+
+    buckets = []
+    totals = {"checkins": 0, "checkouts": 0, "revenue": 0.0, "dwell_seconds": 0.0, "peak": 0}
+    t = start
+    while t < end:
+        row = rows.get(t)
+        if row is None:
+            # Không có xe vào/ra: số xe giữ nguyên như cuối khoảng trước
+            item = _bucket_dict(t, peak=level, end=level)
+        else:
+            peak = max(row.peak_occupancy, level)
+            level = row.occupancy_end
+            item = _bucket_dict(t, row.checkins, row.checkouts, row.revenue, row.dwell_seconds, peak, level)
+            totals["checkins"] += row.checkins
+            totals["checkouts"] += row.checkouts
+            totals["revenue"] += row.revenue
+            totals["dwell_seconds"] += row.dwell_seconds
+        totals["peak"] = max(totals["peak"], item["peak_occupancy"])
+        buckets.append(item)
+        t += step
+
+    total = _bucket_dict(start, totals["checkins"], totals["checkouts"], totals["revenue"],
+                         totals["dwell_seconds"], totals["peak"], level)
+    del total["start"]
+    return {"period": period, "start": start.isoformat(), "end": end.isoformat(), "buckets": buckets, "totals": total}
+
+
+def backfill(engine, since: datetime = None) -> int:
+    """
+    Dựng lại stats_rollups từ parking_sessions, từ đầu ngày `since` (mặc định: session cũ nhất)
+    trở đi. Số liệu trước đó (VD: của session đã bị xóa) được giữ nguyên. Trả về số dòng đã ghi.
+    """
+    with engine.begin() as conn:
+        if since is None:
+            since = conn.execute(select(func.min(S.c.checkin_time))).scalar()
+            if since is None:
+                return 0
+        since = bucket_start(since, "day")
+
+        # Số xe đã trong bãi lúc `since`
+        level = conn.execute(
+            select(func.count()).select_from(S).where(
+                S.c.checkin_time < since,
+                or_(S.c.checkout_time.is_(None), S.c.checkout_time >= since),
+            )
+        ).scalar()
+
+        # Sự kiện vào/ra sau `since`, xếp theo thời gian (cùng thời điểm: xe ra trước)
+        events = []
+        result = conn.execute(
+            select(S.c.checkin_time, S.c.checkout_time, S.c.fee).where(
+                or_(S.c.checkin_time >= since, S.c.checkout_time >= since)
+            ).execution_options(yield_per=5000)
+        )
+        for checkin_time, checkout_time, fee in result:
+            if checkin_time is not None and checkin_time >= since:
+                events.append((checkin_time, 1, 0.0, 0.0))
+            if checkout_time is not None and checkout_time >= since:
+                dwell = (checkout_time - checkin_time).total_seconds() if checkin_time else 0.0
+                events.append((checkout_time, 0, fee or 0.0, dwell))
+        events.sort(key=lambda e: (e[0], e[1]))
+
+        # (period, đầu khoảng) -> [vào, ra, doanh thu, thời gian gửi, cao nhất, cuối khoảng]
+        acc = {}
+        for at, is_checkin, fee, dwell in events:
+            if is_checkin:
+                level += 1
+                peak = level
+            else:
+                peak = level
+                level = max(0, level - 1)
+            for period in PERIODS:
+                row = acc.get((period, bucket_start(at, period)))
+                if row is None:
+                    row = acc[(period, bucket_start(at, period))] = [0, 0, 0.0, 0.0, 0, 0]
+                if is_checkin:
+                    row[0] += 1
+                else:
+                    row[1] += 1
+                    row[2] += fee
+                    row[3] += dwell
+                row[4] = max(row[4], peak)
+                row[5] = level
+
+        conn.execute(delete(R).where(R.c.bucket_start >= since))
+        if acc:
+            conn.execute(insert(R), [
+                {"period": period, "bucket_start": start, "checkins": v[0], "checkouts": v[1], "revenue": v[2],
+                 "dwell_seconds": v[3], "peak_occupancy": v[4], "occupancy_end": v[5]}
+                for (period, start), v in acc.items()
+            ])
+        return len(acc)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Số liệu tổng hợp theo giờ/ngày (stats_rollups)")
+    parser.add_argument("--backfill", action="store_true", help="Dựng lại số liệu từ parking_sessions")
+    parser.add_argument("--since", help="Chỉ dựng lại từ ngày này (YYYY-MM-DD), mặc định: toàn bộ")
+    args = parser.parse_args()
+    if not args.backfill:
+        parser.print_help()
+        return
+
+    import migrations
+
+    migrations.upgrade(database.engine)
+    since = datetime.fromisoformat(args.since) if args.since else None
+    t0 = time.perf_counter()
+    rows = backfill(database.engine, since)
+    print(f"Đã dựng lại {rows} dòng thống kê trong {time.perf_counter() - t0:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
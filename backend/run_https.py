@@ -1,11 +1,53 @@
+import argparse
+import os
+import subprocess
+import sys
+
 import uvicorn
 
+import config
+import database
+import migrations
+
 if __name__ == "__main__":
-    uvicorn.run(
-        "main:app",                     # main:app là file main.py chứa FastAPI app
-        host="0.0.0.0",
-        port=8000,
-        ssl_keyfile="../frontend/server.key",
-        ssl_certfile="../frontend/server.crt",
-        reload=True
-    )
+    parser = argparse.ArgumentParser(description="Chạy backend HTTPS")
+    # Nhiều worker: HTTP, DB, ghi file chạy song song trên nhiều nhân CPU. Check-in/check-out vẫn
+    # đúng khi nhiều worker cùng ghi: mỗi lô ghi giữ khóa ghi SQLite + đối chiếu chỉ mục xe trong bãi
+    # với DB, DB có chỉ mục UNIQUE cho session đang mở (session_writer.py)
+    parser.add_argument("--workers", type=int, default=1, help="Số tiến trình worker uvicorn")
+    # Tự chạy kèm tiến trình suy luận dùng chung (inference_server.py): mọi worker dùng 1 bản model
+    parser.add_argument("--inference", action="store_true", help="Chạy kèm tiến trình suy luận dùng chung")
+    parser.add_argument("--inference-workers", type=int, default=config.INFERENCE_WORKERS,
+                        help="Số thread suy luận của tiến trình suy luận")
+    args = parser.parse_args()
+
+    inference = None
+    if args.inference:
+        address = config.INFERENCE_ADDRESS or "127.0.0.1:8765"
+        # Worker uvicorn đọc địa chỉ từ biến môi trường (config.py)
+        os.environ["SPAS_INFERENCE_ADDRESS"] = address
+        inference = subprocess.Popen([
+            sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "inference_server.py"),
+            "--address", address, "--workers", str(args.inference_workers),
+        ])
+    elif args.workers > 1 and not config.INFERENCE_ADDRESS:
+        print(f"⚠️ {args.workers} worker, mỗi worker tự nạp 1 bản model YOLO + OCR. "
+              f"Dùng --inference (hoặc SPAS_INFERENCE_ADDRESS) để các worker dùng chung 1 bản.")
+
+    # Nâng cấp schema 1 lần trước khi chạy các worker (không để N worker cùng chạy migration)
+    migrations.upgrade(database.engine)
+
+    try:
+        uvicorn.run(
+            "main:app",                     # main:app là file main.py chứa FastAPI app
+            host="0.0.0.0",
+            port=8000,
+            ssl_keyfile="../frontend/server.key",
+            ssl_certfile="../frontend/server.crt",
+            # Tự reload khi sửa code chỉ dùng được với 1 worker
+            reload=args.workers == 1,
+            workers=args.workers,
+        )
+    finally:
+        if inference is not None:
+            inference.terminate()
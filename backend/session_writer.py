@@ -0,0 +1,268 @@
+"""
+Thread ghi duy nhất của tiến trình cho mọi check-in/check-out (parking_sessions + stats_rollups +
+chỉ mục xe trong bãi).
+
+- Các làn (/upload, /ws/gate) không tự ghi DB mà đưa sự kiện vào hàng đợi (`submit_event`);
+  1 thread nền lấy các sự kiện đang chờ (tối đa SPAS_SESSION_COMMIT_MAX_BATCH) và xử lý
+  lần lượt ĐÚNG thứ tự vào hàng đợi: 2 làn cùng đọc 1 biển thì sự kiện đến trước thắng,
+  sự kiện sau thấy kết quả của sự kiện trước (kể cả khi cả 2 nằm trong cùng 1 lô chưa commit).
+- Cả lô được ghi trong 1 giao dịch (group commit): 1 lần fsync cho nhiều sự kiện thay vì
+  mỗi sự kiện 1 giao dịch; cả tiến trình chỉ có 1 kết nối ghi session nên các làn không còn tranh
+  nhau khóa ghi ("database is locked").
+- Nhiều tiến trình API (run_https.py --workers N) cùng ghi 1 file DB: mỗi lô mở giao dịch bằng
+  BEGIN IMMEDIATE (database.write_engine) nên lô của các tiến trình lần lượt nắm khóa ghi SQLite,
+  và đầu mỗi lô chỉ mục trong RAM được đối chiếu lại với DB (`OccupancyIndex.sync`). Kiểm tra xe
+  trong bãi + ghi của cả lô luôn dựa trên dữ liệu mới nhất của mọi tiến trình. Chỉ mục UNIQUE
+  ix_sessions_open_plate của DB là chốt chặn cuối: check-in vi phạm bị từ chối như xe đang trong bãi.
+- Mỗi người gọi vẫn nhận kết quả riêng (session, thông báo). Commit lô lỗi -> rollback rồi
+  ghi lại từng sự kiện trong giao dịch riêng, nên lỗi của 1 sự kiện không làm hỏng sự kiện khác.
+- Chỉ mục trong RAM (occupancy) chỉ được cập nhật sau khi lô đã commit.
+
+Đo thông lượng / kiểm tra không có 2 session mở cùng biển khi nhiều làn ghi đồng thời:
+    python benchmarks/bench_session_writer.py
+"""
+import logging
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+
+import config
+import database
+import occupancy
+import rollups
+import telemetry
+from inference_scheduler import BatchScheduler
+from tariff import tariff
+
+log = logging.getLogger("spas.writer")
+
+# 1 lượt xe chờ ghi. status: 1 = Check-in, 0 = Check-out
+SessionEvent = namedtuple("SessionEvent", ["filename", "status", "plate_number"])
+# Kết quả trả cho người gọi: timings = bước -> giây (db_lookup, db_commit) để ghi vào trace của request
+EventResult = namedtuple("EventResult", ["session", "message", "timings"])
+
+# Session riêng của thread ghi (BEGIN IMMEDIATE); giữ giá trị sau commit để trả session cho người
+# gọi không cần refresh
+_WriterSession = sessionmaker(bind=database.write_engine, autoflush=False, expire_on_commit=False)
+
+# Xe đã ra trong lô đang xử lý (chưa commit, chỉ mục chưa cập nhật)
+_GONE = object()
+
+
+def _find_open(db, index, staged, plate_number):
+    """Session đang mở của biển số, có tính các thay đổi chưa commit của lô (`staged`)."""
+    if plate_number in staged:
+        session = staged[plate_number]
+        return None if session is _GONE else session
+    # Giữ khóa chỉ mục chỉ trong lúc tra cứu + bỏ mục lệch
+    with index.lock():
+        entry = index.get(plate_number)
+        if entry is None:
+            return None
+        session = db.get(database.ParkingSession, entry.session_id)
+        if session is None or session.status != "PARKING":
+            # Chỉ mục lệch với DB (bị xóa/sửa ngoài luồng) -> bỏ khỏi chỉ mục
+            index.remove(plate_number, entry.session_id)
+            return None
+        return session
+
+
+def _apply(db, index, staged, pending, event, timings):
+    """
+    Xử lý 1 sự kiện trong giao dịch của lô (chưa commit). Trả về (session | None, thông báo, các thao
+    tác cập nhật chỉ mục chạy sau commit, thay đổi số xe trong bãi).
+    """
+    plate_number = event.plate_number
+    if event.status == 1:
+        # Xe vào: Kiểm tra xem xe đã có trong bãi chưa (tránh Check-in 2 lần)
+        if plate_number and _find_open(db, index, staged, plate_number) is not None:
+            return None, f"Xe {plate_number} đang trong bãi! Không thể Check-in lại.", [], 0
+
+        session = database.ParkingSession(
+            plate_number=plate_number,
+            checkin_img=event.filename,
+            checkin_time=datetime.now(),
+            status="PARKING"
+        )
+        db.add(session)
+        delta = 1 if plate_number else 0
+        # Số liệu thống kê theo giờ/ngày được ghi cùng giao dịch với session
+        rollups.record_checkin(db, session, index.count() + pending + delta)
+        if not plate_number:
+            return session, "Check-in thành công", [], 0
+        staged[plate_number] = session
+        # session.id có sau khi flush lúc commit -> đọc trong lambda
+        return session, "Check-in thành công", [lambda: index.add(plate_number, session.id, session.checkin_time)], 1
+
+    # Xe ra: Tìm session đang mở (PARKING) có cùng biển số
+    session = None
+    read_plate = plate_number
+    t0 = time.perf_counter()
+    if plate_number:
+        session = _find_open(db, index, staged, plate_number)
+        if session is None and plate_number not in staged and config.FUZZY_CHECKOUT_ENABLED:
+            # OCR đọc nhầm ký tự dễ lẫn (O/0, B/8...) -> tìm xe trong bãi có biển gần nhất
+            match = index.closest(plate_number, config.FUZZY_CHECKOUT_MAX_DISTANCE, config.FUZZY_CHECKOUT_MIN_MARGIN)
+            if match is not None:
+                session = _find_open(db, index, staged, match.plate_number)
+                if session is not None:
+                    log.info(
+                        "🔎 CHECK-OUT GẦN ĐÚNG: đọc '%s' -> xe '%s'", plate_number, match.plate_number,
+                        extra={"fields": {"distance": match.distance, "session_id": session.id}},
+                    )
+                    plate_number = match.plate_number
+    timings["db_lookup"] = time.perf_counter() - t0
+
+    if session is None:
+        # Không tìm thấy xe trong bãi -> Từ chối Check-out để tránh lỗi
+        msg = f"Xe {plate_number} chưa Check-in hoặc đã ra rồi!" if plate_number else "Không đọc được biển số để Check-out!"
+        return None, msg, [], 0
+
+    # Tìm thấy xe đang gửi -> Cập nhật thông tin ra
+    session.checkout_img = event.filename
+    session.checkout_time = datetime.now()
+    session.status = "CHECKOUT"
+    # Tính phí theo bảng giá (tariff.py, cấu hình SPAS_TARIFF)
+    session.fee = tariff.fee(session.checkin_time, session.checkout_time)
+    rollups.record_checkout(db, session, index.count() + pending)
+    staged[plate_number] = _GONE
+    if plate_number != read_plate:
+        msg = f"Check-out thành công (đọc được {read_plate}, khớp gần đúng xe {plate_number})"
+    else:
+        msg = "Check-out thành công"
+    return session, msg, [lambda: index.remove(plate_number, session.id)], -1
+
+
+def _reject_duplicate(db, index, plate_number, exc):
+    """
+    Check-in bị chỉ mục UNIQUE của DB từ chối: biển số đã có session PARKING mà chỉ mục trong RAM
+    không biết (bị sửa ngoài luồng) -> đưa session đó vào lại chỉ mục, từ chối như xe đang trong bãi.
+    """
+    log.warning("Check-in %s bị DB từ chối: %s", plate_number, exc.orig)
+    session = db.query(database.ParkingSession).filter(
+        database.ParkingSession.plate_number == plate_number,
+        database.ParkingSession.status == "PARKING",
+    ).first()
+    if session is not None:
+        index.add(plate_number, session.id, session.checkin_time)
+    return EventResult(None, f"Xe {plate_number} đang trong bãi! Không thể Check-in lại.", {})
+
+
+def commit_events(events):
+    """
+    Ghi 1 lô sự kiện theo đúng thứ tự trong 1 giao dịch. Trả về list cùng độ dài: EventResult,
+    hoặc Exception nếu riêng sự kiện đó không ghi được.
+
+    Khóa chỉ mục xe trong bãi chỉ được giữ lúc đối chiếu/tra cứu (sync, _find_open, closest) và
+    lúc áp dụng thay đổi vào chỉ mục, không giữ qua commit (fsync) hay lúc ghi lại từng sự kiện.
+    Thay đổi của tiến trình khác / purge không chen vào giữa lô được vì lô giữ khóa ghi SQLite
+    (BEGIN IMMEDIATE) từ lệnh đầu tiên tới commit.
+    """
+    index = occupancy.index
+    db = _WriterSession()
+    try:
+        # Mở giao dịch (chờ khóa ghi SQLite) trước khi giữ khóa chỉ mục
+        db.connection()
+        index.sync(db)
+        staged = {}  # biển số -> session đang mở / _GONE, của các sự kiện trước trong lô
+        pending = 0  # số xe vào trừ số xe ra của lô, chưa có trong chỉ mục
+        outcomes, index_ops = [], []
+        for event in events:
+            timings = {}
+            session, msg, ops, delta = _apply(db, index, staged, pending, event, timings)
+            pending += delta
+            index_ops += ops
+            outcomes.append((session, msg, timings))
+
+        t0 = time.perf_counter()
+        db.commit()
+        commit_s = time.perf_counter() - t0
+    except Exception as exc:
+        db.rollback()
+        if len(events) == 1:
+            if isinstance(exc, IntegrityError) and events[0].status == 1:
+                return [_reject_duplicate(db, index, events[0].plate_number, exc)]
+            return [exc]
+        # Ghi lại từng sự kiện trong giao dịch riêng để chỉ sự kiện lỗi nhận lỗi
+        log.warning("Commit lô %d sự kiện lỗi (%s), ghi lại từng sự kiện", len(events), exc)
+        return [commit_events([event])[0] for event in events]
+    finally:
+        db.close()
+
+    # Chỉ cập nhật chỉ mục sau khi giao dịch đã commit
+    with index.lock():
+        for op in index_ops:
+            op()
+
+    commit_batch_size.observe(len(events))
+    results = []
+    for session, msg, timings in outcomes:
+        if session is not None:
+            timings["db_commit"] = commit_s
+        results.append(EventResult(session, msg, timings))
+    return results
+
+
+# Thread ghi dùng chung của tiến trình (gom sự kiện bằng bộ gom batch như YOLO)
+writer = BatchScheduler(
+    commit_events,
+    max_batch_size=config.SESSION_COMMIT_MAX_BATCH,
+    max_wait_ms=config.SESSION_COMMIT_MAX_WAIT_MS,
+    name="session-writer",
+)
+
+commit_batch_size = telemetry.Histogram(
+    "spas_session_commit_batch_size", "Số lượt vào/ra được ghi trong 1 giao dịch", buckets=(1, 2, 4, 8, 16, 32, 64)
+)
+telemetry.gauge(
+    "spas_session_writer_queue_depth", "Số lượt vào/ra đang chờ thread ghi",
+    lambda: writer.stats()["queue_depth"],
+)
+
+
+_started = False
+_start_lock = threading.Lock()
+
+
+def start():
+    """
+    Dựng chỉ mục xe trong bãi từ DB (chỉ lần gọi đầu). Gọi khi khởi động API hoặc trước khi công cụ
+    dòng lệnh ghi (stream_gate.py --commit); `submit_event` tự gọi nếu chưa.
+    """
+    global _started
+    with _start_lock:
+        if _started:
+            return
+        with database.SessionLocal() as db:
+            occupancy.index.rebuild(db)
+        _started = True
+
+
+def submit_event(filename: str, status: int, plate_number: str = None):
+    """Đưa 1 lượt vào/ra cho thread ghi và chờ kết quả. Trả về (session | None, thông báo)."""
+    if not _started:
+        start()
+    t0 = time.perf_counter()
+    result = writer.run(SessionEvent(filename, int(status), plate_number))
+    if isinstance(result, Exception):
+        raise result
+    elapsed = time.perf_counter() - t0
+    for name, seconds in result.timings.items():
+        telemetry.record(name, seconds)
+    # Thời gian chờ trong hàng đợi + chờ các sự kiện khác của lô
+    telemetry.record("db_queue", max(0.0, elapsed - sum(result.timings.values())))
+    return result.session, result.message
+
+
+def stats() -> dict:
+    """Thống kê thread ghi: kích thước lô, độ trễ commit, thời gian chờ trong hàng đợi."""
+    return writer.stats()
+
+
+def shutdown():
+    """Ghi nốt các sự kiện còn trong hàng đợi rồi dừng thread ghi."""
+    writer.close()
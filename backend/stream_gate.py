@@ -0,0 +1,403 @@
+"""
+Chế độ cổng tự động: trình duyệt gửi liên tục ảnh camera (vài khung/giây) qua WebSocket,
+không cần bảo vệ bấm nút cho từng xe.
+
+- Mỗi khung được thu nhỏ thành ảnh xám ~160px (giải mã JPEG rút gọn 1/8, rất rẻ) và so với
+  ảnh nền (làn trống) + khung trước: chỉ khi có xe trong làn VÀ xe đã đứng yên vài khung
+  mới chạy YOLO/OCR.
+- Kết quả đọc biển của nhiều khung được bỏ phiếu; biển đạt đủ số phiếu mới được ghi
+  check-in/check-out (qua `crud.create_session_entry`, như /upload). Mỗi lượt xe chỉ ghi 1 lần,
+  xe rời làn mới nhận xe tiếp theo.
+- Giới hạn CPU mỗi làn: sau 1 lần nhận diện tốn t giây, làn phải nghỉ t*(1/budget - 1) giây.
+- Khung tới nhanh hơn `STREAM_MAX_FPS` hoặc tới khi khung trước chưa xử lý xong bị bỏ theo
+  chính sách `STREAM_DROP_POLICY` ("latest": giữ khung mới nhất, "oldest": giữ khung đang chờ).
+
+Thử với video quay sẵn (mặc định không ghi DB):
+    python stream_gate.py --video gate.mp4 --status 1
+    python stream_gate.py --video gate.mp4 --status 0 --fps 4 --commit
+"""
+import argparse
+import asyncio
+import logging
+import threading
+import time
+from collections import Counter, deque
+
+import cv2
+import numpy as np
+
+import config
+from inference_client import InferenceError
+
+log = logging.getLogger("spas.stream")
+
+DROP_POLICIES = ("latest", "oldest")
+
+# Ngưỡng độ sáng (0..255) để coi 1 điểm ảnh là "khác" giữa 2 ảnh xám
+PIXEL_DIFF = 25
+# Chiều rộng ảnh xám dùng để phát hiện chuyển động
+MOTION_WIDTH = 160
+# Model đang nạp / nạp lỗi / mất kết nối tiến trình suy luận: nghỉ bấy nhiêu giây rồi mới nhận diện lại
+INFERENCE_RETRY_S = 1.0
+
+
+def motion_thumbnail(data: bytes, width: int = MOTION_WIDTH):
+    """Ảnh xám nhỏ của khung (giải mã rút gọn 1/8 rồi thu về `width` px). None nếu không giải mã được."""
+    img = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_REDUCED_GRAYSCALE_8)
+    if img is None:
+        return None
+    h, w = img.shape[:2]
+    if w != width:
+        img = cv2.resize(img, (width, max(1, int(h * width / w))), interpolation=cv2.INTER_AREA)
+    return cv2.GaussianBlur(img, (5, 5), 0)
+
+
+def _changed_ratio(a, b) -> float:
+    return float(np.count_nonzero(cv2.absdiff(a, b) > PIXEL_DIFF)) / a.size
+
+
+class MotionGate:
+    """
+    Phát hiện xe có trong làn (khác ảnh nền) và đứng yên (ít khác khung trước).
+    Khung đầu tiên được lấy làm ảnh nền (làn trống); ảnh nền được cập nhật dần khi làn trống.
+    """
+
+    def __init__(self, presence_ratio: float = 0.08, motion_ratio: float = 0.02, stable_frames: int = 2,
+                 background_alpha: float = 0.05):
+        self.presence_ratio = presence_ratio
+        self.motion_ratio = motion_ratio
+        self.stable_frames = max(1, int(stable_frames))
+        self.background_alpha = background_alpha
+        self._background = None
+        self._previous = None
+        self._still = 0
+
+    def update(self, thumb):
+        """Trả về (có xe, xe đứng yên)."""
+        if self._background is None or self._background.shape != thumb.shape:
+            self._background = thumb.astype(np.float32)
+            self._previous = thumb
+            self._still = 0
+            return False, False
+
+        present = _changed_ratio(thumb, cv2.convertScaleAbs(self._background)) >= self.presence_ratio
+        moving = _changed_ratio(thumb, self._previous) >= self.motion_ratio
+        self._previous = thumb
+        self._still = 0 if moving else self._still + 1
+        if not present:
+            # Làn trống: cập nhật nền theo ánh sáng thay đổi dần
+            cv2.accumulateWeighted(thumb, self._background, self.background_alpha)
+        return present, present and self._still >= self.stable_frames
+
+    def absorb(self, thumb):
+        """Lấy khung hiện tại làm nền (VD: vật cản đứng yên lâu trong làn)."""
+        self._background = thumb.astype(np.float32)
+
+
+class PlateVoter:
+    """Bỏ phiếu biển số trên `window` lần đọc gần nhất; biển đạt `min_votes` phiếu thắng."""
+
+    def __init__(self, window: int = 5, min_votes: int = 3):
+        self.min_votes = max(1, int(min_votes))
+        self._reads = deque(maxlen=max(self.min_votes, int(window)))
+
+    def add(self, plate: str):
+        self._reads.append(plate)
+        plate, votes = Counter(self._reads).most_common(1)[0]
+        return (plate, votes) if votes >= self.min_votes else None
+
+    def votes(self, plate: str) -> int:
+        return sum(1 for p in self._reads if p == plate)
+
+    def reset(self):
+        self._reads.clear()
+
+    def __len__(self):
+        return len(self._reads)
+
+
+def _recognize(data: bytes):
+    """YOLO + OCR như /upload. Trả về (ảnh xe, biển số hợp lệ hoặc None, độ tin cậy)."""
+    import inference_client
+    from plate_match import is_valid_plate
+
+    crop, plate, conf = inference_client.recognize_plate(data)
+    return crop, (plate if is_valid_plate(plate) else None), conf
+
+
+def commit_session(data: bytes, status: int, plate: str, crop=None) -> dict:
+    """Ghi check-in/check-out cho biển đã thắng phiếu, lưu ảnh khung + ảnh xe như /upload."""
+    import crud
+    import image_store
+
+    store = image_store.store
+    name = store.name_for(data, "stream.jpg")
+    rec, msg = crud.create_session_entry(name, int(status), plate)
+    if not rec:
+        return {"success": False, "id": None, "plate_number": plate, "fee": 0, "message": msg}
+    store.save(data, "stream.jpg")
+    if crop is not None:
+        store.save_crop(name, crop)
+    return {"success": True, "id": rec.id, "plate_number": rec.plate_number, "fee": rec.fee or 0, "message": msg}
+
+
+class LaneProcessor:
+    """
+    Xử lý chuỗi khung của 1 làn. `feed()` nhận 1 khung (bytes JPEG) và trả về sự kiện
+    (dict có khóa "type") hoặc None. Không an toàn khi gọi song song cho cùng 1 làn.
+    """
+
+    def __init__(self, status: int, lane: str = "default", recognize=None, commit=None,
+                 cpu_budget: float = None, presence_ratio: float = None, motion_ratio: float = None,
+                 stable_frames: int = None, vote_window: int = None, vote_min: int = None,
+                 absorb_after_s: float = None):
+        self.status = int(status)
+        self.lane = lane
+        self.recognize = recognize or _recognize
+        self.commit = commit or commit_session
+        budget = config.STREAM_CPU_BUDGET if cpu_budget is None else cpu_budget
+        self.cpu_budget = min(1.0, max(0.01, float(budget)))
+        self.gate = MotionGate(
+            config.STREAM_PRESENCE_RATIO if presence_ratio is None else presence_ratio,
+            config.STREAM_MOTION_RATIO if motion_ratio is None else motion_ratio,
+            config.STREAM_STABLE_FRAMES if stable_frames is None else stable_frames,
+        )
+        self.voter = PlateVoter(
+            config.STREAM_VOTE_WINDOW if vote_window is None else vote_window,
+            config.STREAM_VOTE_MIN if vote_min is None else vote_min,
+        )
+        self.absorb_after = config.STREAM_ABSORB_AFTER_S if absorb_after_s is None else absorb_after_s
+
+        self._present = False
+        self._done = False          # Lượt xe hiện tại đã được ghi (hoặc bị từ chối)
+        self._present_since = None
+        self._next_inference = 0.0
+        self._best = {}             # biển số -> (độ tin cậy, khung, ảnh xe) tốt nhất
+        self._lock = threading.Lock()
+        self.frames = 0
+        self.dropped = 0
+        self.gated_motion = 0
+        self.gated_budget = 0
+        self.inferences = 0
+        self.inference_s = 0.0
+        self.inference_errors = 0
+        self.commits = 0
+        self.rejections = 0
+
+    def feed(self, data: bytes, now: float = None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self.frames += 1
+        thumb = motion_thumbnail(data)
+        if thumb is None:
+            return {"type": "error", "message": "Không giải mã được khung hình"}
+
+        present, stable = self.gate.update(thumb)
+        if present and not self._present:
+            self._present, self._present_since = True, now
+            return {"type": "vehicle"}
+        if not present:
+            if self._present:
+                self._present, self._done = False, False
+                self.voter.reset()
+                self._best = {}
+                return {"type": "left"}
+            return None
+
+        if self._done or not stable:
+            if self._done and stable and now - self._present_since >= self.absorb_after:
+                # Đứng yên trong làn quá lâu sau khi đã ghi: coi là nền mới
+                self.gate.absorb(thumb)
+            with self._lock:
+                self.gated_motion += 1
+            return None
+        if now < self._next_inference:
+            with self._lock:
+                self.gated_budget += 1
+            return None
+
+        t0 = time.perf_counter()
+        try:
+            crop, plate, conf = self.recognize(data)
+        except InferenceError as exc:
+            # VD: model đang nạp lúc khởi động -> báo cho client, giữ kết nối, thử lại ở khung sau
+            self._next_inference = now + INFERENCE_RETRY_S
+            with self._lock:
+                self.inference_errors += 1
+            return {"type": "error", "message": str(exc), "retry_after": INFERENCE_RETRY_S}
+        elapsed = time.perf_counter() - t0
+        self._next_inference = now + elapsed * (1.0 / self.cpu_budget - 1.0)
+        with self._lock:
+            self.inferences += 1
+            self.inference_s += elapsed
+        if not plate:
+            return {"type": "read", "plate_number": None, "votes": 0}
+
+        if plate not in self._best or conf > self._best[plate][0]:
+            self._best[plate] = (conf, data, crop)
+        winner = self.voter.add(plate)
+        if winner is None:
+            return {"type": "read", "plate_number": plate, "confidence": conf,
+                    "votes": self.voter.votes(plate)}
+
+        plate, votes = winner
+        _, best_data, best_crop = self._best[plate]
+        result = self.commit(best_data, self.status, plate, best_crop)
+        self._done = True
+        with self._lock:
+            if result.get("success"):
+                self.commits += 1
+            else:
+                self.rejections += 1
+        log.info("🎥 LÀN %s: %s (%d phiếu) -> %s", self.lane, plate, votes, result.get("message"),
+                 extra={"fields": {"status": self.status, "success": bool(result.get("success"))}})
+        return dict(result, type="committed" if result.get("success") else "rejected", votes=votes)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "lane": self.lane,
+                "status": self.status,
+                "frames": self.frames,
+                "dropped": self.dropped,
+                "gated_motion": self.gated_motion,
+                "gated_budget": self.gated_budget,
+                "inferences": self.inferences,
+                "avg_inference_ms": round(self.inference_s / self.inferences * 1000, 1) if self.inferences else 0.0,
+                "inference_errors": self.inference_errors,
+                "commits": self.commits,
+                "rejections": self.rejections,
+            }
+
+
+# Các làn đang kết nối (GET /stream/stats)
+lanes = {}
+_lanes_lock = threading.Lock()
+
+
+def stats() -> dict:
+    with _lanes_lock:
+        return {"lanes": [p.stats() for p in lanes.values()]}
+
+
+class FrameSlot:
+    """1 chỗ chờ khung hình giữa luồng nhận (WebSocket) và luồng xử lý, theo chính sách bỏ khung."""
+
+    def __init__(self, policy: str = "latest"):
+        if policy not in DROP_POLICIES:
+            raise ValueError(f"STREAM_DROP_POLICY không hợp lệ: {policy} (chọn: {', '.join(DROP_POLICIES)})")
+        self.policy = policy
+        self._frame = None
+        self._ready = asyncio.Event()
+
+    def put(self, data: bytes) -> bool:
+        """Đưa khung vào chỗ chờ. False nếu có 1 khung bị bỏ (khung cũ hoặc chính khung này)."""
+        if self._frame is not None:
+            if self.policy == "latest":
+                self._frame = data
+            return False
+        self._frame = data
+        self._ready.set()
+        return True
+
+    async def get(self) -> bytes:
+        await self._ready.wait()
+        self._ready.clear()
+        data, self._frame = self._frame, None
+        return data
+
+
+async def serve(websocket, processor: LaneProcessor, policy: str = None, max_fps: float = None):
+    """
+    Phục vụ 1 kết nối WebSocket đã accept: nhận khung (bytes), xử lý trên threadpool,
+    gửi lại sự kiện dạng JSON. Kết thúc khi client ngắt kết nối.
+    """
+    from starlette.concurrency import run_in_threadpool
+
+    policy = policy or config.STREAM_DROP_POLICY
+    max_fps = config.STREAM_MAX_FPS if max_fps is None else max_fps
+    min_interval = 1.0 / max_fps if max_fps > 0 else 0.0
+    slot = FrameSlot(policy)
+
+    async def receive():
+        last = None
+        while True:
+            data = await websocket.receive_bytes()
+            now = time.monotonic()
+            if last is not None and now - last < min_interval:
+                processor.dropped += 1
+                continue
+            last = now
+            if not slot.put(data):
+                processor.dropped += 1
+
+    with _lanes_lock:
+        lanes[processor.lane] = processor
+    await websocket.send_json({"type": "config", "lane": processor.lane, "max_fps": max_fps, "drop_policy": policy})
+    receiver = asyncio.create_task(receive())
+    try:
+        while True:
+            getter = asyncio.create_task(slot.get())
+            done, _ = await asyncio.wait({getter, receiver}, return_when=asyncio.FIRST_COMPLETED)
+            if receiver in done:
+                getter.cancel()
+                break
+            event = await run_in_threadpool(processor.feed, getter.result())
+            if event is not None:
+                await websocket.send_json(event)
+    finally:
+        receiver.cancel()
+        with _lanes_lock:
+            if lanes.get(processor.lane) is processor:
+                del lanes[processor.lane]
+
+
+def replay(video_path: str, status: int, fps: float = 2.0, commit: bool = False, width: int = 960):
+    """Chạy 1 video quay sẵn qua LaneProcessor (thời gian theo video), in các sự kiện."""
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise SystemExit(f"Không mở được video '{video_path}'")
+    video_fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+    step = max(1, int(round(video_fps / fps)))
+
+    def dry_commit(data, status, plate, crop=None):
+        return {"success": True, "id": None, "plate_number": plate, "fee": 0, "message": "(không ghi DB)"}
+
+    processor = LaneProcessor(status, lane=video_path, commit=None if commit else dry_commit)
+    index = 0
+    while True:
+        ok, img = cap.read()
+        if not ok:
+            break
+        if index % step == 0:
+            h, w = img.shape[:2]
+            if w > width:
+                img = cv2.resize(img, (width, int(h * width / w)), interpolation=cv2.INTER_AREA)
+            ok, buf = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, 80])
+            event = processor.feed(buf.tobytes(), now=index / video_fps)
+            if event is not None:
+                print(f"[{index / video_fps:7.2f}s] {event}")
+        index += 1
+    cap.release()
+    return processor.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chạy chế độ cổng tự động trên video quay sẵn")
+    parser.add_argument("--video", required=True)
+    parser.add_argument("--status", type=int, default=1, help="1 = làn vào (check-in), 0 = làn ra (check-out)")
+    parser.add_argument("--fps", type=float, default=2.0, help="Số khung/giây lấy từ video (như trình duyệt gửi)")
+    parser.add_argument("--commit", action="store_true", help="Ghi check-in/check-out vào parking.db")
+    args = parser.parse_args()
+    if args.commit:
+        import database
+        import migrations
+        import session_writer
+        migrations.upgrade(database.engine, verbose=False)
+        # Dựng chỉ mục xe trong bãi từ DB trước khi ghi (check-out tìm được xe đã vào trước đó)
+        session_writer.start()
+    print(replay(args.video, args.status, args.fps, args.commit))
+
+
+if __name__ == "__main__":
+    main()
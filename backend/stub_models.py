@@ -0,0 +1,125 @@
+"""
+Model giả thay YOLO và EasyOCR (bật bằng SPAS_STUB_MODELS=1): không cần torch / easyocr /
+file model, không tải gì qua mạng. Dùng cho CI và benchmark (benchmarks/bench_pipeline.py)
+trên ảnh tổng hợp, để đo phần còn lại của pipeline (giải mã, cắt ảnh, định vị biển,
+tiền xử lý, chuẩn hóa biển số, DB...) một cách ổn định.
+
+- `StubDetector`: coi vùng lớn nhất khác màu nền (viền ảnh) là 1 chiếc ô tô.
+- `StubReader`: cùng giao diện `detect` / `recognize` với easyocr.Reader; đọc ký tự bằng
+  so khớp mẫu (template matching) với font Hershey mà ảnh tổng hợp dùng.
+"""
+import cv2
+import numpy as np
+
+from inference_backends import Detection, DetectorBackend
+
+# Font dùng để vẽ biển số tổng hợp và dựng mẫu ký tự
+FONT = cv2.FONT_HERSHEY_DUPLEX
+CHARSET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+# Kích thước chuẩn hóa của 1 ký tự khi so mẫu (rộng, cao)
+GLYPH_SIZE = (20, 32)
+# Class COCO "car"
+CAR_CLASS = 2
+
+
+class StubDetector(DetectorBackend):
+    """Phát hiện "xe" = vùng liên thông lớn nhất khác màu viền ảnh."""
+
+    name = "stub"
+
+    def __init__(self, model_path: str = None, num_threads: int = 0, min_area_ratio: float = 0.05):
+        self.min_area_ratio = min_area_ratio
+
+    def _detect(self, img):
+        h, w = img.shape[:2]
+        border = np.concatenate([img[0], img[-1], img[:, 0], img[:, -1]]).astype(np.float32)
+        background = np.median(border, axis=0)
+        diff = np.abs(img.astype(np.float32) - background).max(axis=2)
+        mask = (diff > 40).astype(np.uint8) * 255
+        # Mở (open) để bỏ vật mảnh như vạch sơn, đóng (close) để liền các phần của xe
+        mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, np.ones((15, 15), np.uint8))
+        mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, np.ones((15, 15), np.uint8))
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        if not contours:
+            return []
+        x, y, bw, bh = cv2.boundingRect(max(contours, key=cv2.contourArea))
+        if bw * bh < self.min_area_ratio * w * h:
+            return []
+        return [Detection(CAR_CLASS, 0.9, np.array([x, y, x + bw, y + bh], dtype=np.float32))]
+
+    def predict(self, images):
+        return [self._detect(img) for img in images]
+
+
+def _normalize_glyph(binary):
+    """Cắt sát ký tự (trắng trên nền đen) và đưa về kích thước chuẩn."""
+    ys, xs = np.nonzero(binary)
+    if len(xs) == 0:
+        return None
+    glyph = binary[ys.min():ys.max() + 1, xs.min():xs.max() + 1]
+    return cv2.resize(glyph, GLYPH_SIZE, interpolation=cv2.INTER_AREA).astype(np.float32)
+
+
+def _build_templates():
+    templates = {}
+    for ch in CHARSET:
+        canvas = np.zeros((60, 50), np.uint8)
+        cv2.putText(canvas, ch, (5, 50), FONT, 1.5, 255, 3, cv2.LINE_AA)
+        templates[ch] = _normalize_glyph(canvas)
+    return templates
+
+
+class StubReader:
+    """Giao diện giống easyocr.Reader (detect / recognize) cho ảnh biển số tổng hợp."""
+
+    def __init__(self):
+        self.templates = _build_templates()
+
+    def detect(self, img, **kwargs):
+        h, w = img.shape[:2]
+        return [[[0, w, 0, h]]], [[]]
+
+    def recognize(self, img, horizontal_list, free_list, detail=1, allowlist=None, decoder=None, batch_size=1, **kwargs):
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+        results = []
+        for x_min, x_max, y_min, y_max in horizontal_list:
+            text, conf = self._read(gray[y_min:y_max, x_min:x_max], allowlist)
+            if text:
+                bbox = [[x_min, y_min], [x_max, y_min], [x_max, y_max], [x_min, y_max]]
+                results.append((bbox, text, conf))
+        return results
+
+    def _read(self, gray, allowlist=None):
+        if gray.size == 0:
+            return "", 0.0
+        _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        # Ký tự là phần thiểu số: nền sáng (biển trắng) -> đảo để chữ thành màu trắng
+        if np.count_nonzero(binary) > binary.size / 2:
+            binary = cv2.bitwise_not(binary)
+        n, labels, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+        comps = []
+        for i in range(1, n):
+            x, y, w, h, area = stats[i]
+            if h < 8 or w < 2 or h < w * 0.9 or h > gray.shape[0] * 0.95:
+                continue
+            comps.append((x, y, w, h, i))
+        if not comps:
+            return "", 0.0
+
+        # Giữ nhóm đông nhất các thành phần cùng chiều cao, cùng hàng (dãy ký tự)
+        def group(c):
+            return [o for o in comps if abs(o[3] - c[3]) <= 0.25 * c[3] and abs((o[1] + o[3] / 2) - (c[1] + c[3] / 2)) <= 0.5 * c[3]]
+
+        chars = sorted(max((group(c) for c in comps), key=len))
+        allowed = [ch for ch in CHARSET if allowlist is None or ch in allowlist]
+        text, scores = [], []
+        for x, y, w, h, i in chars:
+            glyph = _normalize_glyph((labels[y:y + h, x:x + w] == i).astype(np.uint8) * 255)
+            best_ch, best_score = None, -1.0
+            for ch in allowed:
+                score = float(cv2.matchTemplate(glyph, self.templates[ch], cv2.TM_CCOEFF_NORMED)[0, 0])
+                if score > best_score:
+                    best_ch, best_score = ch, score
+            text.append(best_ch)
+            scores.append(max(0.0, best_score))
+        return "".join(text), sum(scores) / len(scores)
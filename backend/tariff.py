@@ -0,0 +1,62 @@
+"""
+Bảng giá gửi xe: tính phí theo thời gian gửi, dùng chung cho check-out (crud.py) và thống kê
+doanh thu (rollups.py) để 2 nơi luôn khớp nhau.
+
+Bảng giá cấu hình qua SPAS_TARIFF: các bậc "số giờ tối đa:mức phí" cách nhau bởi dấu phẩy,
+bậc cuối có thể là "*" (không giới hạn). VD mặc định: "4:5000,12:30000,*:50000"
+= dưới 4 giờ 5.000đ, 4-12 giờ 30.000đ, trên 12 giờ 50.000đ.
+"""
+from collections import namedtuple
+from datetime import datetime
+
+import config
+
+# 1 bậc giá: gửi không quá `max_hours` giờ (None = không giới hạn) thì phí là `fee`
+Tier = namedtuple("Tier", ["max_hours", "fee"])
+
+
+class Tariff:
+    def __init__(self, tiers):
+        tiers = list(tiers)
+        if not tiers:
+            raise ValueError("Bảng giá phải có ít nhất 1 bậc")
+        if any(t.max_hours is None for t in tiers[:-1]):
+            raise ValueError("Chỉ bậc cuối được không giới hạn số giờ ('*')")
+        bounded = [t for t in tiers if t.max_hours is not None]
+        if any(a.max_hours >= b.max_hours for a, b in zip(bounded, bounded[1:])):
+            raise ValueError("Số giờ của các bậc phải tăng dần")
+        self.tiers = tiers
+
+    @classmethod
+    def parse(cls, spec: str) -> "Tariff":
+        """Đọc bảng giá dạng "4:5000,12:30000,*:50000"."""
+        tiers = []
+        for part in spec.split(","):
+            part = part.strip()
+            if not part:
+                continue
+            hours, sep, fee = part.partition(":")
+            if not sep:
+                raise ValueError(f"Bậc giá không hợp lệ: '{part}' (đúng dạng: số_giờ:mức_phí)")
+            hours = hours.strip()
+            tiers.append(Tier(None if hours == "*" else float(hours), float(fee)))
+        return cls(tiers)
+
+    def fee_for_hours(self, hours: float) -> float:
+        for tier in self.tiers:
+            if tier.max_hours is None or hours <= tier.max_hours:
+                return tier.fee
+        # Gửi lâu hơn bậc cuối (bảng giá không có bậc "*") -> tính theo bậc cuối
+        return self.tiers[-1].fee
+
+    def fee(self, checkin_time: datetime, checkout_time: datetime) -> float:
+        """Phí của 1 lượt gửi từ `checkin_time` đến `checkout_time`."""
+        return self.fee_for_hours((checkout_time - checkin_time).total_seconds() / 3600.0)
+
+    def describe(self):
+        """Bảng giá dạng list dict (cho API)."""
+        return [{"max_hours": t.max_hours, "fee": t.fee} for t in self.tiers]
+
+
+# Bảng giá dùng chung của tiến trình
+tariff = Tariff.parse(config.TARIFF)
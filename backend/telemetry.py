@@ -0,0 +1,289 @@
+"""
+Đo thời gian từng bước xử lý, xuất metrics dạng Prometheus và ghi log có cấu trúc.
+
+- `Trace`: thời gian các bước của 1 request (đọc body, giải mã, YOLO, từng biến thể OCR,
+  DB, lưu ảnh...), trả về header `Server-Timing`. Trace đang chạy gắn với thread/task hiện
+  tại (`activate`), nên các module sâu bên trong (yolo_utils, crud) chỉ cần
+  `with telemetry.stage("detect"):` mà không phải truyền tham số.
+- `Counter` / `Histogram` / `gauge()`: metrics trong RAM, `render()` ra định dạng text của
+  Prometheus cho GET /metrics. Tự cài (không phụ thuộc prometheus_client).
+- `setup_logging()`: log ghi qua hàng đợi (QueueHandler), 1 thread nền ghi ra stderr, nên
+  request không phải chờ I/O của stdout. Lọc theo mức (SPAS_LOG_LEVEL), dạng text hoặc
+  JSON 1 dòng (SPAS_LOG_FORMAT). Trường có cấu trúc truyền qua `extra={"fields": {...}}`.
+"""
+import bisect
+import contextlib
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+
+import config
+
+# Mốc histogram độ trễ (giây)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()) -> str:
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def _header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """Bộ đếm chỉ tăng, theo nhãn."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames=()):
+        super().__init__(name, help, labelnames)
+        self._values = {}
+
+    def inc(self, *labels, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels) -> float:
+        with self._lock:
+            return self._values.get(labels, 0.0)
+
+    def collect(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        lines = self._header()
+        lines += [f"{self.name}{_labels(self.labelnames, k)} {v:g}" for k, v in items]
+        return lines
+
+
+class Histogram(_Metric):
+    """Histogram (đếm theo mốc + tổng + số lần), theo nhãn."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # nhãn -> [đếm từng mốc..., tổng, số lần]
+
+    def observe(self, value: float, *labels):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+            if i < len(self.buckets):
+                series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def collect(self):
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        lines = self._header()
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, [('le', f'{bound:g}')])} {cumulative}")
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, [('le', '+Inf')])} {series[-1]}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {series[-2]:.6f}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {series[-1]}")
+        return lines
+
+
+class _Callback:
+    """Metric đọc giá trị lúc xuất (độ sâu hàng đợi, hit cache...) từ hàm `fn() -> {nhãn: giá trị}`."""
+
+    def __init__(self, name: str, help: str, kind: str, fn, labelnames=()):
+        self.name, self.help, self.kind, self.fn = name, help, kind, fn
+        self.labelnames = tuple(labelnames)
+        registry.register(self)
+
+    def collect(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        try:
+            values = self.fn()
+        except Exception:
+            return lines
+        if not isinstance(values, dict):
+            values = {(): values}
+        for key, value in sorted(values.items()):
+            key = key if isinstance(key, tuple) else (key,)
+            lines.append(f"{self.name}{_labels(self.labelnames, key)} {float(value):g}")
+        return lines
+
+
+def gauge(name: str, help: str, fn, labelnames=()):
+    """Gauge đọc lúc xuất: `fn()` trả về số, hoặc dict nhãn -> số."""
+    return _Callback(name, help, "gauge", fn, labelnames)
+
+
+def counter_func(name: str, help: str, fn, labelnames=()):
+    """Counter mà giá trị do module khác tự đếm (VD: hit/miss của cache), đọc lúc xuất."""
+    return _Callback(name, help, "counter", fn, labelnames)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            # Đăng ký lại cùng tên (VD: reload module) -> thay metric cũ
+            self._metrics[metric.name] = metric
+
+    def render(self, exclude=()) -> str:
+        with self._lock:
+            metrics = [m for name, m in self._metrics.items() if name not in exclude]
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# Content-Type của định dạng text Prometheus
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+stage_seconds = Histogram("spas_stage_duration_seconds", "Thời gian từng bước xử lý", ("stage",))
+
+
+def render(exclude=()) -> str:
+    """Metrics dạng text Prometheus, bỏ các metric có tên trong `exclude`."""
+    return registry.render(exclude)
+
+
+# --- Thời gian từng bước của 1 request ---
+_current = contextvars.ContextVar("spas_trace", default=None)
+
+
+class Trace:
+    """Thời gian (ms) các bước của 1 request, theo thứ tự bắt đầu; bước lặp lại được cộng dồn."""
+
+    def __init__(self):
+        self.stages = {}
+
+    def add(self, name: str, seconds: float):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds * 1000
+
+    def server_timing(self) -> str:
+        """Giá trị header Server-Timing, VD: `decode;dur=3.1, detect;dur=41.0`."""
+        return ", ".join(f"{name};dur={ms:.1f}" for name, ms in self.stages.items())
+
+
+def current():
+    """Trace đang chạy trong thread/task hiện tại (hoặc None)."""
+    return _current.get()
+
+
+@contextlib.contextmanager
+def activate(trace: Trace):
+    """Gắn `trace` cho thread/task hiện tại (VD: trong worker của AdmissionController)."""
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+
+
+def record(name: str, seconds: float):
+    """Ghi 1 bước đã đo sẵn: vào histogram chung + trace đang chạy (nếu có)."""
+    stage_seconds.observe(seconds, name)
+    trace = _current.get()
+    if trace is not None:
+        trace.add(name, seconds)
+
+
+@contextlib.contextmanager
+def stage(name: str):
+    """Đo thời gian khối lệnh: `with telemetry.stage("decode"): ...`."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - t0)
+
+
+# --- Log có cấu trúc, ghi ở thread nền ---
+class StructuredFormatter(logging.Formatter):
+    """Dạng "text": `thời gian MỨC logger: message key=value ...`; dạng "json": 1 object/dòng."""
+
+    def __init__(self, fmt: str = "text"):
+        super().__init__()
+        self.json = fmt == "json"
+
+    def format(self, record):
+        fields = getattr(record, "fields", None) or {}
+        ts = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created)) + f".{int(record.msecs):03d}"
+        if self.json:
+            entry = {"ts": ts, "level": record.levelname, "logger": record.name, "msg": record.getMessage()}
+            entry.update(fields)
+            if record.exc_info:
+                entry["exc"] = self.formatException(record.exc_info)
+            return json.dumps(entry, ensure_ascii=False, default=str)
+        line = f"{ts} {record.levelname:<7} {record.name}: {record.getMessage()}"
+        if fields:
+            line += " " + " ".join(f"{k}={v}" for k, v in fields.items())
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+_listener = None
+_handler = None
+
+
+def setup_logging(level: str = None, fmt: str = None):
+    """
+    Cấu hình logger "spas" (gọi 1 lần khi khởi động server): log được đẩy vào hàng đợi,
+    thread nền định dạng + ghi ra stderr. Gọi lại chỉ đổi mức log.
+    """
+    global _listener, _handler
+    logger = logging.getLogger("spas")
+    logger.setLevel((level or config.LOG_LEVEL).upper())
+    if _listener is not None:
+        return logger
+    stream = logging.StreamHandler()
+    stream.setFormatter(StructuredFormatter(fmt or config.LOG_FORMAT))
+    log_queue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=True)
+    _listener.start()
+    _handler = logging.handlers.QueueHandler(log_queue)
+    logger.addHandler(_handler)
+    logger.propagate = False
+    return logger
+
+
+def shutdown_logging():
+    """Ghi nốt log còn trong hàng đợi (khi tắt server)."""
+    global _listener, _handler
+    if _listener is not None:
+        logger = logging.getLogger("spas")
+        logger.removeHandler(_handler)
+        logger.propagate = True
+        _listener.stop()
+        _listener = _handler = None
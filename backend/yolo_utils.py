@@ -1,75 +1,247 @@
 import cv2
 import os
-from ultralytics import YOLO
-import easyocr
 import numpy as np
 import re
-import torch
+import threading
+import time
 
-# Load model YOLOv8 nano (sẽ tự động tải file yolov8n.pt về thư mục hiện tại nếu chưa có)
+import config
+from image_decode import decode_frame
+from inference_backends import create_backend
+from inference_scheduler import BatchScheduler
+import plate_localizer
+import telemetry
+from plate_match import CHAR_TO_DIGIT, DIGIT_TO_CHAR, PLATE_PATTERN, is_valid_plate
+from result_cache import PerceptualCache, dhash
+
+# Model YOLOv8 nano (qua backend được cấu hình) + EasyOCR được nạp khi cần (`load_models`),
+# không nạp lúc import: API khởi động ngay, model_loader.py nạp + chạy thử ở thread nền.
+# Trên máy không có GPU có thể chọn backend "onnx" / "openvino" (xem export_model.py)
 # Model này nhận diện được 80 loại đối tượng trong bộ dữ liệu COCO
-model = YOLO("yolov8n.pt")
+detector = None
+reader = None
+use_gpu = False
+_load_lock = threading.Lock()
+
+
+class ModelLoadError(RuntimeError):
+    """Không nạp được model (thiếu file model khi không cho phép tải, thiếu thư viện...)."""
+
+
+def _timed(phases, name, t0):
+    if phases is not None:
+        phases[name] = phases.get(name, 0.0) + time.perf_counter() - t0
+
+
+def load_models(phases: dict = None):
+    """
+    Nạp model nhận diện xe + OCR (chỉ 1 lần, an toàn khi gọi từ nhiều thread).
+    Truyền dict `phases` để nhận thời gian (giây) từng bước: imports, detector_load, ocr_load.
+    Thiếu file model và không bật SPAS_MODEL_DOWNLOAD -> ModelLoadError (không tự tải về).
+    """
+    global detector, reader, use_gpu
+    with _load_lock:
+        if detector is not None and reader is not None:
+            return
+        if config.STUB_MODELS:
+            # Model giả cho CI / benchmark (SPAS_STUB_MODELS=1): không cần torch, easyocr hay file model
+            import stub_models
+
+            detector = stub_models.StubDetector()
+            reader = stub_models.StubReader()
+            use_gpu = False
+            return
+
+        t0 = time.perf_counter()
+        try:
+            import easyocr
+            import torch
+        except ImportError as exc:
+            raise ModelLoadError(f"Thiếu thư viện để chạy model: {exc}. Cài thư viện theo README (pip install ultralytics easyocr torch ...)") from exc
+        _timed(phases, "imports", t0)
 
-# Khởi tạo EasyOCR (chỉ tải model lần đầu chạy)
-# TỰ ĐỘNG KIỂM TRA GPU: Nếu có CUDA thì dùng GPU, ngược lại dùng CPU
-use_gpu = torch.cuda.is_available()
-reader = easyocr.Reader(['en'], gpu=use_gpu)
+        t0 = time.perf_counter()
+        try:
+            detector = create_backend(
+                config.DETECTOR_BACKEND, config.DETECTOR_MODEL, config.DETECTOR_THREADS,
+                allow_download=config.MODEL_DOWNLOAD,
+            )
+        except (FileNotFoundError, ImportError) as exc:
+            raise ModelLoadError(str(exc)) from exc
+        _timed(phases, "detector_load", t0)
+
+        # TỰ ĐỘNG KIỂM TRA GPU: Nếu có CUDA thì dùng GPU, ngược lại dùng CPU
+        t0 = time.perf_counter()
+        use_gpu = torch.cuda.is_available()
+        try:
+            reader = easyocr.Reader(['en'], gpu=use_gpu, download_enabled=config.MODEL_DOWNLOAD)
+        except FileNotFoundError as exc:
+            raise ModelLoadError(
+                f"Không tìm thấy model EasyOCR ({exc}). Tải 1 lần khi có mạng: "
+                f"SPAS_MODEL_DOWNLOAD=1 python model_loader.py"
+            ) from exc
+        _timed(phases, "ocr_load", t0)
+
+
+def _require_models():
+    if detector is None or reader is None:
+        load_models()
+
+
+def warm_up(phases: dict = None):
+    """
+    Chạy thử 1 lần YOLO và OCR trên ảnh tổng hợp để xe đầu tiên không phải chịu chi phí
+    khởi tạo lần chạy đầu (cấp phát bộ nhớ, biên dịch kernel...). Không đi qua bộ gom
+    batch / cache và không ghi metrics. `phases`: warmup_detector, warmup_ocr (giây).
+    """
+    _require_models()
+    t0 = time.perf_counter()
+    scene = np.full((480, 640, 3), 96, np.uint8)
+    cv2.rectangle(scene, (160, 160), (480, 400), (40, 40, 160), -1)
+    detector.predict([scene])
+    _timed(phases, "warmup_detector", t0)
+
+    t0 = time.perf_counter()
+    plate = np.full((80, 360), 235, np.uint8)
+    cv2.putText(plate, "51A-123.45", (12, 58), cv2.FONT_HERSHEY_DUPLEX, 1.5, 20, 3)
+    horizontal_list, free_list = reader.detect(plate)
+    horizontal_list, free_list = horizontal_list[0], free_list[0]
+    if not horizontal_list and not free_list:
+        horizontal_list = [[0, plate.shape[1], 0, plate.shape[0]]]
+    reader.recognize(plate, horizontal_list, free_list, detail=1, allowlist=OCR_ALLOWLIST, decoder='greedy',
+                     batch_size=len(horizontal_list) + len(free_list))
+    _timed(phases, "warmup_ocr", t0)
 
 # Danh sách class ID của các loại xe trong COCO dataset
 # 2: car, 3: motorcycle, 5: bus, 7: truck
 VEHICLE_CLASSES = [2, 3, 5, 7]
 
+# Các ký tự EasyOCR được phép trả về
+OCR_ALLOWLIST = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ-.'
+
+def prepare_detection_image(image_data):
+    """
+    Giải mã ảnh (bytes) và thu nhỏ về kích thước phù hợp cho YOLO.
+    Trả về ảnh numpy array (hoặc None nếu không giải mã được).
+    """
+    frame = decode_frame(image_data)
+    return frame.det_img if frame is not None else None
+
+def best_vehicle_box(detections):
+    """Tìm box có độ tin cậy cao nhất thuộc nhóm xe trong danh sách `Detection` của 1 ảnh."""
+    best_box = None
+    max_conf = 0.0
+
+    for det in detections:
+        if det.cls_id in VEHICLE_CLASSES and det.conf > max_conf:
+            max_conf = det.conf
+            best_box = det.box # toạ độ [x1, y1, x2, y2]
+
+    return best_box
+
+def detect_vehicle_boxes(images):
+    """
+    Chạy YOLO 1 lần cho cả danh sách ảnh (batch).
+    Trả về list box xe tốt nhất [x1, y1, x2, y2] (hoặc None) theo đúng thứ tự ảnh đầu vào.
+    """
+    _require_models()
+    return [best_vehicle_box(dets) for dets in detector.predict(images)]
+
+# Bộ gom batch: các request đồng thời được gộp lại thành 1 lần gọi YOLO
+scheduler = BatchScheduler(
+    detect_vehicle_boxes,
+    max_batch_size=config.BATCH_MAX_SIZE,
+    max_wait_ms=config.BATCH_MAX_WAIT_MS,
+    name="yolo",
+)
+
+# Cache kết quả nhận diện theo perceptual hash cho ảnh chụp lại / bấm trùng
+result_cache = PerceptualCache(
+    max_entries=config.RESULT_CACHE_SIZE,
+    ttl_s=config.RESULT_CACHE_TTL_S,
+    max_distance=config.RESULT_CACHE_MAX_DISTANCE,
+)
+
+# Metrics (GET /metrics)
+ocr_passes = telemetry.Counter("spas_ocr_passes_total", "Số lần chạy nhận dạng OCR theo biến thể ảnh", ("variant",))
+ocr_passes_per_read = telemetry.Histogram(
+    "spas_ocr_passes_per_read", "Số biến thể OCR phải chạy cho 1 lần đọc biển", buckets=(1, 2, 3, 4, 6)
+)
+telemetry.counter_func("spas_result_cache_hits_total", "Số ảnh dùng lại kết quả trong cache", lambda: result_cache.hits)
+telemetry.counter_func("spas_result_cache_misses_total", "Số ảnh không có trong cache", lambda: result_cache.misses)
+telemetry.gauge("spas_yolo_queue_depth", "Số ảnh đang chờ bộ gom batch YOLO", lambda: scheduler.stats()["queue_depth"])
+
+def detect_vehicle_box(img):
+    """Tìm box xe tốt nhất của 1 ảnh, đi qua bộ gom batch nếu được bật."""
+    if config.BATCH_ENABLED:
+        return scheduler.run(img)
+    return detect_vehicle_boxes([img])[0]
+
 def detect_and_crop_vehicle(image_data):
     """
     Nhận diện xe từ dữ liệu ảnh (bytes) và cắt ảnh xe.
     Trả về ảnh cắt dạng numpy array (hoặc None).
+
+    YOLO chạy trên ảnh giải mã rút gọn (~640px), còn ảnh xe được cắt lại từ ảnh gốc ở mức
+    giải mã vừa đủ chi tiết cho OCR (giữ chi tiết biển số, không phải phóng to ảnh cắt nhỏ).
+    Chỉ giải mã lần 2 khi tìm thấy xe.
     """
     # Đọc ảnh trực tiếp từ bộ nhớ (Memory) thay vì đọc lại từ đĩa
-    nparr = np.frombuffer(image_data, np.uint8)
-    img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-    
-    if img is None:
+    frame = decode_frame(image_data)
+    if frame is None:
         return None
+    box = detect_vehicle_box(frame.det_img)
+    return frame.crop(box)
 
-    # --- TỐI ƯU HÓA 1: Resize ảnh lớn xuống kích thước vừa phải để YOLO chạy nhanh hơn ---
-    # YOLOv8n được train ở 640x640. Resize về 640 giúp tăng tốc độ gấp 2-4 lần so với 1280
-    height, width = img.shape[:2]
-    if width > 640:
-        scale = 640 / width
-        img = cv2.resize(img, None, fx=scale, fy=scale)
+def recognize_plate(image_data, timings: dict = None):
+    """
+    Toàn bộ đường nhận diện cho 1 ảnh upload: giải mã -> YOLO -> cắt xe -> OCR.
+    Trả về (ảnh xe hoặc None, biển số hoặc None, độ tin cậy).
+    Truyền dict `timings` để nhận thời gian giải mã ảnh (`decode_ms`).
 
-    # Chạy dự đoán
-    results = model(img, verbose=False)
-    
-    # Lấy kết quả đầu tiên (vì ta chỉ xử lý 1 ảnh)
-    result = results[0]
-    
-    # Tìm box có độ tin cậy cao nhất thuộc nhóm xe
-    best_box = None
-    max_conf = 0.0
+    Ảnh gần giống 1 ảnh vừa xử lý (chụp lại, bấm 2 lần) dùng lại box xe và kết quả OCR
+    từ cache perceptual-hash thay vì chạy lại YOLO/OCR. Chỉ kết quả OCR hợp lệ mới được
+    dùng lại; ảnh đọc lỗi vẫn dùng lại box xe nhưng OCR lại.
+    """
+    t0 = time.perf_counter()
+    frame = decode_frame(image_data)
+    elapsed = time.perf_counter() - t0
+    telemetry.record("decode", elapsed)
+    if timings is not None:
+        timings["decode_ms"] = elapsed * 1000
+    if frame is None:
+        return None, None, 0.0
 
-    for box in result.boxes:
-        cls_id = int(box.cls[0])
-        conf = float(box.conf[0])
-        
-        if cls_id in VEHICLE_CLASSES and conf > max_conf:
-            max_conf = conf
-            best_box = box.xyxy[0].cpu().numpy() # toạ độ [x1, y1, x2, y2]
+    key = dhash(frame.det_img) if config.RESULT_CACHE_ENABLED else None
+    cached = result_cache.get(key) if key is not None else None
+    if cached is not None:
+        box, plate, conf = cached
+        with telemetry.stage("crop"):
+            crop = frame.crop(box)
+        if plate is not None or crop is None:
+            return crop, plate, conf
+    else:
+        with telemetry.stage("detect"):
+            box = detect_vehicle_box(frame.det_img)
+        with telemetry.stage("crop"):
+            crop = frame.crop(box)
 
-    if best_box is not None:
-        x1, y1, x2, y2 = map(int, best_box)
-        
-        # Cắt ảnh (Crop)
-        crop_img = img[y1:y2, x1:x2]
-        
-        return crop_img
-    
-    return None
+    plate, conf = read_plate_text_with_confidence(crop) if crop is not None else (None, 0.0)
+    if key is not None:
+        result_cache.put(key, (box, plate if is_valid_plate(plate) else None, conf))
+    return crop, plate, conf
 
 def read_plate_text(image_source) -> str:
     """
     Đọc văn bản từ ảnh (có thể là đường dẫn file hoặc numpy array).
     """
+    return read_plate_text_with_confidence(image_source)[0]
+
+def read_plate_text_with_confidence(image_source):
+    """
+    Như `read_plate_text` nhưng trả về kèm độ tin cậy: (biển số, độ tin cậy 0..1).
+    Không đọc được -> (None, 0.0).
+    """
     img = None
     if isinstance(image_source, str):
         # Nếu là đường dẫn file
@@ -80,8 +252,88 @@ def read_plate_text(image_source) -> str:
         img = image_source
 
     if img is None:
-        return None
+        return None, 0.0
 
+    # 0. Định vị vùng biển số trong ảnh xe: OCR chỉ chạy trên vùng nhỏ đã nắn thẳng.
+    # Nếu không tìm được vùng biển (hoặc đọc ra không đúng định dạng) -> OCR cả ảnh xe như cũ
+    if config.PLATE_LOCALIZATION_ENABLED:
+        with telemetry.stage("localize"):
+            plate_img = plate_localizer.localize_plate(img)
+        if plate_img is not None:
+            text, conf = _ocr_plate(plate_img)
+            if is_valid_plate(text):
+                return text, conf
+
+    return _ocr_plate(img)
+
+def _ocr_variants(enhanced_img):
+    """
+    Sinh lần lượt các biến thể tiền xử lý (theo thứ tự ưu tiên), chỉ tạo khi cần:
+    CLAHE -> Đảo màu -> Nhị phân hóa Otsu.
+    """
+    # Với ảnh đã cân bằng sáng (CLAHE)
+    yield "clahe", enhanced_img
+    # ĐẢO NGƯỢC MÀU (Invert): chữ đen/nền trắng -> chữ trắng/nền đen (EasyOCR đôi khi thích kiểu này hơn)
+    yield "inverted", cv2.bitwise_not(enhanced_img)
+    # Threshold (Nhị phân hóa mạnh - Chỉ còn đen và trắng)
+    _, binary_img = cv2.threshold(enhanced_img, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    yield "binary", binary_img
+
+def _detect_text_boxes(enhanced_img):
+    """
+    Tìm vùng chữ 1 lần duy nhất (CRAFT), kết quả được dùng lại cho mọi biến thể.
+    Nếu ảnh CLAHE không thấy chữ, thử thêm trên ảnh đảo màu.
+    """
+    _require_models()
+    for img in (enhanced_img, cv2.bitwise_not(enhanced_img)):
+        horizontal_list, free_list = reader.detect(img)
+        horizontal_list, free_list = horizontal_list[0], free_list[0]
+        if horizontal_list or free_list:
+            return horizontal_list, free_list
+    return [], []
+
+def _best_plate_candidate(results):
+    """
+    Chọn chuỗi biển số tốt nhất từ kết quả OCR [(bbox, text, conf), ...].
+    Điểm = độ tin cậy trung bình của các ký tự x mức độ khớp định dạng biển số VN.
+    Trả về (biển số đã chuẩn hóa, điểm) hoặc (None, 0.0).
+    """
+    # Nối tất cả text lại thành 1 chuỗi liền mạch, loại bỏ dấu câu để dễ tìm pattern
+    # Ví dụ OCR ra: ['HOND', '30A', '-', '123.45'] -> "HOND30A12345"
+    # Đồng thời ghi lại độ tin cậy của token sinh ra từng ký tự
+    chars, confs = [], []
+    for _, text, conf in results:
+        for ch in text.upper():
+            if ch.isalnum():
+                chars.append(ch)
+                confs.append(float(conf))
+    full_text = "".join(chars)
+
+    # Ứng viên: các chuỗi 7-9 ký tự liên tiếp theo regex (như trước) + mọi cửa sổ 8 ký tự,
+    # sau đó dùng fix_vietnamese_plate_format để ép kiểu từng vị trí
+    spans = [m.span() for m in re.finditer(r'[A-Z0-9]{7,9}', full_text)]
+    spans += [(i, i + 8) for i in range(len(full_text) - 8 + 1)]
+
+    best_plate, best_score = None, 0.0
+    for start, end in spans:
+        raw = full_text[start:end]
+        plate = fix_vietnamese_plate_format(raw)
+        conf = sum(confs[start:end]) / (end - start)
+        fit = plate_format_score(raw) / 8.0
+        if is_valid_plate(plate):
+            score = conf * (0.5 + 0.5 * fit)
+        else:
+            score = conf * 0.25
+        # Hòa điểm -> lấy ứng viên phía sau (thường biển số nằm ở cuối/giữa ảnh)
+        if score >= best_score and score > 0:
+            best_plate, best_score = plate, score
+    return best_plate, best_score
+
+def _ocr_plate(img):
+    """
+    Chạy EasyOCR (kèm các bước tiền xử lý) trên 1 ảnh BGR và chuẩn hóa ra biển số.
+    Trả về (biển số, độ tin cậy 0..1) hoặc (None, 0.0).
+    """
     # 1. Xử lý ảnh (Preprocessing) - TỐI ƯU HÓA TỐC ĐỘ
     # Chỉ phóng to nếu ảnh quá nhỏ (chiều ngang < 300px)
     # Ảnh từ điện thoại cắt ra thường đã đủ lớn, phóng to thêm sẽ làm chậm OCR rất nhiều
@@ -97,45 +349,49 @@ def read_plate_text(image_source) -> str:
     # Giúp cân bằng độ sáng, làm nổi bật chữ đen trên nền trắng bị lóa
     clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
     enhanced_img = clahe.apply(gray)
-    
-    # Thử lần 1: Với ảnh đã cân bằng sáng (CLAHE)
-    results = reader.readtext(enhanced_img, detail=0, allowlist='0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ-.', decoder='greedy', batch_size=1)
-    
-    # Thử lần 2: Nếu không đọc được, thử ĐẢO NGƯỢC MÀU (Invert)
-    # (Biến chữ đen/nền trắng -> chữ trắng/nền đen - EasyOCR đôi khi thích kiểu này hơn)
-    if not results:
-        inverted_img = cv2.bitwise_not(enhanced_img)
-        results = reader.readtext(inverted_img, detail=0, allowlist='0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ-.', decoder='greedy', batch_size=1)
-
-    # Thử lần 3: Nếu vẫn không được, dùng Threshold (Nhị phân hóa mạnh - Chỉ còn đen và trắng)
-    if not results:
-        _, binary_img = cv2.threshold(enhanced_img, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-        results = reader.readtext(binary_img, detail=0, allowlist='0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ-.', decoder='greedy', batch_size=1)
-    
-    # 3. Hậu xử lý (Post-processing) theo định dạng biển số VN
-    if results:
-        # Nối tất cả text lại thành 1 chuỗi liền mạch, loại bỏ dấu câu để dễ tìm pattern
-        # Ví dụ OCR ra: ['HOND', '30A', '-', '123.45'] -> "HOND30A12345"
-        full_text = "".join(results).upper().replace(" ", "").replace(".", "").replace("-", "")
-        
-        # Regex tìm chuỗi tiềm năng:
-        # Tìm chuỗi ký tự liên tiếp có độ dài 7-9 ký tự (bao gồm cả chữ và số)
-        # Sau đó sẽ dùng hàm fix_vietnamese_plate_format để ép kiểu từng vị trí
-        pattern = r'[A-Z0-9]{7,9}'
-        
-        matches = re.findall(pattern, full_text)
-        
-        # Nếu tìm thấy pattern khớp, lấy kết quả cuối cùng (thường biển số nằm ở cuối/giữa ảnh)
-        if matches:
-            candidate = matches[-1]
-            return fix_vietnamese_plate_format(candidate)
-        
-        # Fallback: Nếu không khớp pattern nào, thử sửa toàn bộ chuỗi (ít chính xác hơn)
-        clean_text = re.sub(r'[^A-Z0-9]', '', full_text)
-        if 7 <= len(clean_text) <= 9:
-            return fix_vietnamese_plate_format(clean_text)
-            
-    return None
+
+    # 2. Tìm vùng chữ 1 lần, sau đó chỉ chạy bước nhận dạng (recognize) cho từng biến thể,
+    # mỗi biến thể nhận dạng tất cả vùng chữ trong 1 batch
+    with telemetry.stage("ocr_detect"):
+        horizontal_list, free_list = _detect_text_boxes(enhanced_img)
+    n_boxes = len(horizontal_list) + len(free_list)
+    if n_boxes == 0:
+        return None, 0.0
+
+    # 3. Hậu xử lý (Post-processing) theo định dạng biển số VN + chấm điểm từng biến thể.
+    # Dừng sớm khi 1 biến thể đạt ngưỡng tin cậy, ngược lại lấy biến thể điểm cao nhất
+    best_plate, best_score = None, 0.0
+    passes = 0
+    for name, variant in _ocr_variants(enhanced_img):
+        with telemetry.stage(f"ocr_{name}"):
+            results = reader.recognize(
+                variant, horizontal_list, free_list,
+                detail=1, allowlist=OCR_ALLOWLIST, decoder='greedy', batch_size=n_boxes,
+            )
+        ocr_passes.inc(name)
+        passes += 1
+        plate, score = _best_plate_candidate(results)
+        if score > best_score:
+            best_plate, best_score = plate, score
+        if best_score >= config.OCR_CONFIDENCE_THRESHOLD:
+            break
+    ocr_passes_per_read.observe(passes)
+
+    return best_plate, round(best_score, 4)
+
+def plate_format_score(text: str) -> int:
+    """
+    Điểm khớp mẫu DD C DDDDD của 8 ký tự đầu (0..8):
+    cộng 1 điểm cho mỗi ký tự đúng loại (Số ở vị trí số, Chữ ở vị trí chữ).
+    """
+    sub = text[:8]
+    score = 0
+    for j, ch in enumerate(sub):
+        if j == 2:
+            if ch.isalpha(): score += 1
+        elif ch.isdigit():
+            score += 1
+    return score
 
 def fix_vietnamese_plate_format(text: str) -> str:
     """
@@ -151,13 +407,8 @@ def fix_vietnamese_plate_format(text: str) -> str:
         
         for i in range(len(text) - 8 + 1):
             sub = text[i:i+8]
-            score = 0
             # Cộng điểm nếu ký tự đúng loại (Số ở vị trí số, Chữ ở vị trí chữ)
-            if sub[0].isdigit(): score += 1
-            if sub[1].isdigit(): score += 1
-            if sub[2].isalpha(): score += 1
-            for j in range(3, 8):
-                if sub[j].isdigit(): score += 1
+            score = plate_format_score(sub)
             
             if score > best_score:
                 best_score = score
@@ -169,11 +420,11 @@ def fix_vietnamese_plate_format(text: str) -> str:
     if len(text) < 7:
         return text # Trả về nguyên gốc nếu độ dài không hợp lý
 
-    # Bảng map sửa lỗi các ký tự dễ nhầm
+    # Bảng map sửa lỗi các ký tự dễ nhầm (plate_match.py, dùng chung với tìm biển gần đúng khi check-out)
     # Nhầm Chữ -> Số (Dùng cho 2 ký tự đầu và dãy số cuối)
-    dict_char_to_int = {'O': '0', 'D': '0', 'Q': '0', 'I': '1', 'L': '1', 'Z': '2', 'B': '3', 'S': '5', 'G': '6'}
+    dict_char_to_int = CHAR_TO_DIGIT
     # Nhầm Số -> Chữ (Dùng cho ký tự thứ 3 - Series)
-    dict_int_to_char = {'0': 'O', '1': 'I', '2': 'Z', '3': 'B', '4': 'A', '5': 'S', '6': 'G', '7': 'T', '8': 'B', '9': 'G'}
+    dict_int_to_char = DIGIT_TO_CHAR
 
     text_list = list(text)
 
@@ -1,19 +1,309 @@
+"""
+Web server HTTPS cho giao diện (index.html) dùng ở các làn.
+
+- Mỗi kết nối 1 thread (ThreadingHTTPServer), bắt tay TLS chạy trong thread của kết nối:
+  1 điện thoại mạng chậm không chặn các máy khác tải trang.
+- HTTP/1.1 keep-alive; kết nối im lặng quá --idle-timeout giây bị đóng (không giữ thread mãi).
+- SSLContext (TLS 1.2+), bật session ticket để điện thoại kết nối lại không phải bắt tay đầy đủ.
+- File được đọc + nén sẵn (gzip, thêm brotli nếu có cài `brotli`) 1 lần, giữ trong RAM và tự nạp
+  lại khi file trên đĩa thay đổi; gửi kèm ETag / Last-Modified để trình duyệt hỏi lại chỉ nhận 304.
+- index.html: `Cache-Control: no-cache` (luôn hỏi lại, đổi BACKEND_URL là có hiệu lực ngay);
+  file tĩnh khác: cache lâu (--max-age).
+- Chỉ phục vụ các loại file giao diện (html, js, css, ảnh...), KHÔNG bao giờ trả server.key,
+  server.crt hay file .py trong thư mục.
+
+Chạy (trong thư mục frontend/):
+    python serve_https.py
+    python serve_https.py --port 5500 --idle-timeout 15
+
+Đo độ trễ tải trang khi nhiều điện thoại cùng tải (trong thư mục backend/):
+    python benchmarks/bench_frontend.py --clients 50
+"""
+import argparse
+import email.utils
+import gzip
+import hashlib
 import http.server
+import mimetypes
+import os
+import socket
 import ssl
+import sys
+import threading
+import urllib.parse
+from collections import namedtuple
+
+try:
+    import brotli
+except ImportError:  # Không bắt buộc: thiếu thì chỉ nén gzip
+    brotli = None
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Loại file được phục vụ (theo phần mở rộng)
+STATIC_TYPES = {
+    ".html": "text/html; charset=utf-8",
+    ".js": "text/javascript; charset=utf-8",
+    ".mjs": "text/javascript; charset=utf-8",
+    ".css": "text/css; charset=utf-8",
+    ".json": "application/json",
+    ".webmanifest": "application/manifest+json",
+    ".svg": "image/svg+xml",
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".gif": "image/gif",
+    ".webp": "image/webp",
+    ".ico": "image/x-icon",
+    ".woff2": "font/woff2",
+    ".txt": "text/plain; charset=utf-8",
+}
+# Loại file nén được (ảnh/font đã nén sẵn, nén lại không nhỏ hơn)
+COMPRESSIBLE = {".html", ".js", ".mjs", ".css", ".json", ".webmanifest", ".svg", ".txt"}
+# File nhỏ hơn ngưỡng này không nén (header Content-Encoding + giải nén tốn hơn phần tiết kiệm)
+MIN_COMPRESS_BYTES = 256
+
+# 1 file đã nạp: bodies = mã hóa ("identity" | "gzip" | "br") -> nội dung
+Asset = namedtuple("Asset", ["path", "mtime", "size", "content_type", "etag", "last_modified", "bodies"])
+
+
+class AssetStore:
+    """File tĩnh trong `root`, đọc + nén 1 lần, nạp lại khi mtime/kích thước thay đổi."""
+
+    def __init__(self, root: str):
+        self.root = os.path.realpath(root)
+        self._lock = threading.Lock()
+        self._assets = {}
+
+    def resolve(self, url_path: str):
+        """Đường dẫn file ứng với URL, hoặc None nếu không được phép phục vụ."""
+        path = urllib.parse.unquote(url_path.split("?", 1)[0].split("#", 1)[0])
+        if path.endswith("/"):
+            path += "index.html"
+        parts = [p for p in path.split("/") if p]
+        # Không cho ra ngoài thư mục gốc, không phục vụ file ẩn (.git, .env...)
+        if not parts or any(p.startswith(".") or "\\" in p or "\x00" in p for p in parts):
+            return None
+        if os.path.splitext(parts[-1])[1].lower() not in STATIC_TYPES:
+            return None
+        full = os.path.realpath(os.path.join(self.root, *parts))
+        if not full.startswith(self.root + os.sep):
+            return None
+        return full
+
+    def get(self, url_path: str):
+        """Asset của URL (đã nén sẵn), hoặc None nếu không có / không được phép."""
+        full = self.resolve(url_path)
+        if full is None:
+            return None
+        try:
+            st = os.stat(full)
+        except OSError:
+            return None
+        asset = self._assets.get(full)
+        if asset is not None and asset.mtime == st.st_mtime and asset.size == st.st_size:
+            return asset
+        with self._lock:
+            asset = self._assets.get(full)
+            if asset is None or asset.mtime != st.st_mtime or asset.size != st.st_size:
+                asset = self._assets[full] = self._load(full, st)
+            return asset
+
+    def _load(self, full: str, st) -> Asset:
+        with open(full, "rb") as f:
+            data = f.read()
+        ext = os.path.splitext(full)[1].lower()
+        bodies = {"identity": data}
+        if ext in COMPRESSIBLE and len(data) >= MIN_COMPRESS_BYTES:
+            # mtime=0: cùng nội dung -> cùng bytes gzip
+            gz = gzip.compress(data, compresslevel=9, mtime=0)
+            if len(gz) < len(data):
+                bodies["gzip"] = gz
+            if brotli is not None:
+                br = brotli.compress(data, quality=11)
+                if len(br) < len(data):
+                    bodies["br"] = br
+        return Asset(
+            path=full,
+            mtime=st.st_mtime,
+            size=st.st_size,
+            content_type=STATIC_TYPES.get(ext) or mimetypes.guess_type(full)[0] or "application/octet-stream",
+            etag=hashlib.sha1(data).hexdigest()[:20],
+            last_modified=email.utils.formatdate(int(st.st_mtime), usegmt=True),
+            bodies=bodies,
+        )
+
+
+def accepted_encodings(header: str):
+    """Các mã hóa client nhận (bỏ qua q=0), theo Accept-Encoding."""
+    result = set()
+    for item in (header or "").split(","):
+        name, _, params = item.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        if name:
+            result.add(name.strip().lower())
+    return result
+
+
+class StaticHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive: nhiều file / nhiều lần tải trên 1 kết nối TLS
+    server_version = "SPASStatic/1.0"
+
+    def setup(self):
+        # Áp dụng cho cả bắt tay TLS (chạy ở lần đọc đầu tiên) lẫn thời gian chờ request kế tiếp
+        self.timeout = self.server.idle_timeout
+        super().setup()
+
+    def do_GET(self):
+        self._serve(head=False)
+
+    def do_HEAD(self):
+        self._serve(head=True)
+
+    def _serve(self, head: bool):
+        asset = self.server.assets.get(self.path)
+        if asset is None:
+            self._send_status(404, "Not Found")
+            return
+
+        accepted = accepted_encodings(self.headers.get("Accept-Encoding"))
+        encoding = next((e for e in ("br", "gzip") if e in accepted and e in asset.bodies), "identity")
+        # Mỗi bản nén có ETag riêng (nội dung gửi đi khác nhau), cùng gốc từ hash của file
+        etag = f'"{asset.etag}"' if encoding == "identity" else f'"{asset.etag}-{encoding}"'
+        is_html = asset.content_type.startswith("text/html")
+        headers = {
+            "ETag": etag,
+            "Last-Modified": asset.last_modified,
+            "Cache-Control": "no-cache" if is_html else f"public, max-age={self.server.max_age}",
+            "Vary": "Accept-Encoding",
+        }
+
+        if self._not_modified(asset):
+            self.send_response(304)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            return
+
+        body = asset.bodies[encoding]
+        self.send_response(200)
+        self.send_header("Content-Type", asset.content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if encoding != "identity":
+            self.send_header("Content-Encoding", encoding)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+
+    def _not_modified(self, asset: Asset) -> bool:
+        inm = self.headers.get("If-None-Match")
+        if inm is not None:
+            # If-None-Match có thì bỏ qua If-Modified-Since (RFC 9110)
+            for tag in inm.split(","):
+                tag = tag.strip()
+                if tag == "*":
+                    return True
+                if tag.startswith("W/"):
+                    tag = tag[2:]
+                if tag.strip('"').split("-", 1)[0] == asset.etag:
+                    return True
+            return False
+        ims = self.headers.get("If-Modified-Since")
+        if ims:
+            try:
+                since = email.utils.parsedate_to_datetime(ims).timestamp()
+            except (TypeError, ValueError, IndexError, OverflowError):
+                return False
+            return int(asset.mtime) <= since
+        return False
+
+    def _send_status(self, code: int, message: str):
+        body = message.encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+class StaticHTTPSServer(http.server.ThreadingHTTPServer):
+    """ThreadingHTTPServer + TLS: bắt tay TLS trong thread của kết nối, không chặn vòng accept()."""
+
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, address, context: ssl.SSLContext, root: str = HERE,
+                 idle_timeout: float = 15.0, max_age: int = 7 * 24 * 3600, quiet: bool = False):
+        self.context = context
+        self.assets = AssetStore(root)
+        self.idle_timeout = idle_timeout
+        self.max_age = max_age
+        self.quiet = quiet
+        super().__init__(address, StaticHandler)
+
+    def get_request(self):
+        sock, addr = self.socket.accept()
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        # Không bắt tay ngay ở đây (thread chính): bắt tay ở lần đọc đầu tiên trong thread của kết nối
+        return self.context.wrap_socket(sock, server_side=True, do_handshake_on_connect=False), addr
+
+    def handle_error(self, request, client_address):
+        # Client đóng kết nối / từ chối chứng chỉ tự ký / quá thời gian chờ: không in traceback
+        exc = sys.exc_info()[1]
+        if isinstance(exc, (ssl.SSLError, ConnectionError, TimeoutError)):
+            if not self.quiet:
+                print(f"{client_address[0]}: {type(exc).__name__}: {exc}", file=sys.stderr)
+            return
+        super().handle_error(request, client_address)
+
+
+def make_context(certfile: str, keyfile: str) -> ssl.SSLContext:
+    """SSLContext phía server: TLS 1.2+, session ticket để kết nối lại nhanh (TLS 1.3: vé resumption)."""
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.minimum_version = ssl.TLSVersion.TLSv1_2
+    context.load_cert_chain(certfile=certfile, keyfile=keyfile)
+    context.options &= ~ssl.OP_NO_TICKET
+    context.num_tickets = 2
+    return context
+
 
-PORT = 5500
-server_address = ('0.0.0.0', PORT)
+def main():
+    parser = argparse.ArgumentParser(description="Web server HTTPS cho giao diện")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5500)
+    parser.add_argument("--root", default=HERE, help="Thư mục chứa index.html")
+    parser.add_argument("--cert", default=os.path.join(HERE, "server.crt"))
+    parser.add_argument("--key", default=os.path.join(HERE, "server.key"))
+    parser.add_argument("--idle-timeout", type=float, default=15.0,
+                        help="Đóng kết nối im lặng quá số giây này (kể cả lúc bắt tay TLS)")
+    parser.add_argument("--max-age", type=int, default=7 * 24 * 3600,
+                        help="Thời gian cache file tĩnh (giây); index.html luôn hỏi lại bằng ETag")
+    parser.add_argument("--quiet", action="store_true", help="Không in log từng request")
+    args = parser.parse_args()
 
-# HTTP server
-httpd = http.server.HTTPServer(server_address, http.server.SimpleHTTPRequestHandler)
+    context = make_context(args.cert, args.key)
+    httpd = StaticHTTPSServer((args.host, args.port), context, args.root, args.idle_timeout, args.max_age, args.quiet)
+    print(f"Serving HTTPS on {args.host}:{args.port} (nén: gzip{', brotli' if brotli else ''})")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
 
-# Wrap socket với HTTPS dùng self-signed certificate
-httpd.socket = ssl.wrap_socket(
-    httpd.socket,
-    keyfile="server.key",
-    certfile="server.crt",
-    server_side=True
-)
 
-print(f"Serving HTTPS on 0.0.0.0:{PORT}")
-httpd.serve_forever()
+if __name__ == "__main__":
+    main()